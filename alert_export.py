@@ -0,0 +1,122 @@
+"""
+Streaming export of alerts to CSV or Parquet.
+
+Alerts are read from the detection database (see detection_db.py) in chunks,
+converted to Arrow and appended to the output file one chunk at a time, so
+peak memory is bounded by the chunk size, whatever the number of exported
+alerts. Rows are exported in storage order, which lets SQLite read the table
+sequentially instead of through the date index.
+
+Usage:
+    python alert_export.py OUT.csv|OUT.parquet [--region REGION] [--days N]
+        [--severity High ...] [--db PATH]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+import config
+from detection_db import BATCH_ROWS, DetectionDB, detection_db
+
+# Export formats: file extension and MIME type
+FORMATS = {
+    'CSV': ('.csv', 'text/csv'),
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+# Column types of exported files (every chunk is written with this schema)
+EXPORT_SCHEMA = pa.schema([
+    ('alert_id', pa.int64()),
+    ('date', pa.timestamp('s')),
+    ('severity', pa.string()),
+    ('area_hectares', pa.float32()),
+    ('description', pa.string()),
+    ('lat', pa.float32()),
+    ('lon', pa.float32()),
+    ('is_new', pa.bool_()),
+])
+
+def _arrow_tables(chunks):
+    """Convert alert chunks to Arrow tables with the stable id as a column and plain text columns"""
+    for chunk in chunks:
+        chunk = chunk.rename_axis('alert_id').reset_index()
+        chunk = chunk.astype({'severity': 'str', 'description': 'str'})
+        yield pa.Table.from_pandas(chunk, schema=EXPORT_SCHEMA, preserve_index=False)
+
+def write_csv(chunks, path):
+    """Append chunks to a CSV file (one header); return the number of rows"""
+    rows = 0
+    options = pa_csv.WriteOptions(quoting_style='needed')
+    with pa_csv.CSVWriter(path, EXPORT_SCHEMA, write_options=options) as writer:
+        for table in _arrow_tables(chunks):
+            writer.write_table(table)
+            rows += table.num_rows
+    return rows
+
+def write_parquet(chunks, path):
+    """Write chunks to a Parquet file, one row group per chunk; return the number of rows"""
+    rows = 0
+    with pq.ParquetWriter(path, EXPORT_SCHEMA) as writer:
+        for table in _arrow_tables(chunks):
+            writer.write_table(table)
+            rows += table.num_rows
+    return rows
+
+def export_alerts(path, fmt='CSV', db=None, chunk_rows=BATCH_ROWS, **filters):
+    """
+    Stream the alerts matching the filters to a file
+
+    Parameters:
+    path: Output file
+    fmt: 'CSV' or 'Parquet'
+    db: DetectionDB to read from (the shared one by default)
+    filters: As for DetectionDB.iter_alerts()
+
+    Returns:
+    Number of exported alerts
+    """
+    db = db or detection_db
+    chunks = db.iter_alerts(chunk_rows=chunk_rows, ordered=False, **filters)
+    writer = write_parquet if fmt == 'Parquet' else write_csv
+    # Write under a temporary name so a failed export never leaves a partial file
+    tmp_path = f"{path}.tmp"
+    try:
+        rows = writer(chunks, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
+
+def export_to_temp_file(fmt='CSV', **filters):
+    """Export alerts to a new temporary file; return (path, number of alerts)"""
+    extension, _ = FORMATS[fmt]
+    fd, path = tempfile.mkstemp(prefix="forest_guardian_alerts_", suffix=extension)
+    os.close(fd)
+    return path, export_alerts(path, fmt, **filters)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export alerts from the detection database")
+    parser.add_argument("out", help="output file (.csv or .parquet)")
+    parser.add_argument("--region", help="only alerts of this region")
+    parser.add_argument("--days", type=int, help="only alerts of the last N days")
+    parser.add_argument("--severity", nargs="+", choices=["Low", "Medium", "High"], help="only these severities")
+    parser.add_argument("--db", default=config.DATABASE_PATH, help="database file")
+    args = parser.parse_args()
+
+    fmt = 'Parquet' if args.out.lower().endswith('.parquet') else 'CSV'
+    since = datetime.now() - timedelta(days=args.days) if args.days else None
+    start = time.perf_counter()
+    rows = export_alerts(args.out, fmt, db=DetectionDB(args.db), region=args.region, since=since,
+                         severities=args.severity, distinct=True)
+    elapsed = time.perf_counter() - start
+    print(f"Exported {rows:,} alerts to {args.out} in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
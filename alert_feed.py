@@ -0,0 +1,473 @@
+"""
+Live feed of new and changed alerts.
+
+An AlertFeed keeps the latest state of every alert it has seen and turns
+each published batch into a delta: only alerts that are new or whose fields
+changed are passed on. Subscribers are never waited for:
+
+* each subscription coalesces the deltas it has not consumed yet into one
+  pending set (an alert changed five times is delivered once, as its latest
+  version), so a burst reaches a slow consumer as a single update
+* a subscription whose backlog exceeds MAX_PENDING_ALERTS is reset instead:
+  its backlog is dropped and its next update is the feed's current state
+
+api_server.py runs a feed as a broker: producers POST alert batches to
+``/api/v1/alerts/events`` and clients follow ``/api/v1/alerts/stream`` as
+server-sent events (resuming with Last-Event-ID). The dashboard process has
+its own feed (``alert_feed``) that relays a broker's stream (ALERT_FEED_URL)
+or, for local use, runs the stand-in AlertSimulator (ALERT_FEED_SIMULATOR).
+It mirrors every delta into the detection database under the source
+``feed:<region>``, so the alert panel reads pushed alerts with the same
+indexed queries as loaded ones, and hands every delta to its listeners (the
+notification dispatcher).
+
+Usage:
+    python alert_feed.py produce [--url http://127.0.0.1:8502] [--interval 2]
+    python alert_feed.py listen [--url http://127.0.0.1:8502] [--region Amazon]
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import config
+import regions
+from data_processor import ALERT_DESCRIPTIONS, SEVERITY_DTYPE, compact_alerts
+from detection_db import detection_db, stable_alert_ids
+
+# Events kept for clients resuming with Last-Event-ID
+FEED_LOG_EVENTS = 1000
+
+# Unconsumed alerts a subscription holds before it is reset
+MAX_PENDING_ALERTS = 5000
+
+# A stream waits this long after the first alert of a burst before sending,
+# so the rest of the burst goes out in the same event
+COALESCE_SECONDS = 0.5
+
+# Streams send a comment line this often so idle connections stay open
+HEARTBEAT_SECONDS = 15
+
+# Subscriptions not polled for this long are dropped (e.g. closed dashboards)
+SUBSCRIPTION_IDLE_SECONDS = 300
+
+# Alerts older than this are dropped from the feed's state
+RETENTION_DAYS = 30
+
+# Upper bound of the delay between reconnection attempts of a relay
+RECONNECT_MAX_SECONDS = 30
+
+FEED_COLUMNS = ['region', 'date', 'severity', 'area_hectares', 'description', 'lat', 'lon', 'is_new']
+
+# An update of a subscription: with reset set, alerts is the feed's whole
+# current state rather than a delta
+FeedUpdate = namedtuple('FeedUpdate', ['seq', 'alerts', 'reset'])
+
+def feed_source(region):
+    """Detection database source key of the live alerts of a region"""
+    return f"feed:{region}"
+
+def feed_sources(region):
+    """Source keys of the live alerts shown for a region (all regions' for Global)"""
+    if region == "Global":
+        return [feed_source(name) for name in regions.REGIONS]
+    return [feed_source(region)]
+
+def alert_records(alerts):
+    """JSON-ready records of an alert frame indexed by alert_id"""
+    df = alerts.reset_index()
+    df['date'] = df['date'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+    return json.loads(df.to_json(orient='records'))
+
+def alerts_frame(records):
+    """Alert frame indexed by alert_id (loader schema plus region) from records"""
+    df = pd.DataFrame.from_records(list(records), columns=['alert_id'] + FEED_COLUMNS)
+    df['date'] = pd.to_datetime(df['date'])
+    df['is_new'] = df['is_new'].astype(bool)
+    df.index = pd.Index(df.pop('alert_id').to_numpy(dtype=np.int64), name='alert_id')
+    return compact_alerts(df)
+
+class Subscription:
+    """
+    A consumer's view of a feed: unconsumed deltas coalesced per alert
+
+    Parameters:
+    feed: The AlertFeed
+    region: Region whose alerts are delivered (None for all)
+    """
+
+    def __init__(self, feed, region):
+        self.feed = feed
+        self.region = region
+        self.seq = 0
+        self.closed = False
+        self._pending = {}  # alert_id -> latest record not yet consumed
+        self._reset = False
+        self._cond = threading.Condition()
+        self.polled_at = time.monotonic()
+
+    def _offer(self, seq, changes, reset):
+        with self._cond:
+            if reset:
+                self._pending, self._reset = {}, True
+            elif not self._reset:
+                self._pending.update(changes)
+                if len(self._pending) > MAX_PENDING_ALERTS:
+                    # Too far behind: catch up from the current state instead
+                    self._pending, self._reset = {}, True
+            self.seq = seq
+            self._cond.notify_all()
+
+    def _ready(self):
+        return bool(self._pending) or self._reset or self.closed
+
+    def poll(self, timeout=0.0, coalesce=0.0):
+        """
+        Return the next update, or None if none arrives within timeout seconds
+
+        Parameters:
+        coalesce: Once something arrived, wait this long for the rest of a burst
+        """
+        with self._cond:
+            self.polled_at = time.monotonic()
+            if not self._cond.wait_for(self._ready, timeout) or self.closed:
+                return None
+        if coalesce:
+            time.sleep(coalesce)
+        with self._cond:
+            pending, reset, seq = self._pending, self._reset, self.seq
+            self._pending, self._reset = {}, False
+        if reset:
+            return FeedUpdate(seq, self.feed.snapshot(self.region), True)
+        return FeedUpdate(seq, alerts_frame(pending.values()), False)
+
+    def close(self):
+        """Stop receiving updates"""
+        self.feed._unsubscribe(self)
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+class AlertFeed:
+    """
+    Latest alert state with delta fan-out to subscriptions
+
+    Parameters:
+    db: Optional DetectionDB every delta is mirrored into (source feed:<region>)
+    """
+
+    def __init__(self, db=None):
+        self.db = db
+        self.live = False
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._log = deque(maxlen=FEED_LOG_EVENTS)  # (seq, region, changes, reset)
+        self._latest = {}  # region -> {alert_id: record}
+        self._subscriptions = set()
+        self._listeners = []
+
+    def publish(self, region, alerts, replace=False):
+        """
+        Publish a batch of a region's alerts (a frame indexed by alert_id)
+
+        Parameters:
+        replace: The batch is the region's whole state (alerts not in it are dropped)
+
+        Returns:
+        The event's sequence number, or None if nothing changed
+        """
+        records = {record['alert_id']: record for record in alert_records(alerts.assign(region=region)[
+            ['region'] + [column for column in FEED_COLUMNS if column != 'region']])}
+        cutoff = (datetime.now() - timedelta(days=RETENTION_DAYS)).strftime('%Y-%m-%dT%H:%M:%S')
+        with self._lock:
+            latest = self._latest.setdefault(region, {})
+            if replace:
+                changes = records
+                latest.clear()
+            else:
+                changes = {alert_id: record for alert_id, record in records.items() if latest.get(alert_id) != record}
+                if not changes:
+                    return None
+            latest.update(changes)
+            for alert_id in [alert_id for alert_id, record in latest.items() if record['date'] < cutoff]:
+                del latest[alert_id]
+
+            delta = alerts_frame(changes.values()) if self.db is not None or self._listeners else None
+            if self.db is not None:
+                # Mirrored before subscribers hear of it, so they always find the rows
+                self.db.upsert_alerts(feed_source(region), region, delta, replace=replace)
+            self._seq += 1
+            seq = self._seq
+            self._log.append((seq, region, changes, replace))
+            now = time.monotonic()
+            for subscription in list(self._subscriptions):
+                if now - subscription.polled_at > SUBSCRIPTION_IDLE_SECONDS:
+                    self._subscriptions.discard(subscription)
+                    subscription.closed = True
+                elif subscription.region in (None, region):
+                    subscription._offer(seq, changes, replace)
+            listeners = list(self._listeners)
+        # Listeners run outside the lock, so a slow one never holds up publishers
+        for callback in listeners:
+            try:
+                callback(region, delta)
+            except Exception as e:
+                print(f"Alert feed listener failed: {type(e).__name__}: {e}")
+        return seq
+
+    def add_listener(self, callback):
+        """Call callback(region, alerts) with every published delta (a frame indexed by alert_id)"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def subscribe(self, region=None, last_seq=None):
+        """
+        Subscribe to the alerts of a region (None for all)
+
+        Parameters:
+        last_seq: Sequence number of the last event the consumer has; later
+            events are replayed, or the subscription starts with a reset if
+            they are no longer kept
+
+        Returns:
+        Subscription
+        """
+        subscription = Subscription(self, region)
+        with self._lock:
+            subscription.seq = self._seq
+            if last_seq is not None and last_seq != self._seq:
+                if last_seq < self._seq and self._log and self._log[0][0] <= last_seq + 1:
+                    for seq, event_region, changes, reset in self._log:
+                        if seq > last_seq and region in (None, event_region):
+                            subscription._offer(seq, changes, reset)
+                else:
+                    subscription._offer(self._seq, {}, True)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def snapshot(self, region=None):
+        """Current alerts of a region (None for all) as a frame indexed by alert_id"""
+        with self._lock:
+            records = [record for name, latest in self._latest.items() if region in (None, name)
+                       for record in latest.values()]
+        return alerts_frame(records)
+
+    def regions(self):
+        """Regions the feed has state for"""
+        with self._lock:
+            return list(self._latest)
+
+    def start(self):
+        """Start the configured source of this feed (once); return whether the feed is live"""
+        with self._lock:
+            if self.live or not (config.ALERT_FEED_URL or config.ALERT_FEED_SIMULATOR):
+                return self.live
+            self.live = True
+        if config.ALERT_FEED_URL:
+            FeedRelay(config.ALERT_FEED_URL, self).start()
+        else:
+            AlertSimulator(self.publish).start()
+        return True
+
+def sse_event(update):
+    """Encode a feed update as a server-sent event"""
+    data = json.dumps({'alerts': alert_records(update.alerts)}, separators=(',', ':'))
+    return f"id: {update.seq}\nevent: {'reset' if update.reset else 'alerts'}\ndata: {data}\n\n".encode("utf-8")
+
+def stream_events(wfile, feed, region=None, last_event_id=None):
+    """
+    Write a feed to a client as server-sent events until it disconnects
+
+    A slow client blocks only its own writes; meanwhile its subscription
+    coalesces (or resets) the backlog.
+    """
+    subscription = feed.subscribe(region, last_event_id)
+    try:
+        while not subscription.closed:
+            update = subscription.poll(timeout=HEARTBEAT_SECONDS, coalesce=COALESCE_SECONDS)
+            wfile.write(sse_event(update) if update is not None else b": keepalive\n\n")
+            wfile.flush()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        subscription.close()
+
+def iter_events(url, last_event_id=None):
+    """Yield (id, event, data) of a server-sent event stream"""
+    headers = {'Accept': "text/event-stream"}
+    if last_event_id is not None:
+        headers['Last-Event-ID'] = str(last_event_id)
+    request = urllib.request.Request(url, headers=headers)
+    # Heartbeats arrive every HEARTBEAT_SECONDS; a silent connection is dead
+    with urllib.request.urlopen(request, timeout=HEARTBEAT_SECONDS * 3) as response:
+        event_id, event, data = None, 'message', []
+        for raw_line in response:
+            line = raw_line.decode("utf-8").rstrip("\r\n")
+            if not line:
+                if data:
+                    yield event_id, event, "\n".join(data)
+                event, data = 'message', []
+            elif not line.startswith(':'):
+                field, _, value = line.partition(':')
+                value = value[1:] if value.startswith(' ') else value
+                if field == 'id':
+                    event_id = int(value)
+                elif field == 'event':
+                    event = value
+                elif field == 'data':
+                    data.append(value)
+
+class FeedRelay(threading.Thread):
+    """
+    Follows a broker's event stream and publishes it into a local feed
+
+    Reconnects with Last-Event-ID (and a growing delay) when the stream drops.
+
+    Parameters:
+    url: Base URL of the broker (api_server.py)
+    feed: Local AlertFeed
+    """
+
+    def __init__(self, url, feed):
+        super().__init__(name="alert-feed-relay", daemon=True)
+        self.url = url.rstrip('/') + "/api/v1/alerts/stream"
+        self.feed = feed
+
+    def run(self):
+        last_event_id, delay = None, 1
+        while True:
+            try:
+                for event_id, event, data in iter_events(self.url, last_event_id):
+                    self.apply(event, json.loads(data)['alerts'])
+                    last_event_id, delay = event_id, 1
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                print(f"Alert feed relay: {type(e).__name__}: {e}; reconnecting in {delay}s")
+            time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+    def apply(self, event, records):
+        """Publish one event's alerts into the local feed, per region"""
+        alerts = alerts_frame(records)
+        by_region = {region: part.drop(columns='region') for region, part in alerts.groupby('region', observed=True)}
+        if event == 'reset':
+            # The event is the broker's whole state: regions missing from it are emptied
+            for region in set(self.feed.regions()) - set(by_region):
+                by_region[region] = alerts.iloc[:0].drop(columns='region')
+        for region, part in by_region.items():
+            self.feed.publish(region, part, replace=event == 'reset')
+
+class AlertSimulator(threading.Thread):
+    """
+    Stand-in producer: a few new alerts at random intervals, occasional large
+    bursts, and escalations (larger area, higher severity) of recent alerts
+
+    Parameters:
+    publish: Called with (region, alerts frame indexed by alert_id)
+    interval_seconds: Mean time between batches
+    burst_probability: Share of batches that are bursts of burst_size alerts
+    """
+
+    def __init__(self, publish, interval_seconds=2.0, burst_probability=0.05, burst_size=500, seed=None):
+        super().__init__(name="alert-simulator", daemon=True)
+        self.publish = publish
+        self.interval_seconds = interval_seconds
+        self.burst_probability = burst_probability
+        self.burst_size = burst_size
+        self.rng = np.random.default_rng(seed)
+        self.stopped = threading.Event()
+        self._recent = {}  # region -> recent alerts (frame rows) that may escalate
+
+    def run(self):
+        while not self.stopped.wait(self.rng.exponential(self.interval_seconds)):
+            try:
+                region, alerts = self.next_batch()
+                self.publish(region, alerts)
+            except (OSError, http.client.HTTPException) as e:
+                print(f"Alert simulator: {type(e).__name__}: {e}")
+
+    def next_batch(self):
+        """Return (region, alerts) of the next batch"""
+        rng = self.rng
+        region = str(rng.choice([name for name in regions.REGIONS if name != "Global"]))
+        count = self.burst_size if rng.random() < self.burst_probability else int(rng.integers(1, 4))
+        min_lat, min_lon, max_lat, max_lon = regions.get_region(region).bbox
+        severity = rng.choice(list(SEVERITY_DTYPE.categories), size=count, p=[0.3, 0.4, 0.3])
+        area_multiplier = np.select([severity == "Low", severity == "Medium"], [1, 3], 10)
+        alerts = compact_alerts(pd.DataFrame({
+            'date': pd.Timestamp.now().floor('s'),
+            'severity': severity,
+            'area_hectares': rng.uniform(10, 100, count) * area_multiplier,
+            'description': [str(rng.choice(ALERT_DESCRIPTIONS[level])) for level in severity],
+            'lat': rng.uniform(min_lat, max_lat, count),
+            'lon': rng.uniform(min_lon, max_lon, count),
+            'is_new': True,
+        }))
+        alerts.index = pd.Index(stable_alert_ids(alerts), name='alert_id')
+
+        recent = self._recent.get(region)
+        if recent is not None and len(recent) and rng.random() < 0.3:
+            # An earlier alert grows: same id, larger area, one severity level up
+            escalated = recent.iloc[[int(rng.integers(0, len(recent)))]].copy()
+            escalated['area_hectares'] *= np.float32(1.5)
+            codes = np.minimum(escalated['severity'].cat.codes.to_numpy() + 1, len(SEVERITY_DTYPE.categories) - 1)
+            escalated['severity'] = pd.Categorical.from_codes(codes, dtype=SEVERITY_DTYPE)
+            alerts = pd.concat([alerts, escalated])
+        self._recent[region] = pd.concat([recent, alerts]).tail(100) if recent is not None else alerts.tail(100)
+        return region, alerts
+
+def http_publisher(url):
+    """Return a publish function that POSTs alert batches to a broker"""
+    endpoint = url.rstrip('/') + "/api/v1/alerts/events"
+
+    def publish(region, alerts, replace=False):
+        body = json.dumps({'region': region, 'replace': replace, 'alerts': alert_records(alerts)}).encode("utf-8")
+        request = urllib.request.Request(endpoint, data=body, headers={'Content-Type': "application/json"})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return json.loads(response.read()).get('seq')
+    return publish
+
+# The feed of this dashboard process (started by the dashboard when configured)
+alert_feed = AlertFeed(detection_db)
+
+def main():
+    parser = argparse.ArgumentParser(description="Produce or follow the live alert feed of an api_server.py broker")
+    parser.add_argument("command", choices=["produce", "listen"])
+    parser.add_argument("--url", default=config.ALERT_FEED_URL or f"http://{config.API_HOST}:{config.API_PORT}")
+    parser.add_argument("--region", help="only this region's alerts (listen)")
+    parser.add_argument("--interval", type=float, default=2.0, help="mean seconds between batches (produce)")
+    parser.add_argument("--burst-size", type=int, default=500, help="alerts per burst (produce)")
+    args = parser.parse_args()
+
+    if args.command == "produce":
+        simulator = AlertSimulator(http_publisher(args.url), args.interval, burst_size=args.burst_size)
+        print(f"Publishing simulated alerts to {args.url} (Ctrl+C to stop)")
+        simulator.start()
+        try:
+            simulator.join()
+        except KeyboardInterrupt:
+            simulator.stopped.set()
+    else:
+        url = args.url.rstrip('/') + "/api/v1/alerts/stream"
+        if args.region:
+            url += "?" + urllib.parse.urlencode({'region': args.region})
+        try:
+            for event_id, event, data in iter_events(url):
+                alerts = json.loads(data)['alerts']
+                print(f"{datetime.now():%H:%M:%S} #{event_id} {event}: {len(alerts)} alerts")
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
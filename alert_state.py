@@ -0,0 +1,120 @@
+"""
+Persistent per-user read state of alerts.
+
+Read marks live in the detection database (see detection_db.py), keyed by
+(user_id, alert_id). Alert ids come from detection_db.stable_alert_ids(), so
+marks survive restarts and re-mirroring of the alert data.
+
+* single "mark read" clicks are buffered and written in batches
+* "mark all" is a single INSERT ... SELECT over the mirrored alerts
+* unread counts are NOT EXISTS lookups on the (user_id, alert_id) primary
+  key rather than scans of the user's marks
+"""
+import atexit
+import threading
+import time
+
+from detection_db import alert_where, detection_db
+
+# Buffered marks are written once this many are pending, or once the oldest
+# has waited this long (reads always write pending marks first)
+FLUSH_ROWS = 500
+FLUSH_SECONDS = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alert_reads (
+    user_id TEXT NOT NULL,
+    alert_id INTEGER NOT NULL,
+    read_at INTEGER NOT NULL,
+    PRIMARY KEY (user_id, alert_id)
+) WITHOUT ROWID;
+"""
+
+class AlertReadState:
+    """
+    Per-user read marks of alerts with batched writes
+
+    Parameters:
+    db: DetectionDB holding the mirrored alerts
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._pending = []  # (user_id, alert_id, read_at) not yet written
+        self._pending_since = None
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self):
+        """Return this thread's connection, creating the alert_reads table on first use"""
+        if not self._schema_ready:
+            with self.db.transaction() as conn:
+                conn.executescript(SCHEMA)
+            self._schema_ready = True
+        return self.db.connection()
+
+    def mark_read(self, user_id, alert_ids):
+        """Mark alerts as read (buffered; written in batches)"""
+        now = int(time.time())
+        with self._lock:
+            self._pending.extend((user_id, int(alert_id), now) for alert_id in alert_ids)
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            due = len(self._pending) >= FLUSH_ROWS or time.monotonic() - self._pending_since >= FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def mark_all_read(self, user_id, severities=None, **filters):
+        """
+        Mark every mirrored alert matching the filters as read, in one statement
+
+        Parameters:
+        severities, filters: As for DetectionDB.query_alerts()
+
+        Returns:
+        Number of alerts newly marked as read
+        """
+        self._connection()
+        where, params = alert_where(severities, **filters)
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                f"INSERT OR IGNORE INTO alert_reads (user_id, alert_id, read_at) "
+                f"SELECT ?, alert_id, ? FROM alerts{where}",
+                [user_id, int(time.time())] + params
+            )
+        return cursor.rowcount
+
+    def unread_count(self, user_id, severities=None, **filters):
+        """Number of mirrored alerts matching the filters that the user has not read"""
+        self.flush()
+        where, params = alert_where(severities, **filters)
+        where += (" AND " if where else " WHERE ") + (
+            "NOT EXISTS (SELECT 1 FROM alert_reads r WHERE r.user_id = ? AND r.alert_id = alerts.alert_id)"
+        )
+        return self._connection().execute(f"SELECT COUNT(*) FROM alerts{where}", params + [user_id]).fetchone()[0]
+
+    def read_ids(self, user_id, alert_ids):
+        """Return the subset of alert_ids that the user has read"""
+        self.flush()
+        alert_ids = [int(alert_id) for alert_id in alert_ids]
+        if not alert_ids:
+            return set()
+        rows = self._connection().execute(
+            f"SELECT alert_id FROM alert_reads WHERE user_id = ? AND alert_id IN ({', '.join('?' * len(alert_ids))})",
+            [user_id] + alert_ids
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def flush(self):
+        """Write all buffered read marks in one transaction"""
+        with self._lock:
+            pending, self._pending, self._pending_since = self._pending, [], None
+        if not pending:
+            return
+        self._connection()
+        with self.db.transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO alert_reads (user_id, alert_id, read_at) VALUES (?, ?, ?)", pending)
+
+# The read state shared by every session in this process
+alert_state = AlertReadState(detection_db)
+atexit.register(alert_state.flush)
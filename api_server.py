@@ -0,0 +1,397 @@
+"""
+Headless HTTP API serving the dashboard's datasets as JSON or Arrow.
+
+The datasets come from the same shared data service as the dashboard (see
+data_service.py), so other systems get the numbers the dashboard shows.
+
+    GET /api/v1/regions
+    GET /api/v1/deforestation[/<field>]?region=Amazon&start=2015&end=2024
+    GET /api/v1/biodiversity[/<field>]?region=Amazon&start=2015&end=2024
+    GET /api/v1/alerts?region=Amazon&threshold=Medium
+    GET /api/v1/hotspots/diff?region=Amazon&start=2015&end=2024&since=<version>
+    GET /api/v1/alerts/stream[?region=Amazon]
+    POST /api/v1/alerts/events
+    GET /healthz
+
+A field path (e.g. /api/v1/deforestation/raw_data) returns one field of the
+dataset. Add ``format=arrow`` (or send ``Accept:
+application/vnd.apache.arrow.stream``) to get a table field, or the alerts,
+as an Arrow IPC stream; the dataset's scalar fields are in the schema
+metadata.
+
+Encoded responses are cached for API_CACHE_SECONDS. Every response carries
+a content-hash ETag, so a polling client sending If-None-Match gets a 304
+without a body while the data is unchanged; bodies are gzip-compressed
+(once, when cached) for clients that accept it.
+
+The server is also the broker of the live alert feed (see alert_feed.py):
+producers POST {"region", "alerts": [records], "replace"} to
+/api/v1/alerts/events, and /api/v1/alerts/stream sends the new and changed
+alerts to every follower as server-sent events. --simulate runs the
+stand-in producer inside the server.
+
+/api/v1/hotspots/diff answers the live-updating maps (see hotspot_diff.py)
+with the hotspots changed since the version a map shows. Responses allow
+any origin, so the maps can poll the API from the dashboard's pages.
+
+Usage:
+    python api_server.py [--host 127.0.0.1] [--port 8502] [--simulate]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import config
+import regions
+from alert_feed import AlertFeed, AlertSimulator, alerts_frame, stream_events
+from data_processor import BASE_YEAR
+from data_service import data_service, get_alert_data, get_biodiversity_data, get_deforestation_data
+from hotspot_diff import hotspot_history
+
+# Encoded responses kept in the response cache
+CACHE_ENTRIES = 256
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+JSON_TYPE = "application/json"
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+
+ALERT_THRESHOLDS = ("Low", "Medium", "High")
+
+class ApiError(Exception):
+    """A request that cannot be answered; reported to the client with its status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _param(params, name, default=None):
+    values = params.get(name)
+    return values[-1] if values else default
+
+def _region_param(params):
+    region = _param(params, 'region', "Global")
+    if region not in regions.REGIONS:
+        raise ApiError(400, f"Unknown region {region!r}; one of {', '.join(regions.REGIONS)}")
+    return region
+
+def _year_range_param(params):
+    try:
+        year_range = (int(_param(params, 'start', BASE_YEAR)), int(_param(params, 'end', datetime.now().year)))
+    except ValueError:
+        raise ApiError(400, "start and end must be years") from None
+    if not BASE_YEAR <= year_range[0] <= year_range[1] <= datetime.now().year:
+        raise ApiError(400, f"Years must satisfy {BASE_YEAR} <= start <= end <= {datetime.now().year}")
+    return year_range
+
+def _threshold_param(params):
+    threshold = _param(params, 'threshold', "Medium")
+    if threshold not in ALERT_THRESHOLDS:
+        raise ApiError(400, f"threshold must be one of {', '.join(ALERT_THRESHOLDS)}")
+    return threshold
+
+# Dataset name -> (function reading its arguments from the query, loader)
+DATASETS = {
+    'deforestation': (lambda params: (_region_param(params), _year_range_param(params)), get_deforestation_data),
+    'biodiversity': (lambda params: (_region_param(params), _year_range_param(params)), get_biodiversity_data),
+    'alerts': (lambda params: (_region_param(params), _threshold_param(params)), get_alert_data),
+}
+
+def jsonable(obj):
+    """Convert a dataset (or a field of one) to plain JSON types"""
+    if isinstance(obj, pd.DataFrame):
+        return json.loads(obj.to_json(orient='records', date_format='iso', date_unit='s'))
+    if isinstance(obj, Mapping):
+        return {str(key): jsonable(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [jsonable(item) for item in obj]
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and not np.isfinite(obj):
+        return None
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return obj
+
+def _is_table(obj):
+    return isinstance(obj, pd.DataFrame) or (isinstance(obj, (list, tuple)) and obj and isinstance(obj[0], Mapping))
+
+def arrow_stream(table, metadata):
+    """Encode a table field (DataFrame or sequence of records) as an Arrow IPC stream"""
+    if isinstance(table, pd.DataFrame):
+        arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+    else:
+        arrow_table = pa.Table.from_pylist([dict(record) for record in table])
+    arrow_table = arrow_table.replace_schema_metadata({
+        **(arrow_table.schema.metadata or {}), b'forest_guardian': json.dumps(jsonable(metadata)).encode("utf-8")
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table)
+    return sink.getvalue().to_pybytes()
+
+def encode_dataset(dataset_name, args, field, fmt):
+    """
+    Load a dataset and encode it (or one of its fields)
+
+    Returns:
+    (content type, body bytes)
+    """
+    _, loader = DATASETS[dataset_name]
+    data = loader(*args)
+    if dataset_name == 'alerts':
+        # The alert frame is the table; its attrs are the scalar fields
+        data = {'region': args[0], 'alert_threshold': args[1], **data.attrs, 'alerts': data}
+        field = field or ('alerts' if fmt == 'arrow' else None)
+
+    if field is not None:
+        if field not in data:
+            raise ApiError(404, f"Unknown field {field!r}; one of {', '.join(data)}")
+        value = data[field]
+    else:
+        value = data
+
+    if fmt == 'arrow':
+        if not _is_table(value):
+            tables = [name for name, item in data.items() if _is_table(item)]
+            raise ApiError(400, f"Arrow responses need a table field: one of {', '.join(tables)}")
+        metadata = {name: item for name, item in data.items() if not _is_table(item) and not isinstance(item, Mapping)}
+        return ARROW_TYPE, arrow_stream(value, metadata)
+    return JSON_TYPE, json.dumps(jsonable(value), separators=(',', ':')).encode("utf-8")
+
+class CachedResponse:
+    """An encoded response body with its ETag and gzip-compressed variant"""
+
+    def __init__(self, content_type, body):
+        self.content_type = content_type
+        self.body = body
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:24]}"'
+        self.gzip_body = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+        self.gzip_etag = f'"{self.etag[1:-1]}-gz"'
+        self.created_at = time.monotonic()
+
+class ResponseCache:
+    """
+    LRU cache of encoded responses; a response is built once even when requested concurrently
+
+    Parameters:
+    ttl_seconds: Age after which a response is rebuilt
+    max_entries: Maximum number of cached responses
+    """
+
+    def __init__(self, ttl_seconds, max_entries=CACHE_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, key, build):
+        """Return the cached response for key, building it with build() if missing or expired"""
+        response = self._lookup(key)
+        if response is not None:
+            return response
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                response = self._lookup(key)
+                if response is None:
+                    response = CachedResponse(*build())
+                    with self._lock:
+                        self._entries[key] = response
+                        self._entries.move_to_end(key)
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+        return response
+
+    def _lookup(self, key):
+        with self._lock:
+            response = self._entries.get(key)
+            if response is None:
+                return None
+            if time.monotonic() - response.created_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+response_cache = ResponseCache(config.API_CACHE_SECONDS)
+
+# Live alert feed relayed to stream followers
+feed_broker = AlertFeed()
+
+# Largest accepted POST body
+MAX_EVENT_BYTES = 32 * 1024 * 1024
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Request handler of the API (one thread per connection)"""
+    protocol_version = "HTTP/1.1"
+    server_version = "ForestGuardianAPI/1.0"
+
+    def do_GET(self):
+        if urlsplit(self.path).path.rstrip('/') == '/api/v1/alerts/stream':
+            return self._stream_alerts()
+        self._respond(send_body=True)
+
+    def do_POST(self):
+        try:
+            if urlsplit(self.path).path.rstrip('/') != '/api/v1/alerts/events':
+                raise ApiError(404, f"Unknown path {self.path}")
+            seq = self._publish_alerts()
+        except ApiError as e:
+            return self._send(e.status, JSON_TYPE, json.dumps({'error': str(e)}).encode("utf-8"))
+        self._send(202, JSON_TYPE, json.dumps({'seq': seq}).encode("utf-8"))
+
+    def _publish_alerts(self):
+        """Publish a POSTed alert batch into the feed; returns its sequence number"""
+        length = int(self.headers.get('Content-Length') or 0)
+        if not 0 < length <= MAX_EVENT_BYTES:
+            raise ApiError(413 if length else 411, f"Send a JSON body of at most {MAX_EVENT_BYTES:,} bytes")
+        try:
+            payload = json.loads(self.rfile.read(length))
+            region = payload['region']
+            alerts = alerts_frame({**record, 'region': region} for record in payload['alerts'])
+        except (ValueError, KeyError, TypeError) as e:
+            raise ApiError(400, f"Expected JSON with 'region' and 'alerts' records: {e}") from None
+        if region not in regions.REGIONS:
+            raise ApiError(400, f"Unknown region {region!r}; one of {', '.join(regions.REGIONS)}")
+        return feed_broker.publish(region, alerts.drop(columns='region'), replace=bool(payload.get('replace')))
+
+    def _stream_alerts(self):
+        """Follow the live feed as server-sent events (until the client disconnects)"""
+        params = parse_qs(urlsplit(self.path).query)
+        try:
+            region = _region_param(params) if 'region' in params else None
+            # Alerts are published under their own regions; Global follows them all
+            region = None if region == "Global" else region
+            last_event_id = self.headers.get('Last-Event-ID')
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return self._send(400, JSON_TYPE, b'{"error":"Last-Event-ID must be an event id"}')
+        except ApiError as e:
+            return self._send(e.status, JSON_TYPE, json.dumps({'error': str(e)}).encode("utf-8"))
+        # No Content-Length: the stream ends when the connection closes
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', "text/event-stream")
+        self.send_header('Cache-Control', "no-cache")
+        self.send_header('Connection', "close")
+        self.end_headers()
+        stream_events(self.wfile, feed_broker, region, last_event_id)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        try:
+            response = self._route(url.path.rstrip('/') or '/', params)
+        except ApiError as e:
+            return self._send(e.status, JSON_TYPE, json.dumps({'error': str(e)}).encode("utf-8"), send_body=send_body)
+
+        use_gzip = response.gzip_body is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+        etag = response.gzip_etag if use_gzip else response.etag
+        headers = {
+            'ETag': etag,
+            'Cache-Control': f"max-age={config.API_CACHE_SECONDS}",
+            'Vary': "Accept, Accept-Encoding",
+            'Access-Control-Allow-Origin': "*",
+        }
+        if self._not_modified(response):
+            return self._send(304, None, b"", headers, send_body=False)
+        if use_gzip:
+            headers['Content-Encoding'] = "gzip"
+        self._send(200, response.content_type, response.gzip_body if use_gzip else response.body, headers, send_body)
+
+    def _route(self, path, params):
+        """Return the CachedResponse of a path"""
+        if path == '/healthz':
+            return CachedResponse(JSON_TYPE, b'{"status":"ok"}')
+        parts = path.strip('/').split('/')
+        if len(parts) < 3 or parts[:2] != ['api', 'v1'] or len(parts) > 4:
+            raise ApiError(404, f"Unknown path {path}")
+        if parts[2] == 'regions' and len(parts) == 3:
+            return response_cache.get(('regions',), lambda: (JSON_TYPE, json.dumps(jsonable({
+                name: region._asdict() for name, region in regions.REGIONS.items()
+            })).encode("utf-8")))
+        if parts[2:] == ['hotspots', 'diff']:
+            region, year_range = _region_param(params), _year_range_param(params)
+            since = _param(params, 'since')
+            return response_cache.get(('hotspots-diff', region, year_range, since), lambda: (JSON_TYPE, json.dumps(
+                hotspot_history.diff((region, year_range), since,
+                                     get_deforestation_data(region, year_range)['hotspots']),
+                separators=(',', ':')).encode("utf-8")))
+        if parts[2] not in DATASETS:
+            raise ApiError(404, f"Unknown dataset {parts[2]!r}; one of {', '.join(DATASETS)}")
+
+        dataset_name, field = parts[2], parts[3] if len(parts) == 4 else None
+        read_args, _ = DATASETS[dataset_name]
+        args = read_args(params)
+        fmt = _param(params, 'format') or ('arrow' if ARROW_TYPE in self.headers.get('Accept', '') else 'json')
+        if fmt not in ('json', 'arrow'):
+            raise ApiError(400, "format must be json or arrow")
+        return response_cache.get((dataset_name, args, field, fmt),
+                                  lambda: encode_dataset(dataset_name, args, field, fmt))
+
+    def _not_modified(self, response):
+        if_none_match = self.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return '*' in tags or response.etag in tags or response.gzip_etag in tags
+
+    def _send(self, status, content_type, body, headers=None, send_body=True):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+def make_server(host=config.API_HOST, port=config.API_PORT):
+    """Create the API server (call serve_forever() on it)"""
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard datasets as a JSON/Arrow HTTP API")
+    parser.add_argument("--host", default=config.API_HOST)
+    parser.add_argument("--port", type=int, default=config.API_PORT)
+    parser.add_argument("--simulate", action="store_true", help="publish simulated alerts into the live feed")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port)
+    data_service.start()
+    if args.simulate:
+        AlertSimulator(feed_broker.publish).start()
+    print(f"Serving the Forest Guardian API on http://{args.host}:{args.port}/api/v1/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,25 @@
 import streamlit as st
-import time
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
 # Import custom modules
-from utils import toggle_theme, get_current_theme, apply_theme_css, risk_level_html, show_notification, get_time_since
-from data_processor import load_deforestation_data, load_biodiversity_data, load_alert_data
-from map_visualization import create_map, create_time_lapse_map
-from charts import plot_deforestation_trend, plot_biodiversity_impact, plot_risk_distribution
+from utils import toggle_theme, get_current_theme, theme_stylesheet_html, theme_variables_html, risk_level_html, show_notification, alert_cards_html, alert_label, current_user_id, signed_in
+from data_service import data_service, get_deforestation_data, get_biodiversity_data, get_alert_data
+from detection_db import detection_db
+from alert_state import alert_state
+from alert_export import FORMATS as EXPORT_FORMATS, export_to_temp_file
+from shared_store import dataset_key
+from report_scheduler import report_scheduler
+from notifications import notification_dispatcher, valid_address
+from render_cache import build_map_html, build_time_lapse_html, build_chart
+import prewarm
+from alert_feed import alert_feed, feed_sources
+from data_processor import THRESHOLD_SEVERITIES
+import config
+# map_visualization (folium) and charts (plotly) are imported on first use in
+# the render helpers (render_cache.py) so they stay off the cold-start path
 
 # Page configuration
 st.set_page_config(
@@ -18,6 +29,15 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Compute and render only the tab the user has open (see main())
+LAZY_TABS = True
+
+# Number of alert cards shown per page of the alert panel
+ALERTS_PER_PAGE = 10
+
+# Seconds between frames while the time-lapse is auto-playing
+TIMELAPSE_FRAME_SECONDS = 1.5
+
 # Initialize session state variables
 if 'theme' not in st.session_state:
     st.session_state.theme = 'light'
@@ -31,9 +51,6 @@ if 'selected_lat' not in st.session_state:
 if 'selected_lon' not in st.session_state:
     st.session_state.selected_lon = None
     
-if 'alert_history' not in st.session_state:
-    st.session_state.alert_history = []
-    
 if 'view_history' not in st.session_state:
     st.session_state.view_history = {}
     
@@ -43,8 +60,14 @@ if 'playing_timelapse' not in st.session_state:
 if 'current_timelapse_year' not in st.session_state:
     st.session_state.current_timelapse_year = 2015
     
-# Apply custom CSS based on theme
-st.markdown(apply_theme_css(), unsafe_allow_html=True)
+if 'alert_export' not in st.session_state:
+    st.session_state.alert_export = None
+    
+# Apply custom CSS based on theme. The large static stylesheet is sent as its
+# own element so Streamlit's message cache lets the browser reuse it across
+# reruns; switching themes only changes the small custom property block.
+st.markdown(theme_stylesheet_html(), unsafe_allow_html=True)
+st.markdown(theme_variables_html(get_current_theme()), unsafe_allow_html=True)
 
 # Add custom JavaScript for smoother animations
 js = """
@@ -74,7 +97,568 @@ js = """
 """
 st.markdown(js, unsafe_allow_html=True)
 
+def notification_setting(channel, label, address_label, region, alert_threshold):
+    """
+    Show the sidebar controls of a notification channel and keep the user's subscription in sync
+
+    The subscription is only written when the user changes it: enabling the
+    channel, editing the address or switching it to the selected region and
+    threshold. Browsing other regions leaves it alone. Returns whether
+    notifications are enabled on the channel.
+    """
+    user_id = current_user_id()
+    state_key = f"notification_{channel}"
+    if state_key not in st.session_state:
+        st.session_state[state_key] = notification_dispatcher.subscription(user_id, channel)
+    subscription = st.session_state[state_key]
+
+    enabled = st.checkbox(label, value=subscription is not None, key=f"notify_{channel}")
+    if not enabled:
+        if subscription is not None:
+            notification_dispatcher.unsubscribe(user_id, channel)
+            st.session_state[state_key] = None
+        return False
+
+    address = st.text_input(address_label, value=subscription[0] if subscription else "", key=f"notify_{channel}_address")
+    if not address:
+        return True
+    if not valid_address(channel, address):
+        st.error(f"Please enter a valid {address_label.lower()}")
+        return True
+    # A new subscription watches the selected region; an existing one keeps its own
+    watched_region, watched_threshold = (region, alert_threshold) if subscription is None else subscription[1:]
+    setting = (address.strip(), watched_region, watched_threshold)
+    if subscription is None or tuple(subscription) != setting:
+        notification_dispatcher.subscribe(user_id, channel, *setting)
+        st.session_state[state_key] = subscription = setting
+    
+    name = label.split(' ', 1)[1]
+    if notification_dispatcher.enabled(channel):
+        st.success(f"{name} enabled for {watched_region} ({watched_threshold} sensitivity)")
+    else:
+        st.warning(f"{name} are saved, but no {'email' if channel == 'email' else 'SMS'} "
+                   f"server is configured")
+    if (watched_region, watched_threshold) != (region, alert_threshold):
+        st.button(f"Notify me about {region} ({alert_threshold}) instead", key=f"notify_{channel}_watch",
+                  on_click=watch_region, args=(channel, subscription[0], region, alert_threshold))
+    return True
+
+def watch_region(channel, address, region, alert_threshold):
+    """Switch the user's subscription on a channel to another region and threshold"""
+    notification_dispatcher.subscribe(current_user_id(), channel, address, region, alert_threshold)
+    st.session_state[f"notification_{channel}"] = (address, region, alert_threshold)
+
+def discard_alert_export():
+    """Delete this session's prepared alert export file, if any"""
+    export = st.session_state.get('alert_export')
+    st.session_state.alert_export = None
+    if export and os.path.exists(export['path']):
+        os.remove(export['path'])
+
+def mark_alerts_read(user_id, alert_ids):
+    """Mark alerts read for a user (button callback)"""
+    alert_state.mark_read(user_id, alert_ids)
+    show_notification("Alert marked as read", icon="✅")
+
+def mark_all_alerts_read(user_id, filters):
+    """Mark every alert of the panel read for a user (button callback)"""
+    alert_state.mark_all_read(user_id, **filters)
+    show_notification("All alerts marked as read", icon="✅")
+    st.session_state.notification_shown = False
+
+def map_snapshot(deforestation_data):
+    """
+    Return the deforestation data this session's maps are built from
+
+    With live map updates the maps stay on the data they were first built
+    from and the browser applies hotspot changes as deltas, so a data refresh
+    does not re-send whole map documents.
+    """
+    if not config.MAP_UPDATES_URL:
+        return deforestation_data
+    snapshots = st.session_state.setdefault('map_snapshots', {})
+    key = (deforestation_data['region'], tuple(deforestation_data['year_range']))
+    return snapshots.setdefault(key, deforestation_data)
+
+def render_map_tab(deforestation_data, map_layers, selected_year_range):
+    """Render the Interactive Map tab (deforestation map and time-lapse)"""
+    st.subheader("Deforestation Map")
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        # Interactive map
+        folium_map = build_map_html(map_snapshot(deforestation_data), map_layers)
+        st.components.v1.html(folium_map, height=500)
+    
+    with col2:
+        st.subheader("Map Legend")
+        st.markdown("🔴 **High Risk Areas**")
+        st.markdown("🟠 **Medium Risk Areas**")
+        st.markdown("🟢 **Low Risk Areas**")
+        st.markdown("🟦 **Protected Areas**")
+        st.markdown("🔍 **Click on markers for details**")
+        
+        st.markdown("---")
+        st.subheader("Risk Factors")
+        risk_factors = pd.DataFrame({
+            'Factor': ['Logging', 'Agriculture', 'Mining', 'Infrastructure'],
+            'Contribution (%)': [35, 45, 12, 8]
+        })
+        st.dataframe(risk_factors, hide_index=True, use_container_width=True)
+
+    st.subheader("Time-Lapse Visualization")
+    
+    # Create a container with enhanced styling that works in both light and dark mode
+    with st.container():
+        current_theme = get_current_theme()
+        bg_color = "rgba(255,255,255,0.1)" if current_theme == "dark" else "rgba(0,0,0,0.05)"
+        
+        st.markdown(f"""
+        <div style="background-color: {bg_color}; padding: 10px; border-radius: 5px; margin-bottom: 10px; color: {st.session_state.text_color};">
+            <p style="color: {st.session_state.text_color};">This time-lapse shows the progression of deforestation across years. 
+            Move the slider to see how forest cover has changed over time.</p>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # Interactive year selector with auto-play option
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            year_for_timelapse = st.slider(
+                "Select year to view:",
+                min_value=selected_year_range[0],
+                max_value=selected_year_range[1],
+                value=selected_year_range[0],
+                key="timelapse_year_slider"
+            )
+        
+        with col2:
+            # Add auto-play feature
+            if 'playing_timelapse' not in st.session_state:
+                st.session_state.playing_timelapse = False
+                
+            if 'current_timelapse_year' not in st.session_state:
+                st.session_state.current_timelapse_year = selected_year_range[0]
+            
+            # Toggle button for play/pause with custom HTML for horizontal text
+            play_label = "⏸️ Pause" if st.session_state.playing_timelapse else "▶️ Play"
+            
+            play_html = f"""
+            <button 
+                style="width:100%; padding:8px; background-color:{'#2E2E2E' if get_current_theme() == 'dark' else '#F0F2F6'}; 
+                color:{'#FFFFFF' if get_current_theme() == 'dark' else '#262730'}; 
+                border:1px solid {'rgba(255,255,255,0.2)' if get_current_theme() == 'dark' else 'rgba(0,0,0,0.1)'};
+                border-radius:5px; cursor:pointer; font-family:Arial; writing-mode:horizontal-tb !important;
+                text-orientation:mixed !important;" 
+                onclick="document.getElementById('play_timelapse').click()">
+                {play_label}
+            </button>
+            """
+            st.markdown(play_html, unsafe_allow_html=True)
+            
+            # Hidden button for functionality (with minimal height to hide it)
+            st.markdown(f"<div style='height:0px; overflow:hidden;'>", unsafe_allow_html=True)
+            if st.button(play_label, key="play_timelapse"):
+                st.session_state.playing_timelapse = not st.session_state.playing_timelapse
+                if st.session_state.playing_timelapse:
+                    st.session_state.current_timelapse_year = selected_year_range[0]
+                    # This will cause the app to rerun in the next cycle
+                    st.rerun()
+            st.markdown("</div>", unsafe_allow_html=True)
+        
+        # Auto-advance the year if playing by re-running just this frame
+        frame_interval = TIMELAPSE_FRAME_SECONDS if st.session_state.playing_timelapse else None
+        st.fragment(render_time_lapse_frame, run_every=frame_interval)(
+            deforestation_data, selected_year_range, year_for_timelapse
+        )
+    
+def render_time_lapse_frame(deforestation_data, selected_year_range, year_for_timelapse):
+    """Render the time-lapse map and statistics for one year (one animation frame)"""
+    # While auto-play is on this runs as a fragment on a timer, so each tick
+    # advances one year without holding the script thread in a sleep
+    if st.session_state.playing_timelapse:
+        if st.session_state.current_timelapse_year > selected_year_range[1]:
+            # End of the time range, stop playing (the full rerun drops the timer)
+            st.session_state.playing_timelapse = False
+            st.rerun()
+        # Use this instead of the slider value when in auto-play mode
+        year_for_timelapse = st.session_state.current_timelapse_year
+        st.session_state.current_timelapse_year += 1
+    
+    # Show the year prominently with correct color for the theme
+    st.markdown(f"<h2 style='text-align: center; color: {st.session_state.text_color};'>{year_for_timelapse}</h2>", unsafe_allow_html=True)
+    
+    # Create the map for the selected year
+    folium_timelapse = build_time_lapse_html(map_snapshot(deforestation_data), year_for_timelapse)
+    st.components.v1.html(folium_timelapse, height=450)
+    
+    # Show year-specific statistics below the map
+    col1, col2, col3 = st.columns(3)
+    
+    # Calculate year-specific values
+    year_data = deforestation_data['yearly_data'].get(year_for_timelapse, {})
+    prev_year_data = deforestation_data['yearly_data'].get(year_for_timelapse-1, year_data)
+    
+    # Total deforestation for the year
+    with col1:
+        year_loss = year_data.get('loss_hectares', 0)
+        prev_year_loss = prev_year_data.get('loss_hectares', year_loss)
+        percent_change = ((year_loss - prev_year_loss) / max(prev_year_loss, 1)) * 100
+        
+        st.metric(
+            label=f"Deforestation in {year_for_timelapse}", 
+            value=f"{year_loss:,.0f} ha",
+            delta=f"{percent_change:.1f}% from previous year",
+            delta_color="inverse"
+        )
+    
+    # Affected species
+    with col2:
+        affected_species = year_data.get('affected_species', 0)
+        st.metric(
+            label="Affected Species", 
+            value=affected_species
+        )
+    
+    # Primary cause
+    with col3:
+        primary_cause = year_data.get('primary_cause', 'Unknown')
+        primary_percentage = year_data.get('primary_cause_percentage', 0)
+        st.metric(
+            label="Primary Driver", 
+            value=primary_cause,
+            delta=f"{primary_percentage}% of loss"
+        )
+
+def render_biodiversity_tab(biodiversity_data):
+    """Render the Biodiversity Impact tab"""
+    st.subheader("Biodiversity Impact Analysis")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Species at Risk")
+        biodiversity_fig = build_chart('biodiversity_impact', biodiversity_data)
+        st.plotly_chart(biodiversity_fig, use_container_width=True)
+        
+    with col2:
+        st.subheader("Risk Distribution")
+        risk_fig = build_chart('risk_distribution', biodiversity_data)
+        st.plotly_chart(risk_fig, use_container_width=True)
+    
+    st.subheader("Most Affected Species")
+    col1, col2, col3 = st.columns(3)
+    
+    top_species = biodiversity_data['top_affected_species']
+    
+    for i, (col, species) in enumerate(zip([col1, col2, col3], top_species[:3])):
+        with col:
+            st.markdown(f"#### {species['name']}")
+            st.markdown(f"**Status**: {species['status']}")
+            st.markdown(f"**Habitat Loss**: {species['habitat_loss_percent']}%")
+            st.markdown(f"**Population Decline**: {species['population_decline']}%")
+            st.progress(species['risk_level'] / 100)
+            
+            # Use risk_level_html from utils to get consistent, theme-aware risk styling
+            risk_html = risk_level_html(species['risk_level'])
+            st.markdown(f"Risk Level: {risk_html}", unsafe_allow_html=True)
+
+def render_trends_tab(deforestation_data):
+    """Render the Analysis & Trends tab"""
+    st.subheader("Deforestation Trends and Analysis")
+    
+    trend_fig = build_chart('deforestation_trend', deforestation_data)
+    st.plotly_chart(trend_fig, use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Contributing Factors")
+        st.write("""
+        The main drivers of deforestation in this region are:
+        
+        1. **Agricultural Expansion** (45%): Clearing forests for crops and livestock
+        2. **Logging Activities** (35%): Both legal and illegal timber harvesting
+        3. **Mining Operations** (12%): Extraction of minerals and resources
+        4. **Infrastructure Development** (8%): Roads, dams, and urban expansion
+        """)
+        
+    with col2:
+        st.subheader("Conservation Status")
+        
+        # Protected areas information
+        protected_data = deforestation_data['protected_areas']
+        
+        st.markdown(f"**Protected Areas**: {protected_data['total_count']} areas")
+        st.markdown(f"**Total Protected Land**: {protected_data['total_area']:,.0f} hectares")
+        st.markdown(f"**Protection Coverage**: {protected_data['protection_percentage']:.1f}% of region")
+        
+        protection_status = pd.DataFrame({
+            'Status': ['Well Protected', 'At Risk', 'Critically Endangered'],
+            'Percentage': [
+                protected_data['well_protected_percent'],
+                protected_data['at_risk_percent'], 
+                protected_data['critical_percent']
+            ]
+        })
+        
+        st.dataframe(protection_status, hide_index=True, use_container_width=True)
+    
+    st.subheader("Recommendations")
+    
+    rec_col1, rec_col2, rec_col3 = st.columns(3)
+    
+    with rec_col1:
+        st.markdown("#### Policy Actions")
+        st.markdown("• Strengthen enforcement of protected areas")
+        st.markdown("• Implement sustainable logging regulations")
+        st.markdown("• Create economic incentives for conservation")
+        
+    with rec_col2:
+        st.markdown("#### Community Involvement")
+        st.markdown("• Support indigenous land management")
+        st.markdown("• Promote eco-tourism initiatives")
+        st.markdown("• Educate local communities on conservation")
+        
+    with rec_col3:
+        st.markdown("#### Monitoring Improvements")
+        st.markdown("• Increase satellite monitoring frequency")
+        st.markdown("• Deploy ground sensors in high-risk areas")
+        st.markdown("• Create rapid response teams for new alerts")
+
+
+def sync_alert_feed(region):
+    """
+    Return this session's pending live feed update for a region (None if none)
+
+    Each session follows the feed through its own subscription, which
+    coalesces the alerts pushed since the session last looked.
+    """
+    subscription = st.session_state.get('alert_feed_subscription')
+    feed_region = None if region == "Global" else region
+    if subscription is None or subscription.closed or subscription.region != feed_region:
+        if subscription is not None:
+            subscription.close()
+        subscription = st.session_state.alert_feed_subscription = alert_feed.subscribe(feed_region)
+    return subscription.poll()
+
+def live_alert_filters(region, alert_threshold, alert_source):
+    """
+    Alert mirror filters of a region's alerts: the loaded ones plus, when the feed is on, pushed ones
+
+    The loaded alerts already follow the sensitivity; pushed alerts are
+    limited to the severities it shows.
+    """
+    if not alert_feed.live:
+        return {'source': alert_source}
+    return {
+        'source': [alert_source] + feed_sources(region),
+        'source_severities': (feed_sources(region), THRESHOLD_SEVERITIES[alert_threshold]),
+    }
+
+def render_alerts_metric(region, alert_threshold, alert_source, loaded_new_count):
+    """Render the Recent Alerts metric (a fragment on a timer while the live feed is on)"""
+    feed_count = (detection_db.count_alerts(source=feed_sources(region),
+                                            severities=THRESHOLD_SEVERITIES[alert_threshold])
+                  if alert_feed.live else 0)
+    st.metric(
+        label="Recent Alerts", 
+        value=detection_db.count_alerts(**live_alert_filters(region, alert_threshold, alert_source)),
+        delta=f"{loaded_new_count + feed_count} new"
+    )
+
+def render_alert_panel(selected_region, alert_threshold, alert_source, loaded_new_count):
+    """
+    Render the alert panel
+
+    While the live feed is on this runs as a fragment on a timer: pushed
+    alerts show up (with a toast) without rerunning the rest of the dashboard.
+    """
+    source_filters = live_alert_filters(selected_region, alert_threshold, alert_source)
+    feed_count = 0
+    if alert_feed.live:
+        severities = THRESHOLD_SEVERITIES[alert_threshold]
+        update = sync_alert_feed(selected_region)
+        if update is not None and not update.reset:
+            pushed = int(update.alerts['severity'].isin(severities).sum())
+            if pushed > 0:
+                st.toast(f"{pushed} new or updated alert{'s' if pushed != 1 else ''}", icon="🚨")
+        feed_count = detection_db.count_alerts(source=feed_sources(selected_region), severities=severities)
+    
+    if detection_db.count_alerts(**source_filters) == 0:
+        st.info("No deforestation alerts detected for the selected region and sensitivity level.")
+        return
+    
+    user_id = current_user_id()
+    unread_count = alert_state.unread_count(user_id, **source_filters)
+    
+    # Alert panel with color-coded styling
+    alert_header = (f"⚠️ Recent Deforestation Alerts ({loaded_new_count + feed_count} new, "
+                    f"{unread_count} unread)")
+    with st.expander(alert_header, expanded=True):
+        # Add filter options
+        col1, col2 = st.columns(2)
+        with col1:
+            severity_filter = st.multiselect("Filter by Severity:", 
+                options=["High", "Medium", "Low"], 
+                default=["High", "Medium", "Low"])
+        
+        with col2:
+            days_filter = st.slider("Show alerts from the last X days:", 
+                min_value=1, max_value=30, value=30)
+        
+        # Filter alerts based on user selection
+        alert_filters = {
+            **source_filters,
+            'severities': severity_filter,
+            'since': datetime.now() - timedelta(days=days_filter + 1),
+        }
+        num_filtered = detection_db.count_alerts(**alert_filters)
+        
+        if num_filtered > 0:
+            # Paginate so the number of widgets stays the same no matter
+            # how many alerts match the filters
+            num_pages = max(1, -(-num_filtered // ALERTS_PER_PAGE))
+            page = 1
+            if num_pages > 1:
+                # Keep the page in range when the filters shrink the result
+                if st.session_state.get('alert_page', 1) > num_pages:
+                    st.session_state.alert_page = num_pages
+                page = st.number_input(f"Page (of {num_pages}):", min_value=1,
+                                       max_value=num_pages, step=1, key="alert_page")
+            page_alerts = detection_db.query_alerts(**alert_filters, limit=ALERTS_PER_PAGE,
+                                                    offset=(page - 1) * ALERTS_PER_PAGE)
+            
+            # All cards of the page go out as a single HTML block
+            read_ids = alert_state.read_ids(user_id, page_alerts.index)
+            st.markdown(alert_cards_html(page_alerts, get_current_theme(), read_ids), unsafe_allow_html=True)
+            
+            # Per-alert actions work on the alert picked from the current page
+            col1, col2, col3 = st.columns([2, 1, 1])
+            with col1:
+                selected_alert = st.selectbox(
+                    "Selected alert:",
+                    options=list(page_alerts.index),
+                    format_func=lambda i: alert_label(page_alerts.loc[i]),
+                    key="alert_select",
+                    label_visibility="collapsed"
+                )
+            alert = page_alerts.loc[selected_alert]
+            with col2:
+                if st.button("🗺️ View on Map", key="map_btn", use_container_width=True):
+                    st.session_state.selected_lat = alert['lat']
+                    st.session_state.selected_lon = alert['lon']
+                    st.rerun()
+            with col3:
+                # Callbacks run before the panel is redrawn, so no rerun is needed
+                st.button("✓ Mark Read", key="read_btn", use_container_width=True,
+                          disabled=selected_alert in read_ids,
+                          on_click=mark_alerts_read, args=(user_id, [selected_alert]))
+        else:
+            st.info("No alerts match your current filter settings.")
+        
+        # Action buttons for all alerts with enhanced styling
+        st.markdown("<div style='margin-top: 15px;'></div>", unsafe_allow_html=True)
+        
+        # Create a nice container for the action buttons
+        current_theme = get_current_theme()
+        bg_color = "rgba(255,255,255,0.05)" if current_theme == "dark" else "rgba(0,0,0,0.02)"
+        border_color = "rgba(255,255,255,0.1)" if current_theme == "dark" else "rgba(0,0,0,0.05)"
+        
+        st.markdown(f"""
+        <div style="background-color: {bg_color}; border: 1px solid {border_color}; 
+            border-radius: 5px; padding: 15px; margin-bottom: 15px;">
+            <div style="font-weight: bold; margin-bottom: 10px; font-size: 16px;">Alert Management</div>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        col1, col2, col3 = st.columns(3)
+        
+        # Mark All as Read button with custom HTML and improved styling
+        with col1:
+            st.button("✓ Mark All as Read", key="mark_all_btn", use_container_width=True,
+                      disabled=unread_count == 0,
+                      on_click=mark_all_alerts_read, args=(user_id, source_filters))
+        
+        # Export Alerts: the file is streamed to disk in chunks on request,
+        # then offered as a download
+        with col2:
+            with st.popover("📊 Export Alerts", use_container_width=True):
+                export_format = st.radio("Format:", list(EXPORT_FORMATS), horizontal=True, key="export_format")
+                export_scope = st.radio("Alerts:", ["Current filters", "Full history"], horizontal=True,
+                                        key="export_scope")
+                if st.button("Prepare export", key="export_btn", use_container_width=True):
+                    discard_alert_export()
+                    if export_scope == "Current filters":
+                        export_filters = alert_filters
+                    else:
+                        export_filters = {'region': selected_region, 'distinct': True}
+                    with st.spinner("Exporting alerts..."):
+                        path, rows = export_to_temp_file(export_format, **export_filters)
+                    extension, mime = EXPORT_FORMATS[export_format]
+                    st.session_state.alert_export = {
+                        'path': path,
+                        'rows': rows,
+                        'mime': mime,
+                        'file_name': f"alerts_{selected_region.lower().replace(' ', '_')}{extension}",
+                    }
+                
+                export = st.session_state.get('alert_export')
+                if export:
+                    with open(export['path'], 'rb') as f:
+                        st.download_button(
+                            f"⬇️ Download {export['rows']:,} alerts",
+                            data=f,
+                            file_name=export['file_name'],
+                            mime=export['mime'],
+                            key="export_download",
+                            on_click=discard_alert_export,
+                            use_container_width=True
+                        )
+        
+        # Weekly reports are built by the background scheduler; the latest
+        # finished one is served straight from disk
+        with col3:
+            with st.popover("📅 Weekly Report", use_container_width=True):
+                schedule = report_scheduler.get_schedule(selected_region, alert_threshold)
+                if schedule is None:
+                    if st.button("📅 Schedule Report", key="schedule_btn", use_container_width=True):
+                        report_scheduler.schedule(selected_region, alert_threshold, user_id)
+                        show_notification("Weekly report scheduled", icon="📅")
+                        st.rerun()
+                else:
+                    st.caption(f"Next report: {schedule['next_run_at']:%Y-%m-%d %H:%M}")
+                    if st.button("Cancel weekly report", key="unschedule_btn", use_container_width=True):
+                        report_scheduler.unschedule(selected_region, alert_threshold)
+                        st.rerun()
+                
+                report = report_scheduler.latest_report(selected_region, alert_threshold)
+                if report:
+                    with open(report['path'], 'rb') as f:
+                        st.download_button(
+                            f"⬇️ Report of {report['generated_at']:%Y-%m-%d}",
+                            data=f,
+                            file_name=os.path.basename(report['path']),
+                            mime="text/html",
+                            key="report_download",
+                            use_container_width=True
+                        )
+                elif report_scheduler.pending_job(selected_region, alert_threshold):
+                    st.caption("The first report is being built...")
+
 def main():
+    # Cache prewarming, background data refreshes, report builds and
+    # notification delivery (started once per process)
+    prewarm.start()
+    data_service.start()
+    report_scheduler.start()
+    if notification_dispatcher.start(load_alerts=get_alert_data):
+        # Subscribers hear of new alerts from the data refreshes and the live
+        # feed, whatever views the open sessions show
+        data_service.add_refresh_listener(notification_dispatcher.submit_subscribed)
+        alert_feed.add_listener(notification_dispatcher.submit_feed)
+    alert_feed.start()
+    
     # Sidebar
     with st.sidebar:
         st.image("assets/forest_logo.svg", width=80)
@@ -150,27 +734,34 @@ def main():
                 st.markdown("⬜")
             st.caption("High")
         
-        # Notification settings
-        notify_email = st.checkbox("📧 Email Notifications", value=False)
-        if notify_email:
-            email = st.text_input("Email Address")
-            if email:
-                st.success("Email notifications enabled")
-        
-        notify_sms = st.checkbox("📱 SMS Notifications", value=False)
-        if notify_sms:
-            phone = st.text_input("Phone Number")
-            if phone:
-                st.success("SMS notifications enabled")
+        # Notification settings: new alerts of the selected region are sent as
+        # digests by the background dispatcher (see notifications.py)
+        notify_email = notification_setting("email", "📧 Email Notifications", "Email Address",
+                                            selected_region, alert_threshold)
+        notify_sms = notification_setting("sms", "📱 SMS Notifications", "Phone Number",
+                                          selected_region, alert_threshold)
+        if not signed_in():
+            st.caption("Not signed in: read alerts and notification settings are kept for this "
+                       "browser's link. Bookmark it to keep them.")
             
         st.markdown("---")
-        st.info("🔄 Dashboard updates every 24 hours with new satellite data from global monitoring stations.")
+        refresh_hours = (config.DATA_REFRESH_SECONDS or config.DATA_TTL_SECONDS) / 3600
+        st.info(f"🔄 Dashboard updates every {refresh_hours:g} hours with new satellite data from global monitoring stations.")
 
     # Main content
-    # Load data based on filters
-    deforestation_data = load_deforestation_data(selected_region, selected_year_range)
-    biodiversity_data = load_biodiversity_data(selected_region, selected_year_range)
-    alert_data = load_alert_data(selected_region, alert_threshold)
+    # Load data based on filters (shared read-only datasets, computed once per process)
+    deforestation_data = get_deforestation_data(selected_region, selected_year_range)
+    biodiversity_data = get_biodiversity_data(selected_region, selected_year_range)
+    alert_data = get_alert_data(selected_region, alert_threshold)
+    
+    # The alert panel and metric are indexed queries against the alert mirror,
+    # which also holds the alerts pushed by the live feed (source feed:<region>)
+    alert_source = detection_db.mirror_alerts(
+        dataset_key('load_alert_data', selected_region, alert_threshold), selected_region, alert_data
+    )
+    # Get the new alerts count (kept in the frame's metadata)
+    new_alerts_count = alert_data.attrs.get('new_alerts_count', 0)
+    feed_interval = config.ALERT_FEED_POLL_SECONDS if alert_feed.live else None
     
     # Header with key metrics
     st.title(f"Deforestation & Biodiversity Dashboard: {selected_region}")
@@ -205,376 +796,42 @@ def main():
         )
     
     with col4:
-        # Get the new alerts count (it's a single value)
-        new_alerts_count = int(alert_data['new_alerts_count'].iloc[0]) if 'new_alerts_count' in alert_data else 0
-        
-        st.metric(
-            label="Recent Alerts", 
-            value=len(alert_data),
-            delta=f"{new_alerts_count} new"
-        )
+        st.fragment(render_alerts_metric, run_every=feed_interval)(selected_region, alert_threshold, alert_source,
+                                                                  new_alerts_count)
     
-    # Enhanced Alerts section
-    if len(alert_data) > 0:
-        # Get the new alerts count (it's a single value)
-        new_alerts_count = int(alert_data['new_alerts_count'].iloc[0]) if 'new_alerts_count' in alert_data else 0
-        
-        # Show a notification for new alerts if not shown yet
-        if new_alerts_count > 0 and not st.session_state.notification_shown:
-            st.balloons()
-            st.session_state.notification_shown = True
-            
-        # Alert panel with color-coded styling
-        alert_header = f"⚠️ Recent Deforestation Alerts ({new_alerts_count} new)"
-        with st.expander(alert_header, expanded=True):
-            # Add filter options
-            col1, col2 = st.columns(2)
-            with col1:
-                severity_filter = st.multiselect("Filter by Severity:", 
-                    options=["High", "Medium", "Low"], 
-                    default=["High", "Medium", "Low"])
-            
-            with col2:
-                days_filter = st.slider("Show alerts from the last X days:", 
-                    min_value=1, max_value=30, value=30)
-            
-            # Filter alerts based on user selection
-            filtered_alerts = alert_data[
-                (alert_data['severity'].isin(severity_filter)) & 
-                ((datetime.now() - alert_data['date']).dt.days <= days_filter)
-            ]
-            
-            if len(filtered_alerts) > 0:
-                # Create custom dataframe display
-                for i, alert in filtered_alerts.iterrows():
-                    # Determine severity color and icon
-                    severity_color = "red" if alert['severity'] == "High" else "orange" if alert['severity'] == "Medium" else "green"
-                    severity_icon = "🔴" if alert['severity'] == "High" else "🟠" if alert['severity'] == "Medium" else "🟢"
-                    
-                    # Create an enhanced alert card with custom styling
-                    current_theme = get_current_theme()
-                    bg_color = "rgba(255,255,255,0.05)" if current_theme == "dark" else "rgba(0,0,0,0.02)"
-                    border_color = "rgba(255,255,255,0.1)" if current_theme == "dark" else "rgba(0,0,0,0.05)"
-                    
-                    # Format date to show relative time (e.g., "2 days ago")
-                    time_ago = get_time_since(alert['date'])
-                    
-                    # Create a card-style container for each alert
-                    with st.container():
-                        # Header with severity and time
-                        col1, col2 = st.columns([1, 3])
-                        with col1:
-                            st.markdown(f"<span style='font-size: 24px;'>{severity_icon}</span>", unsafe_allow_html=True)
-                        with col2:
-                            st.markdown(f"<span style='color:{severity_color}; font-weight:bold;'>{alert['severity']} Alert</span> • {time_ago}", unsafe_allow_html=True)
-                        
-                        # Alert details
-                        st.markdown(f"**{alert['location']}**")
-                        st.write(alert['description'])
-                        st.markdown(f"*Affected Area: {alert['area_hectares']:.1f} hectares*")
-                        
-                        # Action buttons using native Streamlit components
-                        col1, col2, col3 = st.columns([1, 1, 2])
-                        with col1:
-                            if st.button("🗺️ View on Map", key=f"map_btn_{i}", use_container_width=True):
-                                st.session_state.selected_lat = alert['lat']
-                                st.session_state.selected_lon = alert['lon']
-                                st.rerun()
-                        with col2:
-                            if st.button("✓ Mark Read", key=f"read_btn_{i}", use_container_width=True):
-                                st.success(f"Alert marked as read")
-                        
-                        st.markdown("---")
-                    
-                    # No need for horizontal line since we're using card-style design
-                    st.markdown("<div style='height: 5px;'></div>", unsafe_allow_html=True)
-            else:
-                st.info("No alerts match your current filter settings.")
-            
-            # Action buttons for all alerts with enhanced styling
-            st.markdown("<div style='margin-top: 15px;'></div>", unsafe_allow_html=True)
-            
-            # Create a nice container for the action buttons
-            current_theme = get_current_theme()
-            bg_color = "rgba(255,255,255,0.05)" if current_theme == "dark" else "rgba(0,0,0,0.02)"
-            border_color = "rgba(255,255,255,0.1)" if current_theme == "dark" else "rgba(0,0,0,0.05)"
-            
-            st.markdown(f"""
-            <div style="background-color: {bg_color}; border: 1px solid {border_color}; 
-                border-radius: 5px; padding: 15px; margin-bottom: 15px;">
-                <div style="font-weight: bold; margin-bottom: 10px; font-size: 16px;">Alert Management</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            col1, col2, col3 = st.columns(3)
-            
-            # Mark All as Read button with custom HTML and improved styling
-            with col1:
-                if st.button("✓ Mark All as Read", key="mark_all_btn", use_container_width=True):
-                    st.success("All alerts marked as read")
-                    st.session_state.notification_shown = False
-                    time.sleep(1)
-            
-            # Export Alerts button with custom HTML and improved styling
-            with col2:
-                if st.button("📊 Export Alerts (CSV)", key="export_btn", use_container_width=True):
-                    st.success("Alerts exported to CSV")
-            
-            # Schedule Report button with custom HTML and improved styling
-            with col3:
-                if st.button("📅 Schedule Report", key="schedule_btn", use_container_width=True):
-                    st.success("Weekly report scheduled")
-    else:
-        st.info("No deforestation alerts detected for the selected region and sensitivity level.")
+    # Show a notification for new alerts if not shown yet
+    if new_alerts_count > 0 and not st.session_state.notification_shown:
+        st.balloons()
+        st.session_state.notification_shown = True
     
-    # Tab-based layout for main content
-    tab1, tab2, tab3 = st.tabs(["Interactive Map", "Biodiversity Impact", "Analysis & Trends"])
+    # Enhanced Alerts section (follows the live feed on a timer when it is on)
+    st.fragment(render_alert_panel, run_every=feed_interval)(selected_region, alert_threshold, alert_source,
+                                                            new_alerts_count)
     
-    with tab1:
-        st.subheader("Deforestation Map")
-        col1, col2 = st.columns([3, 1])
-        
-        with col1:
-            # Interactive map
-            map_layers = {
-                'deforestation': show_deforestation,
-                'protected_areas': show_protected_areas,
-                'risk_zones': show_risk_zones
-            }
-            forest_map = create_map(deforestation_data, map_layers)
-            folium_map = forest_map._repr_html_()
-            st.components.v1.html(folium_map, height=500)
-        
-        with col2:
-            st.subheader("Map Legend")
-            st.markdown("🔴 **High Risk Areas**")
-            st.markdown("🟠 **Medium Risk Areas**")
-            st.markdown("🟢 **Low Risk Areas**")
-            st.markdown("🟦 **Protected Areas**")
-            st.markdown("🔍 **Click on markers for details**")
-            
-            st.markdown("---")
-            st.subheader("Risk Factors")
-            risk_factors = pd.DataFrame({
-                'Factor': ['Logging', 'Agriculture', 'Mining', 'Infrastructure'],
-                'Contribution (%)': [35, 45, 12, 8]
-            })
-            st.dataframe(risk_factors, hide_index=True, use_container_width=True)
-    
-        st.subheader("Time-Lapse Visualization")
-        
-        # Create a container with enhanced styling that works in both light and dark mode
-        with st.container():
-            current_theme = get_current_theme()
-            bg_color = "rgba(255,255,255,0.1)" if current_theme == "dark" else "rgba(0,0,0,0.05)"
-            
-            st.markdown(f"""
-            <div style="background-color: {bg_color}; padding: 10px; border-radius: 5px; margin-bottom: 10px; color: {st.session_state.text_color};">
-                <p style="color: {st.session_state.text_color};">This time-lapse shows the progression of deforestation across years. 
-                Move the slider to see how forest cover has changed over time.</p>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Interactive year selector with auto-play option
-            col1, col2 = st.columns([3, 1])
-            
-            with col1:
-                year_for_timelapse = st.slider(
-                    "Select year to view:",
-                    min_value=selected_year_range[0],
-                    max_value=selected_year_range[1],
-                    value=selected_year_range[0],
-                    key="timelapse_year_slider"
-                )
-            
-            with col2:
-                # Add auto-play feature
-                if 'playing_timelapse' not in st.session_state:
-                    st.session_state.playing_timelapse = False
-                    
-                if 'current_timelapse_year' not in st.session_state:
-                    st.session_state.current_timelapse_year = selected_year_range[0]
-                
-                # Toggle button for play/pause with custom HTML for horizontal text
-                play_label = "⏸️ Pause" if st.session_state.playing_timelapse else "▶️ Play"
-                
-                play_html = f"""
-                <button 
-                    style="width:100%; padding:8px; background-color:{'#2E2E2E' if get_current_theme() == 'dark' else '#F0F2F6'}; 
-                    color:{'#FFFFFF' if get_current_theme() == 'dark' else '#262730'}; 
-                    border:1px solid {'rgba(255,255,255,0.2)' if get_current_theme() == 'dark' else 'rgba(0,0,0,0.1)'};
-                    border-radius:5px; cursor:pointer; font-family:Arial; writing-mode:horizontal-tb !important;
-                    text-orientation:mixed !important;" 
-                    onclick="document.getElementById('play_timelapse').click()">
-                    {play_label}
-                </button>
-                """
-                st.markdown(play_html, unsafe_allow_html=True)
-                
-                # Hidden button for functionality (with minimal height to hide it)
-                st.markdown(f"<div style='height:0px; overflow:hidden;'>", unsafe_allow_html=True)
-                if st.button(play_label, key="play_timelapse"):
-                    st.session_state.playing_timelapse = not st.session_state.playing_timelapse
-                    if st.session_state.playing_timelapse:
-                        st.session_state.current_timelapse_year = selected_year_range[0]
-                        # This will cause the app to rerun in the next cycle
-                        st.rerun()
-                st.markdown("</div>", unsafe_allow_html=True)
-            
-            # Auto-advance the year if playing
-            if st.session_state.playing_timelapse:
-                if st.session_state.current_timelapse_year < selected_year_range[1]:
-                    st.session_state.current_timelapse_year += 1
-                    # Use this instead of the slider value when in auto-play mode
-                    year_for_timelapse = st.session_state.current_timelapse_year
-                    # Add small delay for animation effect
-                    time.sleep(1.5)
-                    # Rerun to show next year
-                    st.rerun()
-                else:
-                    # End of the time range, stop playing
-                    st.session_state.playing_timelapse = False
-            
-            # Show the year prominently with correct color for the theme
-            st.markdown(f"<h2 style='text-align: center; color: {st.session_state.text_color};'>{year_for_timelapse}</h2>", unsafe_allow_html=True)
-            
-            # Create the map for the selected year
-            timelapse_map = create_time_lapse_map(deforestation_data, year_for_timelapse)
-            folium_timelapse = timelapse_map._repr_html_()
-            st.components.v1.html(folium_timelapse, height=450)
-            
-            # Show year-specific statistics below the map
-            col1, col2, col3 = st.columns(3)
-            
-            # Calculate year-specific values
-            year_data = deforestation_data['yearly_data'].get(year_for_timelapse, {})
-            prev_year_data = deforestation_data['yearly_data'].get(year_for_timelapse-1, year_data)
-            
-            # Total deforestation for the year
-            with col1:
-                year_loss = year_data.get('loss_hectares', 0)
-                prev_year_loss = prev_year_data.get('loss_hectares', year_loss)
-                percent_change = ((year_loss - prev_year_loss) / max(prev_year_loss, 1)) * 100
-                
-                st.metric(
-                    label=f"Deforestation in {year_for_timelapse}", 
-                    value=f"{year_loss:,.0f} ha",
-                    delta=f"{percent_change:.1f}% from previous year",
-                    delta_color="inverse"
-                )
-            
-            # Affected species
-            with col2:
-                affected_species = year_data.get('affected_species', 0)
-                st.metric(
-                    label="Affected Species", 
-                    value=affected_species
-                )
-            
-            # Primary cause
-            with col3:
-                primary_cause = year_data.get('primary_cause', 'Unknown')
-                primary_percentage = year_data.get('primary_cause_percentage', 0)
-                st.metric(
-                    label="Primary Driver", 
-                    value=primary_cause,
-                    delta=f"{primary_percentage}% of loss"
-                )
-        
-    with tab2:
-        st.subheader("Biodiversity Impact Analysis")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Species at Risk")
-            biodiversity_fig = plot_biodiversity_impact(biodiversity_data)
-            st.plotly_chart(biodiversity_fig, use_container_width=True)
-            
-        with col2:
-            st.subheader("Risk Distribution")
-            risk_fig = plot_risk_distribution(biodiversity_data)
-            st.plotly_chart(risk_fig, use_container_width=True)
-        
-        st.subheader("Most Affected Species")
-        col1, col2, col3 = st.columns(3)
-        
-        top_species = biodiversity_data['top_affected_species']
-        
-        for i, (col, species) in enumerate(zip([col1, col2, col3], top_species[:3])):
-            with col:
-                st.markdown(f"#### {species['name']}")
-                st.markdown(f"**Status**: {species['status']}")
-                st.markdown(f"**Habitat Loss**: {species['habitat_loss_percent']}%")
-                st.markdown(f"**Population Decline**: {species['population_decline']}%")
-                st.progress(species['risk_level'] / 100)
-                
-                # Use risk_level_html from utils to get consistent, theme-aware risk styling
-                risk_html = risk_level_html(species['risk_level'])
-                st.markdown(f"Risk Level: {risk_html}", unsafe_allow_html=True)
+    # Tab-based layout for main content
+    map_layers = {
+        'deforestation': show_deforestation,
+        'protected_areas': show_protected_areas,
+        'risk_zones': show_risk_zones
+    }
+    tab_renderers = {
+        "Interactive Map": lambda: render_map_tab(deforestation_data, map_layers, selected_year_range),
+        "Biodiversity Impact": lambda: render_biodiversity_tab(biodiversity_data),
+        "Analysis & Trends": lambda: render_trends_tab(deforestation_data),
+    }
     
-    with tab3:
-        st.subheader("Deforestation Trends and Analysis")
-        
-        trend_fig = plot_deforestation_trend(deforestation_data)
-        st.plotly_chart(trend_fig, use_container_width=True)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Contributing Factors")
-            st.write("""
-            The main drivers of deforestation in this region are:
-            
-            1. **Agricultural Expansion** (45%): Clearing forests for crops and livestock
-            2. **Logging Activities** (35%): Both legal and illegal timber harvesting
-            3. **Mining Operations** (12%): Extraction of minerals and resources
-            4. **Infrastructure Development** (8%): Roads, dams, and urban expansion
-            """)
-            
-        with col2:
-            st.subheader("Conservation Status")
-            
-            # Protected areas information
-            protected_data = deforestation_data['protected_areas']
-            
-            st.markdown(f"**Protected Areas**: {protected_data['total_count']} areas")
-            st.markdown(f"**Total Protected Land**: {protected_data['total_area']:,.0f} hectares")
-            st.markdown(f"**Protection Coverage**: {protected_data['protection_percentage']:.1f}% of region")
-            
-            protection_status = pd.DataFrame({
-                'Status': ['Well Protected', 'At Risk', 'Critically Endangered'],
-                'Percentage': [
-                    protected_data['well_protected_percent'],
-                    protected_data['at_risk_percent'], 
-                    protected_data['critical_percent']
-                ]
-            })
-            
-            st.dataframe(protection_status, hide_index=True, use_container_width=True)
-        
-        st.subheader("Recommendations")
-        
-        rec_col1, rec_col2, rec_col3 = st.columns(3)
-        
-        with rec_col1:
-            st.markdown("#### Policy Actions")
-            st.markdown("• Strengthen enforcement of protected areas")
-            st.markdown("• Implement sustainable logging regulations")
-            st.markdown("• Create economic incentives for conservation")
-            
-        with rec_col2:
-            st.markdown("#### Community Involvement")
-            st.markdown("• Support indigenous land management")
-            st.markdown("• Promote eco-tourism initiatives")
-            st.markdown("• Educate local communities on conservation")
-            
-        with rec_col3:
-            st.markdown("#### Monitoring Improvements")
-            st.markdown("• Increase satellite monitoring frequency")
-            st.markdown("• Deploy ground sensors in high-risk areas")
-            st.markdown("• Create rapid response teams for new alerts")
+    if LAZY_TABS:
+        # Only the open tab is computed; switching tabs reruns the script and
+        # previously built maps/figures come back from the render caches
+        active_tab = st.radio("View:", list(tab_renderers), horizontal=True,
+                              key="active_tab", label_visibility="collapsed")
+        tab_renderers[active_tab]()
+    else:
+        for tab, render_tab in zip(st.tabs(list(tab_renderers)), tab_renderers.values()):
+            with tab:
+                render_tab()
     
+
     # Footer
     st.markdown("---")
     st.caption("© 2023 Forest Guardian | Data updated daily | Sources: Global Forest Watch, IUCN Red List, NASA Earth Observations")
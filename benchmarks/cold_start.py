@@ -0,0 +1,113 @@
+"""
+Cold-start benchmark for the Forest Guardian dashboard.
+
+Every measurement runs in a fresh Python interpreter so nothing is served
+from an already-populated ``sys.modules``. Two things are measured:
+
+* import time of the heavy third-party packages (pandas, folium, plotly, ...)
+  and of the dashboard's own modules
+* the first full script run of ``app.py`` (via Streamlit's AppTest), together
+  with the heavy packages that run actually pulled in
+
+Usage:
+    python benchmarks/cold_start.py [--repeat N] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules whose import cost is tracked
+MODULES = [
+    "numpy",
+    "pandas",
+    "folium",
+    "plotly.express",
+    "plotly.graph_objects",
+    "streamlit",
+    "utils",
+    "data_processor",
+    "map_visualization",
+    "charts",
+]
+
+# Heavy packages that should only be imported when a view needs them
+HEAVY_PACKAGES = ["pandas", "folium", "plotly.express"]
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+FIRST_RUN_SNIPPET = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=120)
+at.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "exceptions": [str(e.value) for e in at.exception],
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+def run_snippet(snippet):
+    """Run a snippet in a fresh interpreter from the repo root and return its last output line"""
+    result = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=REPO_ROOT,
+        # Background cache prewarming would compete with the run being timed
+        env={**os.environ, "FOREST_GUARDIAN_PREWARM_WORKERS": "0"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+def time_import(module, repeat):
+    """Return the median cold import time of a module in seconds"""
+    samples = [float(run_snippet(IMPORT_SNIPPET.format(module=module))) for _ in range(repeat)]
+    return statistics.median(samples)
+
+def time_first_run(repeat):
+    """Return the median time of the first app.py run and the heavy packages it loaded"""
+    runs = [json.loads(run_snippet(FIRST_RUN_SNIPPET.format(heavy=HEAVY_PACKAGES))) for _ in range(repeat)]
+    errors = [e for run in runs for e in run["exceptions"]]
+    if errors:
+        raise RuntimeError(f"app.py raised during the first run: {errors[0]}")
+    return statistics.median(run["seconds"] for run in runs), runs[-1]["loaded"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure dashboard cold-start time")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per measurement")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    imports = {module: time_import(module, args.repeat) for module in MODULES}
+    first_run, loaded = time_first_run(args.repeat)
+
+    if args.json:
+        print(json.dumps({
+            "import_seconds": imports,
+            "first_run_seconds": first_run,
+            "heavy_packages_loaded": loaded,
+        }, indent=2))
+        return
+
+    print(f"{'module':<24}{'import (ms)':>12}")
+    for module, seconds in imports.items():
+        print(f"{module:<24}{seconds * 1000:>12.1f}")
+    print()
+    print(f"first app.py run: {first_run * 1000:.1f} ms")
+    print(f"heavy packages loaded by first run: {', '.join(loaded) or 'none'}")
+
+if __name__ == "__main__":
+    main()
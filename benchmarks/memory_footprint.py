@@ -0,0 +1,92 @@
+"""
+Memory footprint of the loader output frames, before and after compaction.
+
+Builds ``raw_data`` (monthly deforestation) and alert frames of the same size
+in two layouts and reports their deep memory usage:
+
+* legacy  - the original layout: object string columns, int64/float64
+  numbers, a formatted ``location`` string and ``new_alerts_count`` repeated
+  in every alert row
+* compact - the layout the loaders return now (see compact_monthly() and
+  compact_alerts() in data_processor)
+
+Usage:
+    python benchmarks/memory_footprint.py [--rows 1000000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from data_processor import ALERT_DESCRIPTIONS, BASE_LOSS_RATES, compact_alerts, compact_monthly
+
+def legacy_monthly(rows, rng):
+    """Monthly deforestation rows in the original layout"""
+    return pd.DataFrame({
+        'year': rng.integers(2015, 2026, rows),
+        'month': rng.integers(1, 13, rows),
+        'deforestation_hectares': rng.uniform(1e4, 3e5, rows),
+        'region': np.array(list(BASE_LOSS_RATES), dtype=object)[rng.integers(0, len(BASE_LOSS_RATES), rows)],
+    })
+
+def legacy_alerts(rows, rng):
+    """Alert rows in the original layout"""
+    severity_options = np.array(list(ALERT_DESCRIPTIONS), dtype=object)
+    severity_index = rng.integers(0, 3, rows)
+    descriptions = np.array([ALERT_DESCRIPTIONS[s] for s in severity_options], dtype=object)
+    lat = rng.uniform(-60, 60, rows)
+    lon = rng.uniform(-180, 180, rows)
+    days_ago = rng.integers(0, 30, rows)
+    return pd.DataFrame({
+        'date': pd.Timestamp(datetime.now()) - pd.to_timedelta(days_ago, unit='D'),
+        'location': [f"{a:.2f}°, {b:.2f}°" for a, b in zip(lat, lon)],
+        'severity': severity_options[severity_index],
+        'area_hectares': rng.uniform(10, 1000, rows),
+        'description': descriptions[severity_index, rng.integers(0, 3, rows)],
+        'lat': lat,
+        'lon': lon,
+        'is_new': days_ago < 5,
+        'new_alerts_count': int((days_ago < 5).sum()),
+    })
+
+def footprint(df):
+    """Deep memory usage of a DataFrame in bytes"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare legacy and compact loader frame footprints")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows per frame")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    monthly = legacy_monthly(args.rows, rng)
+    alerts = legacy_alerts(args.rows, rng)
+    results = {
+        'raw_data': (footprint(monthly), footprint(compact_monthly(monthly))),
+        'alerts': (footprint(alerts), footprint(compact_alerts(alerts.drop(columns=['location', 'new_alerts_count'])))),
+    }
+
+    if args.json:
+        print(json.dumps({
+            "rows": args.rows,
+            "frames": {name: {"legacy_bytes": before, "compact_bytes": after}
+                       for name, (before, after) in results.items()},
+        }, indent=2))
+        return
+
+    print(f"{args.rows:,} rows per frame")
+    print(f"{'frame':<12}{'legacy (MB)':>14}{'compact (MB)':>14}{'saved':>8}")
+    for name, (before, after) in results.items():
+        print(f"{name:<12}{before / 2**20:>14.1f}{after / 2**20:>14.1f}{1 - after / before:>8.0%}")
+
+if __name__ == "__main__":
+    main()
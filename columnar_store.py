@@ -0,0 +1,147 @@
+"""
+Partitioned on-disk columnar store for the dashboard datasets.
+
+Datasets are stored as Parquet files in a Hive-style layout, partitioned by
+region and year:
+
+    <root>/<dataset>/region=<region>/year=<year>/part-<id>.parquet
+
+Readers prune partitions by directory name before opening any file, read only
+the requested columns, and can push row filters down to Parquet row groups,
+so a single-region, five-year view touches five directories and only the
+columns it needs.
+
+Datasets used by the loaders in data_processor:
+
+* ``monthly``  - monthly deforestation cells (year, month, deforestation_hectares)
+* ``hotspots`` - deforestation hotspots, partitioned by year of first detection
+* ``alerts``   - deforestation alerts, partitioned by year of the alert date
+"""
+import os
+import uuid
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+# Column names of the partition keys (not stored inside the Parquet files)
+PARTITION_COLUMNS = ['region', 'year']
+
+def partition_path(root, dataset, region, year):
+    """Return the directory of one (region, year) partition"""
+    return os.path.join(root, dataset, f"region={quote(region, safe='')}", f"year={int(year)}")
+
+def write_partition(root, dataset, region, year, df, part=None):
+    """
+    Append a DataFrame to a (region, year) partition as a new Parquet file
+
+    The partition columns are dropped from the file; they are encoded in the
+    path. The file is written under a temporary name and renamed into place,
+    so readers never see a partially written file.
+
+    Parameters:
+    part: Optional file id; writing the same part again replaces that file
+          (a random id is used otherwise, i.e. the data is appended)
+
+    Returns:
+    Path of the written file
+    """
+    directory = partition_path(root, dataset, region, year)
+    os.makedirs(directory, exist_ok=True)
+    name = f"part-{part if part is not None else uuid.uuid4().hex}.parquet"
+    tmp_path = os.path.join(directory, f".{name}.tmp")
+    df.drop(columns=[c for c in PARTITION_COLUMNS if c in df.columns]).to_parquet(tmp_path, index=False)
+    path = os.path.join(directory, name)
+    os.replace(tmp_path, path)
+    return path
+
+def list_partitions(root, dataset, regions=None, years=None):
+    """
+    List the partitions of a dataset that match the given regions and years
+
+    Returns:
+    List of (region, year, directory) tuples
+    """
+    dataset_dir = os.path.join(root, dataset)
+    if not os.path.isdir(dataset_dir):
+        return []
+    regions = set(regions) if regions is not None else None
+    years = {int(y) for y in years} if years is not None else None
+
+    partitions = []
+    for region_dir in sorted(os.listdir(dataset_dir)):
+        if not region_dir.startswith("region="):
+            continue
+        region = unquote(region_dir[len("region="):])
+        if regions is not None and region not in regions:
+            continue
+        for year_dir in sorted(os.listdir(os.path.join(dataset_dir, region_dir))):
+            if not year_dir.startswith("year="):
+                continue
+            year = int(year_dir[len("year="):])
+            if years is not None and year not in years:
+                continue
+            partitions.append((region, year, os.path.join(dataset_dir, region_dir, year_dir)))
+    return partitions
+
+def remove_parts(root, dataset, prefix, keep=()):
+    """
+    Delete the part files of a dataset whose id starts with prefix, except the paths in keep
+
+    Partitions left without files are removed too.
+
+    Returns:
+    Number of files deleted
+    """
+    keep = {os.path.abspath(path) for path in keep}
+    removed = 0
+    for _, _, directory in list_partitions(root, dataset):
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.startswith(f"part-{prefix}") and name.endswith(".parquet") and os.path.abspath(path) not in keep:
+                os.remove(path)
+                removed += 1
+        if not os.listdir(directory):
+            os.rmdir(directory)
+    return removed
+
+def has_partitions(root, dataset, regions=None, years=None):
+    """Return True if at least one matching partition exists"""
+    return bool(root) and bool(list_partitions(root, dataset, regions, years))
+
+def read_dataset(root, dataset, regions=None, years=None, columns=None, filters=None):
+    """
+    Read a dataset with partition pruning and column projection
+
+    Parameters:
+    root: Root directory of the store
+    dataset: Dataset name (e.g. 'monthly')
+    regions: Regions to read (None for all)
+    years: Years to read (None for all)
+    columns: Columns to read, may include 'region' and 'year' (None for all)
+    filters: Row filters pushed down to Parquet, in pyarrow's list-of-tuples form
+
+    Returns:
+    pandas DataFrame (empty if no partition matches)
+    """
+    file_columns = None
+    if columns is not None:
+        file_columns = [c for c in columns if c not in PARTITION_COLUMNS]
+
+    frames = []
+    for region, year, directory in list_partitions(root, dataset, regions, years):
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".parquet") or filename.startswith("."):
+                continue
+            frame = pd.read_parquet(os.path.join(directory, filename), columns=file_columns, filters=filters)
+            if columns is None or 'region' in columns:
+                frame['region'] = region
+            if columns is None or 'year' in columns:
+                frame['year'] = year
+            frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(columns=columns or [])
+    df = pd.concat(frames, ignore_index=True)
+    if columns is not None:
+        df = df[list(columns)]
+    return df
@@ -0,0 +1,111 @@
+"""
+Deployment settings for Forest Guardian.
+
+Each setting can be overridden with an environment variable of the same
+name prefixed with ``FOREST_GUARDIAN_`` (e.g. ``FOREST_GUARDIAN_DATA_BUDGET_MB``).
+"""
+import os
+
+def _env(name, default, cast=str):
+    """Read a setting from the environment, falling back to the default"""
+    value = os.environ.get(f"FOREST_GUARDIAN_{name}")
+    if value is None or value == "":
+        return default
+    if cast is bool:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return cast(value)
+
+# Memory budget (in MB) for datasets shared between dashboard sessions
+DATA_BUDGET_MB = _env("DATA_BUDGET_MB", 512, int)
+
+# How long a shared dataset is served before it is regenerated (seconds)
+DATA_TTL_SECONDS = _env("DATA_TTL_SECONDS", 24 * 60 * 60, int)
+
+# Interval of the background refresh of the shared datasets (seconds). While
+# the refresher runs, datasets are rebuilt in the background and swapped in
+# instead of expiring after DATA_TTL_SECONDS; 0 disables it.
+DATA_REFRESH_SECONDS = _env("DATA_REFRESH_SECONDS", 24 * 60 * 60, int)
+
+# Directory of the shared-memory snapshot store (see shared_store.py). When
+# set, worker processes attach to published snapshots instead of generating
+# their own copies of the datasets.
+SHARED_STORE_DIR = _env("SHARED_STORE_DIR", "")
+
+# Threads prewarming every region's datasets, maps and charts when the
+# dashboard process starts (see prewarm.py); 0 disables prewarming
+PREWARM_WORKERS = _env("PREWARM_WORKERS", 2, int)
+
+# Root directory of the partitioned columnar data store (see columnar_store.py).
+# When set, the loaders read the partitions it holds instead of synthesizing data.
+DATA_STORE_DIR = _env("DATA_STORE_DIR", "")
+
+# Maximum number of hotspots read from the data store for the maps
+MAX_MAP_HOTSPOTS = _env("MAX_MAP_HOTSPOTS", 500, int)
+
+# SQLite database holding the indexed mirror of hotspots and alerts (see
+# detection_db.py)
+DATABASE_PATH = _env("DATABASE_PATH", os.path.join(os.path.expanduser("~"), ".forest_guardian", "forest_guardian.sqlite3"))
+
+# Directory of the generated weekly region reports (see report_scheduler.py)
+REPORTS_DIR = _env("REPORTS_DIR", os.path.join(os.path.expanduser("~"), ".forest_guardian", "reports"))
+
+# Worker processes building scheduled reports inside the dashboard process.
+# 0 leaves report jobs to a separate ``python report_scheduler.py run``.
+REPORT_WORKERS = _env("REPORT_WORKERS", 2, int)
+
+# Outgoing alert notifications (see notifications.py). Email is sent through
+# SMTP_HOST and SMS through the HTTP gateway at SMS_GATEWAY_URL; a channel
+# without a server is disabled.
+SMTP_HOST = _env("SMTP_HOST", "")
+SMTP_PORT = _env("SMTP_PORT", 25, int)
+SMTP_USERNAME = _env("SMTP_USERNAME", "")
+SMTP_PASSWORD = _env("SMTP_PASSWORD", "")
+SMTP_STARTTLS = _env("SMTP_STARTTLS", False, bool)
+NOTIFICATION_SENDER = _env("NOTIFICATION_SENDER", "alerts@forest-guardian.local")
+SMS_GATEWAY_URL = _env("SMS_GATEWAY_URL", "")
+
+# Messages per second sent on each channel
+EMAIL_RATE_PER_SECOND = _env("EMAIL_RATE_PER_SECOND", 10.0, float)
+SMS_RATE_PER_SECOND = _env("SMS_RATE_PER_SECOND", 1.0, float)
+
+# New alerts for a recipient are collected for this many seconds and sent as
+# one digest
+NOTIFICATION_BATCH_SECONDS = _env("NOTIFICATION_BATCH_SECONDS", 60.0, float)
+
+# Headless HTTP API (see api_server.py)
+API_HOST = _env("API_HOST", "127.0.0.1")
+API_PORT = _env("API_PORT", 8502, int)
+
+# How long an encoded API response is reused before it is rebuilt (seconds)
+API_CACHE_SECONDS = _env("API_CACHE_SECONDS", 300, int)
+
+# Live alert feed (see alert_feed.py). With ALERT_FEED_URL (the base URL of
+# an api_server.py broker, e.g. http://127.0.0.1:8502) the dashboard relays
+# its server-sent events; with ALERT_FEED_SIMULATOR a local stand-in producer
+# generates alerts instead. The alert panel picks up pushed alerts every
+# ALERT_FEED_POLL_SECONDS without rerunning the whole dashboard.
+ALERT_FEED_URL = _env("ALERT_FEED_URL", "")
+ALERT_FEED_SIMULATOR = _env("ALERT_FEED_SIMULATOR", False, bool)
+ALERT_FEED_POLL_SECONDS = _env("ALERT_FEED_POLL_SECONDS", 5.0, float)
+
+# Live map updates (see hotspot_diff.py). When set to the base URL of
+# api_server.py as reached by browsers (e.g. http://127.0.0.1:8502), the maps
+# poll it every MAP_UPDATE_SECONDS and apply hotspot changes in place instead
+# of being rebuilt when the data refreshes.
+MAP_UPDATES_URL = _env("MAP_UPDATES_URL", "")
+MAP_UPDATE_SECONDS = _env("MAP_UPDATE_SECONDS", 60, int)
+
+# Local caching proxy of the basemap tiles (see tile_proxy.py). When
+# TILE_PROXY_URL is set to the proxy's base URL as reached by browsers (e.g.
+# http://127.0.0.1:8503), the maps load their tiles from it instead of from
+# the provider. The proxy fetches missing tiles from TILE_UPSTREAM_URL and
+# keeps up to TILE_CACHE_MB of them in TILE_CACHE_DIR; at startup it
+# prefetches each region's extent at its map's zoom and TILE_PREFETCH_ZOOMS
+# levels below.
+TILE_PROXY_URL = _env("TILE_PROXY_URL", "")
+TILE_PROXY_HOST = _env("TILE_PROXY_HOST", "127.0.0.1")
+TILE_PROXY_PORT = _env("TILE_PROXY_PORT", 8503, int)
+TILE_UPSTREAM_URL = _env("TILE_UPSTREAM_URL", "https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png")
+TILE_CACHE_DIR = _env("TILE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".forest_guardian", "tiles"))
+TILE_CACHE_MB = _env("TILE_CACHE_MB", 1024, int)
+TILE_PREFETCH_ZOOMS = _env("TILE_PREFETCH_ZOOMS", 2, int)
@@ -1,57 +1,178 @@
+import zlib
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
-def load_deforestation_data(region, year_range):
+import config
+import columnar_store
+from regions import get_region
+
+# Base yearly forest loss (hectares) by region
+BASE_LOSS_RATES = {
+    "Amazon": 2000000,
+    "Congo Basin": 1500000,
+    "Southeast Asia": 1800000,
+    "Central America": 900000,
+    "Global": 5000000
+}
+
+# First year of the synthetic loss trend (loss grows 5% per year from here)
+BASE_YEAR = 2015
+
+# Dry-season months with more deforestation, by region
+DRY_SEASON_MONTHS = {
+    "Amazon": [6, 7, 8, 9],
+    "Southeast Asia": [1, 2, 3]
+}
+
+# Alert descriptions by severity
+ALERT_DESCRIPTIONS = {
+    "Low": [
+        "Small-scale clearing detected",
+        "Minor forest disturbance observed",
+        "Limited logging activity detected"
+    ],
+    "Medium": [
+        "Moderate clearing for agriculture",
+        "Significant logging operations detected",
+        "Road construction causing forest fragmentation"
+    ],
+    "High": [
+        "Large-scale forest clearing for palm oil",
+        "Massive deforestation for cattle ranching",
+        "Critical habitat destruction by mining operations"
+    ]
+}
+
+# Synthetic alerts are issued at a steady pace from this date (see load_alert_data)
+ALERT_EPOCH = datetime(2000, 1, 1)
+
+# Share of the synthetic alerts shown at each sensitivity, in thirds: alert n
+# is shown when n % 3 is below the sensitivity's tiers
+ALERT_THRESHOLD_TIERS = {
+    "Low": 3,
+    "Medium": 2,
+    "High": 1
+}
+
+def seasonal_factor(region, month):
+    """More deforestation during dry seasons (adjust based on region)"""
+    return 1.3 if month in DRY_SEASON_MONTHS.get(region, []) else 1.0
+
+def make_rng(*key):
+    """
+    Return a random generator seeded from a key such as (stream, region, year, snapshot version)
+
+    The same key always gives the same stream, in every process (crc32 is used
+    because Python's hash() of strings is salted per process), so loader results
+    are reproducible and safe to cache.
+    """
+    return np.random.default_rng([zlib.crc32(str(part).encode("utf-8")) for part in key])
+
+def synthesize_monthly_loss(region, year, snapshot_version=0):
+    """
+    Synthesize the monthly deforestation of one region-year
+
+    Each year draws from its own stream, so a single year can be recomputed
+    without regenerating the rest of the range.
+    """
+    rng = make_rng('monthly', region, year, snapshot_version)
+
+    # Add some yearly variation with an increasing trend
+    base_loss = BASE_LOSS_RATES.get(region, 1000000)
+    yearly_loss = base_loss * (1 + ((year - BASE_YEAR) * 0.05)) * rng.uniform(0.9, 1.1)
+
+    # Add seasonal patterns
+    months = np.arange(1, 13)
+    seasonal = np.array([seasonal_factor(region, month) for month in months])
+    return pd.DataFrame({
+        'year': year,
+        'month': months,
+        'deforestation_hectares': yearly_loss / 12 * seasonal * rng.uniform(0.8, 1.2, 12),
+        'region': region
+    })
+
+# Alert severities included at each alert sensitivity when alerts come from the store
+THRESHOLD_SEVERITIES = {
+    "Low": ["Low", "Medium", "High"],
+    "Medium": ["Medium", "High"],
+    "High": ["High"]
+}
+
+# Alert severities, from least to most severe
+SEVERITY_DTYPE = pd.CategoricalDtype(["Low", "Medium", "High"], ordered=True)
+
+def compact_monthly(df):
+    """Cast a monthly deforestation frame to compact dtypes (categorical region, small ints, float32)"""
+    return df.astype({'year': 'int16', 'month': 'int8', 'deforestation_hectares': 'float32', 'region': 'category'})
+
+def compact_alerts(df):
+    """Cast an alert frame to compact dtypes (categorical text, float32 measures)"""
+    return df.astype({'severity': SEVERITY_DTYPE, 'description': 'category', 'area_hectares': 'float32',
+                      'lat': 'float32', 'lon': 'float32', 'is_new': 'bool'})
+
+def _stored_years(dataset, region, years):
+    """Return the years of the given range that have partitions in the data store"""
+    if not config.DATA_STORE_DIR:
+        return set()
+    partitions = columnar_store.list_partitions(config.DATA_STORE_DIR, dataset, [region], years)
+    return {year for _, year, _ in partitions}
+
+def read_stored_monthly(region, years):
+    """Read monthly deforestation cells of a region from the data store (summed per month)"""
+    df = columnar_store.read_dataset(
+        config.DATA_STORE_DIR, 'monthly', regions=[region], years=years,
+        columns=['year', 'month', 'deforestation_hectares']
+    )
+    # The store may hold many grid cells per month; the dashboard works on monthly totals
+    df = df.groupby(['year', 'month'], as_index=False)['deforestation_hectares'].sum()
+    df['region'] = region
+    return compact_monthly(df)
+
+def read_stored_hotspots(region, years):
+    """Read the largest hotspots of a region from the data store (capped for the maps)"""
+    df = columnar_store.read_dataset(
+        config.DATA_STORE_DIR, 'hotspots', regions=[region], years=years,
+        columns=['lat', 'lon', 'severity', 'area_hectares', 'first_detected', 'risk_score']
+    )
+    df = df.nlargest(config.MAX_MAP_HOTSPOTS, 'area_hectares')
+    hotspots = df.to_dict('records')
+    for spot in hotspots:
+        spot['first_detected'] = spot['first_detected'].to_pydatetime()
+    return hotspots
+
+def read_stored_alerts(region, alert_threshold, now):
+    """Read the last 30 days of alerts of a region from the data store"""
+    cutoff = now - timedelta(days=30)
+    years = range(cutoff.year, now.year + 1)
+    severities = THRESHOLD_SEVERITIES.get(alert_threshold, THRESHOLD_SEVERITIES["Medium"])
+    return columnar_store.read_dataset(
+        config.DATA_STORE_DIR, 'alerts', regions=[region], years=years,
+        columns=['date', 'severity', 'area_hectares', 'description', 'lat', 'lon'],
+        filters=[('date', '>=', pd.Timestamp(cutoff)), ('severity', 'in', severities)]
+    )
+
+def load_deforestation_data(region, year_range, snapshot_version=0):
     """
     Load and process deforestation data based on region and year range.
     In a real application, this would fetch data from an API or database.
+
+    Synthetic data is drawn from generators seeded from the region, the years
+    and snapshot_version, so the same arguments always return the same data.
     """
     # Create synthetic data for demonstration
     years = list(range(year_range[0], year_range[1] + 1))
     
-    # Base data with regional variations
-    base_loss_rates = {
-        "Amazon": 2000000,
-        "Congo Basin": 1500000,
-        "Southeast Asia": 1800000,
-        "Central America": 900000,
-        "Global": 5000000
-    }
-    
-    # Generate yearly data with some variance and a generally increasing trend
-    yearly_data = []
-    base_loss = base_loss_rates.get(region, 1000000)
-    
-    for i, year in enumerate(years):
-        # Add some yearly variation with an increasing trend
-        yearly_loss = base_loss * (1 + (i * 0.05)) * np.random.uniform(0.9, 1.1)
-        
-        # Add seasonal patterns
-        monthly_data = []
-        for month in range(1, 13):
-            # More deforestation during dry seasons (adjust based on region)
-            seasonal_factor = 1.0
-            if region == "Amazon" and month in [6, 7, 8, 9]:  # Dry season
-                seasonal_factor = 1.3
-            elif region == "Southeast Asia" and month in [1, 2, 3]:
-                seasonal_factor = 1.3
-            
-            monthly_loss = yearly_loss / 12 * seasonal_factor * np.random.uniform(0.8, 1.2)
-            
-            monthly_data.append({
-                'year': year,
-                'month': month,
-                'deforestation_hectares': monthly_loss,
-                'region': region
-            })
-        
-        yearly_data.extend(monthly_data)
-    
-    df = pd.DataFrame(yearly_data)
+    if _stored_years('monthly', region, years) == set(years):
+        # Read the region's monthly cells from the data store
+        df = read_stored_monthly(region, years)
+    else:
+        # Generate yearly data with some variance and a generally increasing trend
+        df = compact_monthly(pd.concat([synthesize_monthly_loss(region, year, snapshot_version) for year in years],
+                                       ignore_index=True))
     
     # Calculate total loss and percentage change
-    total_loss_hectares = df['deforestation_hectares'].sum()
+    total_loss_hectares = float(df['deforestation_hectares'].sum())
     
     # Calculate percentage change from first to last year
     first_year_loss = df[df['year'] == years[0]]['deforestation_hectares'].sum()
@@ -62,52 +183,50 @@ def load_deforestation_data(region, year_range):
     num_hotspots = 50
     hotspots = []
     
-    # Region-specific coordinates (approximate centers)
-    region_coords = {
-        "Amazon": (-5.0, -60.0, 12.0, 8.0),  # lat, lon, lat_spread, lon_spread
-        "Congo Basin": (0.0, 20.0, 10.0, 10.0),
-        "Southeast Asia": (5.0, 110.0, 15.0, 15.0),
-        "Central America": (15.0, -85.0, 5.0, 10.0),
-        "Global": (0.0, 0.0, 60.0, 180.0)
-    }
-    
-    center_lat, center_lon, lat_spread, lon_spread = region_coords.get(region, (0.0, 0.0, 60.0, 180.0))
-    
-    for i in range(num_hotspots):
-        # Generate random coordinates within the region
-        lat = center_lat + np.random.uniform(-lat_spread, lat_spread)
-        lon = center_lon + np.random.uniform(-lon_spread, lon_spread)
+    # Region extent (hotspots are spread over its bounding box)
+    min_lat, min_lon, max_lat, max_lon = get_region(region).bbox
+    
+    if _stored_years('hotspots', region, years):
+        # Read detected hotspots from the data store
+        hotspots = read_stored_hotspots(region, years)
+    else:
+        rng = make_rng('hotspots', region, year_range[0], year_range[1], snapshot_version)
+        for i in range(num_hotspots):
+            # Generate random coordinates within the region
+            lat = rng.uniform(min_lat, max_lat)
+            lon = rng.uniform(min_lon, max_lon)
         
-        # Generate severity (higher numbers = worse deforestation)
-        severity = np.random.choice([1, 2, 3], p=[0.3, 0.4, 0.3])
+            # Generate severity (higher numbers = worse deforestation)
+            severity = int(rng.choice([1, 2, 3], p=[0.3, 0.4, 0.3]))
         
-        # Area affected
-        area = np.random.uniform(50, 2000) * severity
+            # Area affected
+            area = rng.uniform(50, 2000) * severity
         
-        # First detection date
-        first_detected = datetime(
-            np.random.choice(years),
-            np.random.randint(1, 13),
-            np.random.randint(1, 28)
-        )
+            # First detection date
+            first_detected = datetime(
+                int(rng.choice(years)),
+                int(rng.integers(1, 13)),
+                int(rng.integers(1, 28))
+            )
         
-        hotspots.append({
-            'lat': lat,
-            'lon': lon,
-            'severity': severity,
-            'area_hectares': area,
-            'first_detected': first_detected,
-            'risk_score': np.random.randint(1, 101)
-        })
+            hotspots.append({
+                'lat': lat,
+                'lon': lon,
+                'severity': severity,
+                'area_hectares': area,
+                'first_detected': first_detected,
+                'risk_score': int(rng.integers(1, 101))
+            })
     
     # Generate protected areas data
+    rng = make_rng('protected_areas', region, snapshot_version)
     protected_areas = {
-        'total_count': np.random.randint(20, 100),
-        'total_area': np.random.uniform(500000, 5000000),
-        'protection_percentage': np.random.uniform(10, 30),
-        'well_protected_percent': np.random.uniform(30, 60),
-        'at_risk_percent': np.random.uniform(20, 40),
-        'critical_percent': np.random.uniform(10, 30)
+        'total_count': int(rng.integers(20, 100)),
+        'total_area': rng.uniform(500000, 5000000),
+        'protection_percentage': rng.uniform(10, 30),
+        'well_protected_percent': rng.uniform(30, 60),
+        'at_risk_percent': rng.uniform(20, 40),
+        'critical_percent': rng.uniform(10, 30)
     }
     
     # Create yearly_data structure for the time-lapse visualization
@@ -118,13 +237,14 @@ def load_deforestation_data(region, year_range):
         year_loss = year_df['deforestation_hectares'].sum()
         
         # Count affected species for this year (synthetic)
-        affected_species = int(base_loss_rates.get(region, 1000000) / 10000 * (1 + (years.index(year) * 0.05)))
+        affected_species = int(BASE_LOSS_RATES.get(region, 1000000) / 10000 * (1 + ((year - BASE_YEAR) * 0.05)))
         
         # Primary cause of deforestation
+        rng = make_rng('causes', region, year, snapshot_version)
         causes = ['Agricultural Expansion', 'Logging', 'Mining', 'Infrastructure']
         cause_probs = [0.45, 0.35, 0.12, 0.08]
-        primary_cause = np.random.choice(causes, p=cause_probs)
-        primary_cause_percentage = np.random.randint(30, 60)
+        primary_cause = str(rng.choice(causes, p=cause_probs))
+        primary_cause_percentage = int(rng.integers(30, 60))
         
         yearly_data[year] = {
             'loss_hectares': year_loss,
@@ -142,12 +262,13 @@ def load_deforestation_data(region, year_range):
         'protected_areas': protected_areas,
         'region': region,
         'year_range': year_range,
-        'yearly_data': yearly_data
+        'yearly_data': yearly_data,
+        'snapshot_version': snapshot_version
     }
     
     return result
 
-def load_biodiversity_data(region, year_range):
+def load_biodiversity_data(region, year_range, snapshot_version=0):
     """
     Load and process biodiversity impact data based on region and year range.
     In a real application, this would fetch data from an API or database.
@@ -197,27 +318,28 @@ def load_biodiversity_data(region, year_range):
     }
     
     base_data = region_species_data.get(region, region_species_data["Global"])
+    rng = make_rng('biodiversity', region, year_range[0], year_range[1], snapshot_version)
     
     # Calculate species at risk based on region and deforestation rates
-    species_at_risk = int(base_data['total_species'] * np.random.uniform(0.05, 0.2))
-    species_change = int(species_at_risk * np.random.uniform(-0.1, 0.2))
+    species_at_risk = int(base_data['total_species'] * rng.uniform(0.05, 0.2))
+    species_change = int(species_at_risk * rng.uniform(-0.1, 0.2))
     
     # Calculate risk score (0-100)
-    risk_score = int(np.random.uniform(20, 80))
+    risk_score = int(rng.uniform(20, 80))
     
     # Species distribution data
     species_distribution = [
-        {'category': 'Mammals', 'count': base_data['mammals'], 'at_risk': int(base_data['mammals'] * np.random.uniform(0.1, 0.3))},
-        {'category': 'Birds', 'count': base_data['birds'], 'at_risk': int(base_data['birds'] * np.random.uniform(0.05, 0.2))},
-        {'category': 'Amphibians', 'count': base_data['amphibians'], 'at_risk': int(base_data['amphibians'] * np.random.uniform(0.1, 0.4))},
-        {'category': 'Plants', 'count': base_data['plants'], 'at_risk': int(base_data['plants'] * np.random.uniform(0.05, 0.15))},
+        {'category': 'Mammals', 'count': base_data['mammals'], 'at_risk': int(base_data['mammals'] * rng.uniform(0.1, 0.3))},
+        {'category': 'Birds', 'count': base_data['birds'], 'at_risk': int(base_data['birds'] * rng.uniform(0.05, 0.2))},
+        {'category': 'Amphibians', 'count': base_data['amphibians'], 'at_risk': int(base_data['amphibians'] * rng.uniform(0.1, 0.4))},
+        {'category': 'Plants', 'count': base_data['plants'], 'at_risk': int(base_data['plants'] * rng.uniform(0.05, 0.15))},
     ]
     
     # Risk distribution by severity
     risk_distribution = [
-        {'level': 'Low Risk', 'percentage': np.random.uniform(25, 45)},
-        {'level': 'Medium Risk', 'percentage': np.random.uniform(25, 45)},
-        {'level': 'High Risk', 'percentage': np.random.uniform(15, 35)},
+        {'level': 'Low Risk', 'percentage': rng.uniform(25, 45)},
+        {'level': 'Medium Risk', 'percentage': rng.uniform(25, 45)},
+        {'level': 'High Risk', 'percentage': rng.uniform(15, 35)},
     ]
     # Normalize to 100%
     total = sum(item['percentage'] for item in risk_distribution)
@@ -243,10 +365,10 @@ def load_biodiversity_data(region, year_range):
     for name in species_names:
         top_affected_species.append({
             'name': name,
-            'status': np.random.choice(status_options),
-            'habitat_loss_percent': np.random.randint(30, 85),
-            'population_decline': np.random.randint(30, 90),
-            'risk_level': np.random.randint(40, 95)
+            'status': str(rng.choice(status_options)),
+            'habitat_loss_percent': int(rng.integers(30, 85)),
+            'population_decline': int(rng.integers(30, 90)),
+            'risk_level': int(rng.integers(40, 95))
         })
     
     # Combine all data into a structured dictionary
@@ -263,19 +385,24 @@ def load_biodiversity_data(region, year_range):
     
     return result
 
-def load_alert_data(region, alert_threshold):
+def load_alert_data(region, alert_threshold, snapshot_version=0, now=None):
     """
     Load recent deforestation alerts based on region and threshold.
     In a real application, this would fetch data from an API or database.
+
+    Alerts are those of the 30 days up to now (by default the start of the
+    current hour). Synthetic alerts are issued at a steady pace per region and
+    each one is drawn from its own generator, seeded from the region and its
+    number, so an alert keeps its time, place and severity whenever the data is
+    regenerated (the hour moving on or a new snapshot_version); per-user state
+    keyed by detection_db.stable_alert_ids() therefore survives regeneration.
+    Lower sensitivities show a superset of the alerts of higher ones.
+
+    The number of new alerts is returned in df.attrs['new_alerts_count'].
+    Alert locations are not stored; format them from lat/lon with
+    utils.format_location().
     """
-    # Number of alerts varies by threshold
-    threshold_multiplier = {
-        "Low": 1.5,
-        "Medium": 1.0,
-        "High": 0.5
-    }
-    
-    # Base number of alerts by region
+    # Base number of alerts by region (per 30 days, at Medium sensitivity)
     base_alerts = {
         "Amazon": 15,
         "Congo Basin": 12,
@@ -284,86 +411,73 @@ def load_alert_data(region, alert_threshold):
         "Global": 30
     }
     
-    num_alerts = int(base_alerts.get(region, 10) * threshold_multiplier.get(alert_threshold, 1.0))
-    
     # Generate alert data
     alerts = []
-    now = datetime.now()
-    
-    for i in range(num_alerts):
-        # Generate a date within the last 30 days
-        days_ago = np.random.randint(0, 30)
-        alert_date = now - timedelta(days=days_ago)
-        
-        # Regional coordinates
-        region_coords = {
-            "Amazon": (-5.0, -60.0, 12.0, 8.0),  # lat, lon, lat_spread, lon_spread
-            "Congo Basin": (0.0, 20.0, 10.0, 10.0),
-            "Southeast Asia": (5.0, 110.0, 15.0, 15.0),
-            "Central America": (15.0, -85.0, 5.0, 10.0),
-            "Global": (0.0, 0.0, 60.0, 180.0)
-        }
-        
-        center_lat, center_lon, lat_spread, lon_spread = region_coords.get(region, (0.0, 0.0, 60.0, 180.0))
+    if now is None:
+        now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    
+    stored_alerts = None
+    if _stored_years('alerts', region, range((now - timedelta(days=30)).year, now.year + 1)):
+        # Read recent alerts from the data store; sensitivity selects severities
+        stored_alerts = read_stored_alerts(region, alert_threshold, now)
+    
+    if stored_alerts is not None:
+        df = stored_alerts
+        df['is_new'] = (now - df['date']).dt.days < 5  # New alerts are less than 5 days old
+    else:
+        # Alert n is issued in the n-th interval after ALERT_EPOCH, at the pace
+        # of the Low sensitivity; higher sensitivities show some of the tiers
+        spacing = timedelta(days=30) / int(base_alerts.get(region, 10) * 1.5)
+        tiers = ALERT_THRESHOLD_TIERS.get(alert_threshold, ALERT_THRESHOLD_TIERS["Medium"])
+        cutoff = now - timedelta(days=30)
         
-        # Generate random coordinates within the region
-        lat = center_lat + np.random.uniform(-lat_spread, lat_spread)
-        lon = center_lon + np.random.uniform(-lon_spread, lon_spread)
+        # Region extent (alerts are spread over its bounding box)
+        min_lat, min_lon, max_lat, max_lon = get_region(region).bbox
         
-        # Location name
-        location = f"{lat:.2f}°, {lon:.2f}°"
+        for n in range(int((cutoff - ALERT_EPOCH) / spacing), int((now - ALERT_EPOCH) / spacing) + 1):
+            if n % len(ALERT_THRESHOLD_TIERS) >= tiers:
+                continue
+            rng = make_rng('alerts', region, n)
+            
+            # Issued at a random time within its interval, if that is in the last 30 days
+            alert_date = (ALERT_EPOCH + spacing * (n + rng.random())).replace(microsecond=0)
+            if not cutoff < alert_date <= now:
+                continue
+            days_ago = (now - alert_date).days
         
-        # Severity (higher numbers = worse deforestation)
-        severity_options = ["Low", "Medium", "High"]
-        severity_probs = [0.3, 0.4, 0.3]
-        severity = np.random.choice(severity_options, p=severity_probs)
+            # Generate random coordinates within the region
+            lat = rng.uniform(min_lat, max_lat)
+            lon = rng.uniform(min_lon, max_lon)
         
-        # Area affected
-        area_multiplier = 1 if severity == "Low" else 3 if severity == "Medium" else 10
-        area_hectares = np.random.uniform(10, 100) * area_multiplier
+            # Severity (higher numbers = worse deforestation)
+            severity_options = list(SEVERITY_DTYPE.categories)
+            severity_probs = [0.3, 0.4, 0.3]
+            severity = str(rng.choice(severity_options, p=severity_probs))
         
-        # Description based on severity
-        descriptions = {
-            "Low": [
-                "Small-scale clearing detected",
-                "Minor forest disturbance observed",
-                "Limited logging activity detected"
-            ],
-            "Medium": [
-                "Moderate clearing for agriculture",
-                "Significant logging operations detected",
-                "Road construction causing forest fragmentation"
-            ],
-            "High": [
-                "Large-scale forest clearing for palm oil",
-                "Massive deforestation for cattle ranching",
-                "Critical habitat destruction by mining operations"
-            ]
-        }
+            # Area affected
+            area_multiplier = 1 if severity == "Low" else 3 if severity == "Medium" else 10
+            area_hectares = rng.uniform(10, 100) * area_multiplier
         
-        description = np.random.choice(descriptions.get(severity, ["Forest disturbance detected"]))
+            # Description based on severity
+            description = str(rng.choice(ALERT_DESCRIPTIONS.get(severity, ["Forest disturbance detected"])))
         
-        alerts.append({
-            'date': alert_date,
-            'location': location,
-            'severity': severity,
-            'area_hectares': area_hectares,
-            'description': description,
-            'lat': lat,
-            'lon': lon,
-            'is_new': days_ago < 5  # New alerts are less than 5 days old
-        })
+            alerts.append({
+                'date': alert_date,
+                'severity': severity,
+                'area_hectares': area_hectares,
+                'description': description,
+                'lat': lat,
+                'lon': lon,
+                'is_new': days_ago < 5  # New alerts are less than 5 days old
+            })
     
-    # Convert to DataFrame
-    df = pd.DataFrame(alerts)
+        # Convert to DataFrame
+        df = pd.DataFrame(alerts)
     
     # Sort by date (most recent first)
-    df = df.sort_values('date', ascending=False).reset_index(drop=True)
-    
-    # Count new alerts
-    new_alerts_count = df['is_new'].sum()
+    df = compact_alerts(df.sort_values('date', ascending=False).reset_index(drop=True))
     
-    # Add the count to the DataFrame
-    df['new_alerts_count'] = new_alerts_count
+    # Count new alerts (kept as frame metadata rather than a repeated column)
+    df.attrs['new_alerts_count'] = int(df['is_new'].sum())
     
     return df
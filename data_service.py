@@ -0,0 +1,250 @@
+"""
+Process-wide data service shared by all dashboard sessions.
+
+Streamlit runs every session's script in its own thread of the same process,
+so a module-level service is visible to all of them. Each (loader, arguments)
+dataset is computed once, frozen, and handed out as a read-only view:
+
+* dicts become ``MappingProxyType`` objects and lists become tuples
+* DataFrames are handed out as shallow copies with pandas copy-on-write
+  enabled, so a session that modifies its copy never touches the shared one
+
+A global memory budget caps the total size of the cached datasets; the least
+recently used ones are evicted first.
+
+With the background refresher running (see DataService.start()), cached
+datasets no longer expire and get regenerated inline by whichever request
+comes next. Every DATA_REFRESH_SECONDS the refresher builds the next
+snapshot of every cached dataset, with its alert mirror, off to the side
+while the current one keeps serving. It then swaps the whole set in with
+one assignment: readers never wait for a build and never see a mix of old
+and new datasets. Refresh listeners (e.g. the notification dispatcher) are
+called once the new snapshot is served.
+
+When ``FOREST_GUARDIAN_SHARED_STORE_DIR`` is set, datasets published to shared
+memory by ``shared_store.py`` are served zero-copy from there first, so
+several worker processes share one copy of the data.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+import config
+from shared_store import SharedSnapshotReader, dataset_key
+from data_processor import load_deforestation_data, load_biodiversity_data, load_alert_data
+from detection_db import detection_db
+
+# Shallow DataFrame copies are only safe to share with copy-on-write enabled.
+# It is always on from pandas 3.0, where the option is deprecated.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+def _freeze(obj):
+    """Return a deeply read-only version of a loader result"""
+    if isinstance(obj, dict):
+        return MappingProxyType({key: _freeze(value) for key, value in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(_freeze(item) for item in obj)
+    return obj
+
+def _view(frozen):
+    """Return a per-caller view of a frozen dataset (DataFrames are shallow-copied)"""
+    if isinstance(frozen, pd.DataFrame):
+        return frozen.copy(deep=False)
+    if isinstance(frozen, MappingProxyType) and any(isinstance(v, pd.DataFrame) for v in frozen.values()):
+        return MappingProxyType({
+            key: value.copy(deep=False) if isinstance(value, pd.DataFrame) else value
+            for key, value in frozen.items()
+        })
+    return frozen
+
+def estimate_size(obj):
+    """Estimate the memory footprint of a dataset in bytes"""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (dict, MappingProxyType)):
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(estimate_size(item) for item in obj)
+    return sys.getsizeof(obj)
+
+def build_indexes(key, dataset):
+    """Build the derived indexes of a dataset (the alert mirror) before it is served"""
+    if key[0] == 'load_alert_data':
+        detection_db.mirror_alerts(dataset_key(*key), key[1], dataset)
+
+class DataService:
+    """
+    Compute-once cache of loader results with a global memory budget
+
+    Parameters:
+    memory_budget_bytes: Upper bound for the total size of cached datasets
+    ttl_seconds: Age after which a dataset is regenerated on next access (unless refreshed in the background)
+    shared_store_dir: Optional shared-memory snapshot store to serve from first
+    """
+
+    def __init__(self, memory_budget_bytes, ttl_seconds, shared_store_dir=None):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.ttl_seconds = ttl_seconds
+        self.shared_reader = SharedSnapshotReader(shared_store_dir, wrap=_freeze) if shared_store_dir else None
+        self._entries = OrderedDict()  # key -> (frozen dataset, size, created_at)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._loaders = {}  # loader name -> loader, for the refresher
+        self.version = 0
+        self.refreshed_at = None
+        self._refresher = None
+        self._refresh_listeners = []
+
+    def get(self, loader, *args):
+        """Return a read-only view of loader(*args), computing it at most once"""
+        if self.shared_reader is not None:
+            shared = self.shared_reader.get(dataset_key(loader.__name__, *args))
+            if shared is not None:
+                return _view(shared)
+
+        key = (loader.__name__,) + args
+        entry = self._lookup(key)
+        if entry is not None:
+            return _view(entry)
+
+        # Only one session computes a given dataset; the others wait for it
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+            self._loaders[loader.__name__] = loader
+        with key_lock:
+            entry = self._lookup(key)
+            if entry is None:
+                version = self.version
+                entry = _freeze(loader(*args, snapshot_version=version))
+                self._store(key, entry, version)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return _view(entry)
+
+    def stats(self):
+        """Return the number of cached datasets and their total size in bytes"""
+        with self._lock:
+            return {'datasets': len(self._entries), 'bytes': self._total_bytes,
+                    'budget_bytes': self.memory_budget_bytes, 'version': self.version,
+                    'refreshed_at': self.refreshed_at}
+
+    def clear(self):
+        """Drop every cached dataset"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            dataset, size, created_at = entry
+            if self._refresher is None and time.monotonic() - created_at > self.ttl_seconds:
+                del self._entries[key]
+                self._total_bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return dataset
+
+    def _store(self, key, dataset, version):
+        size = estimate_size(dataset)
+        with self._lock:
+            if version != self.version:
+                # Built from the snapshot a refresh just replaced; not kept
+                return
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (dataset, size, time.monotonic())
+            self._total_bytes += size
+            # Evict least recently used datasets, but always keep the new one
+            self._evict()
+
+    def _evict(self):
+        # Evict least recently used datasets, but always keep the newest one
+        while self._total_bytes > self.memory_budget_bytes and len(self._entries) > 1:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_size
+
+    def refresh(self):
+        """
+        Build the next snapshot of every cached dataset and swap it in
+
+        The datasets and their indexes are built without holding the lock, so
+        requests keep being served from the current snapshot meanwhile.
+
+        Returns:
+        The new snapshot version
+        """
+        version = self.version + 1
+        with self._lock:
+            keys = list(self._entries)
+        entries = OrderedDict()
+        for key in keys:
+            dataset = _freeze(self._loaders[key[0]](*key[1:], snapshot_version=version))
+            build_indexes(key, dataset)
+            entries[key] = (dataset, estimate_size(dataset), time.monotonic())
+        with self._lock:
+            # Datasets first requested during the build are computed again
+            # on demand, from the new version
+            self._entries = entries
+            self._total_bytes = sum(size for _, size, _ in entries.values())
+            self.version = version
+            self.refreshed_at = datetime.now()
+            self._evict()
+        for callback in list(self._refresh_listeners):
+            try:
+                callback()
+            except Exception as e:
+                # A failing listener must not fail the refresh it follows
+                print(f"Data refresh listener failed: {type(e).__name__}: {e}")
+        return version
+
+    def add_refresh_listener(self, callback):
+        """Call callback() after every refresh, once the new snapshot is served"""
+        with self._lock:
+            self._refresh_listeners.append(callback)
+
+    def start(self, interval_seconds=config.DATA_REFRESH_SECONDS):
+        """Start refreshing the cached datasets in the background (once per process)"""
+        with self._lock:
+            if self._refresher is not None or interval_seconds <= 0:
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, args=(interval_seconds,),
+                                               name="data-refresher", daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self, interval_seconds):
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the current snapshot and try again next interval
+                print(f"Data refresh failed: {type(e).__name__}: {e}")
+
+# The service shared by every session in this process
+data_service = DataService(config.DATA_BUDGET_MB * 1024 * 1024, config.DATA_TTL_SECONDS,
+                           shared_store_dir=config.SHARED_STORE_DIR or None)
+
+def get_deforestation_data(region, year_range):
+    """Shared, read-only deforestation data for a region and year range"""
+    return data_service.get(load_deforestation_data, region, tuple(year_range))
+
+def get_biodiversity_data(region, year_range):
+    """Shared, read-only biodiversity data for a region and year range"""
+    return data_service.get(load_biodiversity_data, region, tuple(year_range))
+
+def get_alert_data(region, alert_threshold):
+    """Shared, read-only alert data for a region and alert threshold"""
+    return data_service.get(load_alert_data, region, alert_threshold)
@@ -0,0 +1,497 @@
+"""
+Indexed SQLite mirror of the hotspot and alert data.
+
+Loader outputs (and, with the CLI, whole datasets of the columnar store) are
+copied into a local SQLite database, so filtered reads - by region and date
+range, severity, minimum area or map grid cell - are answered from indexes
+instead of pandas scans over the full frames. The alert panel's filters,
+pagination and export read from here.
+
+Every mirrored dataset is stored under a source key (for loader outputs the
+shared_store.dataset_key() of the loader call). Mirroring the same data again
+is a no-op; mirroring changed data replaces that source's rows in a single
+transaction.
+
+Points are also indexed by a grid cell of GRID_DEGREES degrees, so "near a
+location" questions become an indexed ``cell IN (...)`` lookup:
+
+    cells = cells_near(-3.4, -62.1, radius_km=50)
+    detection_db.query_alerts(severities=["High"], min_area=500,
+                              since=datetime.now() - timedelta(days=7), cells=cells)
+
+``check`` verifies that each region's distinct alert read (used by the
+full-history export) returns every alert id of the region exactly once.
+
+Usage:
+    python detection_db.py sync [--store-dir DIR] [--db PATH]
+    python detection_db.py check [--db PATH]
+"""
+import argparse
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import config
+import columnar_store
+from data_processor import SEVERITY_DTYPE, compact_alerts
+
+# Size of the spatial index cells (degrees)
+GRID_DEGREES = 1.0
+
+# Rows per executemany() batch and per exported chunk
+BATCH_ROWS = 50_000
+
+# Version of the mirror tables below; the mirror is rebuilt when it changes
+SCHEMA_VERSION = 4
+
+# Columns written for every mirrored alert
+ALERT_COLUMNS = ['alert_id', 'source', 'region', 'date', 'severity', 'area_hectares', 'description',
+                 'lat', 'lon', 'cell', 'is_new']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    alert_id INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    region TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    severity INTEGER NOT NULL,
+    area_hectares REAL NOT NULL,
+    description TEXT,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    cell INTEGER NOT NULL,
+    is_new INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS alerts_region_date ON alerts (region, date);
+CREATE INDEX IF NOT EXISTS alerts_severity ON alerts (severity);
+CREATE INDEX IF NOT EXISTS alerts_cell ON alerts (cell);
+CREATE INDEX IF NOT EXISTS alerts_source_date ON alerts (source, date);
+CREATE INDEX IF NOT EXISTS alerts_alert_id ON alerts (alert_id);
+
+CREATE TABLE IF NOT EXISTS hotspots (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    region TEXT NOT NULL,
+    first_detected INTEGER NOT NULL,
+    severity INTEGER NOT NULL,
+    area_hectares REAL NOT NULL,
+    risk_score INTEGER,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    cell INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hotspots_region_date ON hotspots (region, first_detected);
+CREATE INDEX IF NOT EXISTS hotspots_severity ON hotspots (severity);
+CREATE INDEX IF NOT EXISTS hotspots_cell ON hotspots (cell);
+CREATE INDEX IF NOT EXISTS hotspots_source_date ON hotspots (source, first_detected);
+
+CREATE TABLE IF NOT EXISTS sources (
+    name TEXT PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+"""
+
+def grid_cell(lat, lon):
+    """Return the grid cell id of each point (vectorized)"""
+    rows = np.floor((np.asarray(lat, dtype=np.float64) + 90) / GRID_DEGREES).astype(np.int64)
+    cols = np.floor((np.asarray(lon, dtype=np.float64) + 180) / GRID_DEGREES).astype(np.int64)
+    return rows * int(round(360 / GRID_DEGREES)) + cols
+
+def cells_near(lat, lon, radius_km):
+    """Return the grid cells overlapping a box of radius_km around a point"""
+    lat_delta = radius_km / 111.32
+    lon_delta = radius_km / (111.32 * max(math.cos(math.radians(lat)), 0.01))
+    lats = np.arange(lat - lat_delta, lat + lat_delta + GRID_DEGREES, GRID_DEGREES).clip(-90, 90)
+    lons = np.arange(lon - lon_delta, lon + lon_delta + GRID_DEGREES, GRID_DEGREES).clip(-180, 180)
+    grid_lat, grid_lon = np.meshgrid(lats, lons)
+    return sorted(set(grid_cell(grid_lat.ravel(), grid_lon.ravel()).tolist()))
+
+def _epoch_seconds(values):
+    """Convert datetimes to integer seconds since the epoch"""
+    return pd.to_datetime(pd.Series(values)).astype('datetime64[s]').astype('int64').to_numpy()
+
+def stable_alert_ids(alerts):
+    """
+    Return a stable id for each alert, derived from its detection time and position
+
+    The ids do not depend on the database row, on the source an alert was
+    mirrored from or on fields that change as an alert is re-assessed (severity,
+    area), so per-user state keyed by them survives re-mirroring and
+    regeneration of the data.
+    """
+    key = pd.DataFrame({
+        'date': _epoch_seconds(alerts['date']),
+        'lat': np.round(alerts['lat'].to_numpy(dtype='float64'), 5),
+        'lon': np.round(alerts['lon'].to_numpy(dtype='float64'), 5),
+    })
+    # Drop one bit so the ids fit SQLite's signed 64-bit integers as positive numbers
+    return (pd.util.hash_pandas_object(key, index=False).to_numpy() >> np.uint64(1)).astype(np.int64)
+
+def _fingerprint(df):
+    """Content hash of a frame, used to skip re-mirroring unchanged data"""
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()
+
+def _where(region=None, source=None, since=None, until=None, severities=None, min_area=None,
+           cells=None, date_column='date'):
+    """Build the WHERE clause and parameters of a filtered query"""
+    clauses, params = [], []
+    if region is not None:
+        clauses.append("region = ?")
+        params.append(region)
+    if isinstance(source, (list, tuple)):
+        clauses.append(f"source IN ({', '.join('?' * len(source))})")
+        params.extend(source)
+    elif source is not None:
+        clauses.append("source = ?")
+        params.append(source)
+    if since is not None:
+        clauses.append(f"{date_column} >= ?")
+        params.append(int(_epoch_seconds([since])[0]))
+    if until is not None:
+        clauses.append(f"{date_column} < ?")
+        params.append(int(_epoch_seconds([until])[0]))
+    if severities is not None:
+        clauses.append(f"severity IN ({', '.join('?' * len(severities))})")
+        params.extend(severities)
+    if min_area is not None:
+        clauses.append("area_hectares >= ?")
+        params.append(float(min_area))
+    if cells is not None:
+        clauses.append(f"cell IN ({', '.join('?' * len(cells))})")
+        params.extend(int(cell) for cell in cells)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def alert_where(severities=None, source_severities=None, **filters):
+    """
+    Build the WHERE clause and parameters of an alert query
+
+    Parameters:
+    severities: Severity names to include (None for all)
+    source_severities: (sources, severity names): rows of those sources are
+        limited to those severities, rows of other sources are not
+    filters: region, source (one or a list), since, until, min_area, cells
+    """
+    if severities is not None:
+        severities = [SEVERITY_DTYPE.categories.get_loc(severity) for severity in severities]
+    where, params = _where(severities=severities, **filters)
+    if source_severities is not None:
+        sources, source_levels = source_severities
+        source_levels = [SEVERITY_DTYPE.categories.get_loc(severity) for severity in source_levels]
+        where += (" AND " if where else " WHERE ") + (
+            f"(source NOT IN ({', '.join('?' * len(sources))}) OR severity IN ({', '.join('?' * len(source_levels))}))"
+        )
+        params = params + list(sources) + source_levels
+    return where, params
+
+class DetectionDB:
+    """
+    SQLite mirror of hotspots and alerts with indexed, filtered reads
+
+    Each thread uses its own connection (Streamlit runs sessions in threads);
+    writes are serialized within the process, and WAL mode lets other
+    processes read while one writes.
+
+    Parameters:
+    path: Database file (created, with its directory, on first use)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._fingerprints = {}  # source -> fingerprint of the mirrored data
+
+    def connection(self):
+        """Return this thread's connection, creating the schema on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA mmap_size=268435456")
+            with self._write_lock:
+                if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                    # The mirror holds derived data only, so it is simply rebuilt
+                    conn.executescript("DROP TABLE IF EXISTS alerts; DROP TABLE IF EXISTS hotspots; "
+                                       "DROP TABLE IF EXISTS sources;")
+                    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction on this thread's connection, serialized with the other writers of this process"""
+        conn = self.connection()
+        with self._write_lock, conn:
+            yield conn
+
+    def _replace_source(self, table, source, fingerprint, columns, rows):
+        """Replace a source's rows in one transaction, unless the same data is already mirrored"""
+        with self.transaction() as conn:
+            current = conn.execute("SELECT fingerprint FROM sources WHERE name = ?", (source,)).fetchone()
+            if current is None or current[0] != fingerprint:
+                insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+                conn.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+                for start in range(0, len(rows), BATCH_ROWS):
+                    conn.executemany(insert, rows[start:start + BATCH_ROWS])
+                conn.execute(
+                    "INSERT OR REPLACE INTO sources (name, table_name, fingerprint, rows, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (source, table, fingerprint, len(rows), int(time.time()))
+                )
+        self._fingerprints[source] = fingerprint
+
+    def mirror_alerts(self, source, region, alerts):
+        """
+        Mirror an alert frame (loader output schema) under a source key
+
+        Returns:
+        The source key, for use as a query filter
+        """
+        fingerprint = _fingerprint(alerts)
+        if self._fingerprints.get(source) == fingerprint:
+            return source
+        self._replace_source('alerts', source, fingerprint, ALERT_COLUMNS,
+                             self._alert_rows(source, region, alerts, stable_alert_ids(alerts)))
+        return source
+
+    def upsert_alerts(self, source, region, alerts, replace=False):
+        """
+        Insert or update alerts that carry their own ids (the frame's index) under a source key
+
+        Used for incremental updates such as the live alert feed: rows with
+        the same alert_id in the source are replaced, others are kept unless
+        replace is set.
+
+        Returns:
+        The source key, for use as a query filter
+        """
+        alert_ids = alerts.index.to_numpy(dtype=np.int64)
+        insert = f"INSERT INTO alerts ({', '.join(ALERT_COLUMNS)}) VALUES ({', '.join('?' * len(ALERT_COLUMNS))})"
+        rows = self._alert_rows(source, region, alerts, alert_ids)
+        with self.transaction() as conn:
+            if replace:
+                conn.execute("DELETE FROM alerts WHERE source = ?", (source,))
+            else:
+                for start in range(0, len(alert_ids), 500):
+                    chunk = alert_ids[start:start + 500].tolist()
+                    conn.execute(f"DELETE FROM alerts WHERE source = ? AND alert_id IN ({', '.join('?' * len(chunk))})",
+                                 [source] + chunk)
+            for start in range(0, len(rows), BATCH_ROWS):
+                conn.executemany(insert, rows[start:start + BATCH_ROWS])
+        self._fingerprints.pop(source, None)
+        return source
+
+    @staticmethod
+    def _alert_rows(source, region, alerts, alert_ids):
+        """Rows of the alerts table (in ALERT_COLUMNS order) for an alert frame"""
+        return list(zip(
+            alert_ids.tolist(),
+            [source] * len(alerts),
+            [region] * len(alerts),
+            _epoch_seconds(alerts['date']).tolist(),
+            pd.Categorical(alerts['severity'], dtype=SEVERITY_DTYPE).codes.tolist(),
+            alerts['area_hectares'].astype('float64').tolist(),
+            alerts['description'].astype(object).tolist(),
+            alerts['lat'].astype('float64').tolist(),
+            alerts['lon'].astype('float64').tolist(),
+            grid_cell(alerts['lat'], alerts['lon']).tolist(),
+            alerts['is_new'].astype(int).tolist() if 'is_new' in alerts else [0] * len(alerts),
+        ))
+
+    def mirror_hotspots(self, source, region, hotspots):
+        """
+        Mirror hotspots (a loader's list of dicts or a store frame) under a source key
+
+        Returns:
+        The source key, for use as a query filter
+        """
+        hotspots = pd.DataFrame(list(hotspots)) if not isinstance(hotspots, pd.DataFrame) else hotspots
+        if len(hotspots) == 0:
+            hotspots = pd.DataFrame(columns=['lat', 'lon', 'severity', 'area_hectares', 'first_detected', 'risk_score'])
+        fingerprint = _fingerprint(hotspots)
+        if self._fingerprints.get(source) == fingerprint:
+            return source
+        rows = list(zip(
+            [source] * len(hotspots),
+            [region] * len(hotspots),
+            _epoch_seconds(hotspots['first_detected']).tolist(),
+            hotspots['severity'].astype('int64').tolist(),
+            hotspots['area_hectares'].astype('float64').tolist(),
+            hotspots['risk_score'].astype('int64').tolist(),
+            hotspots['lat'].astype('float64').tolist(),
+            hotspots['lon'].astype('float64').tolist(),
+            grid_cell(hotspots['lat'], hotspots['lon']).tolist(),
+        ))
+        self._replace_source('hotspots', source, fingerprint,
+                             ['source', 'region', 'first_detected', 'severity', 'area_hectares',
+                              'risk_score', 'lat', 'lon', 'cell'], rows)
+        return source
+
+    def count_alerts(self, severities=None, **filters):
+        """Number of alerts matching the filters (see query_alerts)"""
+        where, params = alert_where(severities, **filters)
+        return self.connection().execute(f"SELECT COUNT(*) FROM alerts{where}", params).fetchone()[0]
+
+    def query_alerts(self, severities=None, limit=None, offset=0, **filters):
+        """
+        Read alerts matching the filters, most recent first
+
+        Parameters:
+        severities: Severity names to include (None for all)
+        limit, offset: Page of the result to return (limit None for all rows)
+        filters: region, source, source_severities, since, until, min_area, cells (see alert_where)
+
+        Returns:
+        DataFrame in the loader's alert schema, indexed by stable alert id
+        """
+        sql, params = self._alerts_sql(severities, limit, offset, filters)
+        cursor = self.connection().execute(sql, params)
+        return self._alerts_frame(cursor.fetchall(), cursor.description)
+
+    def iter_alerts(self, severities=None, chunk_rows=BATCH_ROWS, distinct=False, ordered=True, **filters):
+        """
+        Yield the alerts matching the filters in chunks (for exports)
+
+        Parameters:
+        distinct: Return each alert id once, even if several sources hold it
+        ordered: Most recent first; otherwise rows come in storage order, which
+                 reads the table sequentially and is much faster for bulk exports
+        """
+        sql, params = self._alerts_sql(severities, None, 0, filters, distinct, ordered)
+        cursor = self.connection().execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                return
+            yield self._alerts_frame(rows, cursor.description)
+
+    def query_hotspots(self, min_severity=None, limit=None, **filters):
+        """
+        Read hotspots matching the filters, largest first
+
+        Parameters:
+        min_severity: Lowest severity level (1-3) to include
+        limit: Maximum number of hotspots
+        filters: region, source, since, until, min_area, cells
+
+        Returns:
+        DataFrame with the hotspot columns, indexed by hotspot row id
+        """
+        where, params = _where(date_column='first_detected', **filters)
+        if min_severity is not None:
+            where += (" AND " if where else " WHERE ") + "severity >= ?"
+            params.append(int(min_severity))
+        sql = (f"SELECT id, lat, lon, severity, area_hectares, first_detected, risk_score FROM hotspots{where} "
+               f"ORDER BY area_hectares DESC")
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        df = pd.read_sql_query(sql, self.connection(), params=params, index_col='id')
+        df['first_detected'] = pd.to_datetime(df['first_detected'], unit='s')
+        return df
+
+    def _alerts_sql(self, severities, limit, offset, filters, distinct=False, ordered=True):
+        where, params = alert_where(severities, **filters)
+        if distinct:
+            # Keep the first row of each alert id among the rows matching the
+            # filters; copies outside the filtered set must not hide a row
+            where, params = (f"{where} AND id IN (SELECT MIN(id) FROM alerts{where} GROUP BY alert_id)"
+                             if where else " WHERE id IN (SELECT MIN(id) FROM alerts GROUP BY alert_id)",
+                             params + params)
+        sql = f"SELECT alert_id, date, severity, area_hectares, description, lat, lon, is_new FROM alerts{where}"
+        if ordered:
+            # Both (region, date) and (source, date) indexes end in the row id,
+            # so this order is read straight from the index without a sort
+            sql += " ORDER BY date DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([int(limit), int(offset)])
+        return sql, params
+
+    @staticmethod
+    def _alerts_frame(rows, description):
+        """Convert database rows back to the loader's alert schema"""
+        df = pd.DataFrame.from_records(rows, columns=[column[0] for column in description])
+        df.index = pd.Index(df.pop('alert_id').to_numpy(dtype=np.int64), name='alert_id')
+        df['date'] = pd.to_datetime(df['date'], unit='s')
+        df['severity'] = pd.Categorical.from_codes(df['severity'].to_numpy(dtype=np.int8), dtype=SEVERITY_DTYPE)
+        return compact_alerts(df)
+
+    def sync_store(self, store_dir):
+        """
+        Mirror the hotspots and alerts of a columnar store, one (region, year) partition per source
+
+        Returns:
+        Number of partitions mirrored
+        """
+        partitions = 0
+        for dataset, mirror in (('hotspots', self.mirror_hotspots), ('alerts', self.mirror_alerts)):
+            for region, year, _ in columnar_store.list_partitions(store_dir, dataset):
+                df = columnar_store.read_dataset(store_dir, dataset, regions=[region], years=[year])
+                mirror(f"store|{dataset}|{region}|{year}", region, df.drop(columns=columnar_store.PARTITION_COLUMNS))
+                partitions += 1
+        # Refresh the planner statistics, so bulk reads of a large mirror scan
+        # the table instead of walking an unselective index
+        with self.transaction() as conn:
+            conn.execute("ANALYZE")
+        return partitions
+
+# The mirror shared by every session in this process
+detection_db = DetectionDB(config.DATABASE_PATH)
+
+def check_distinct(db):
+    """
+    Compare each region's distinct alert read with the region's distinct alert ids
+
+    Returns:
+    Dictionary of region -> (alert rows, rows of the distinct read, distinct alert ids);
+    the last two must be equal
+    """
+    results = {}
+    conn = db.connection()
+    for region, rows, alert_ids in conn.execute(
+            "SELECT region, COUNT(*), COUNT(DISTINCT alert_id) FROM alerts GROUP BY region").fetchall():
+        distinct_rows = sum(len(chunk) for chunk in db.iter_alerts(region=region, distinct=True, ordered=False))
+        results[region] = (rows, distinct_rows, alert_ids)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Mirror the columnar store into the detection database")
+    parser.add_argument("command", choices=["sync", "check"],
+                        help="sync: mirror the store; check: verify each region's distinct alert reads")
+    parser.add_argument("--store-dir", default=config.DATA_STORE_DIR or None,
+                        help="root directory of the columnar store (default: FOREST_GUARDIAN_DATA_STORE_DIR)")
+    parser.add_argument("--db", default=config.DATABASE_PATH, help="database file")
+    args = parser.parse_args()
+
+    if args.command == "check":
+        failed = False
+        for region, (rows, distinct_rows, alert_ids) in check_distinct(DetectionDB(args.db)).items():
+            failed |= distinct_rows != alert_ids
+            print(f"{region}: {rows:,} rows, {distinct_rows:,} distinct alerts "
+                  f"({'ok' if distinct_rows == alert_ids else f'expected {alert_ids:,}'})")
+        raise SystemExit(1 if failed else 0)
+
+    if args.store_dir is None:
+        parser.error("sync needs --store-dir (or FOREST_GUARDIAN_DATA_STORE_DIR)")
+    start = time.perf_counter()
+    partitions = DetectionDB(args.db).sync_store(args.store_dir)
+    print(f"Mirrored {partitions} partitions into {args.db} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
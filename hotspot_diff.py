@@ -0,0 +1,79 @@
+"""
+Deltas between hotspot snapshots, for live map updates.
+
+A map built with live updates (see map_visualization.LiveHotspotUpdates)
+knows the version of the hotspot set it was built from: a content hash of its
+hotspot features, so every process computing the same data agrees on it.
+HotspotHistory keeps the last few snapshots of each region and year range
+and answers "what changed since version X" with the features added, changed
+(same id, different position data or styling) and removed. When X is no
+longer known, the answer is the full feature list, which is still far
+smaller than a rebuilt map document.
+
+api_server.py serves the deltas:
+
+    GET /api/v1/hotspots/diff?region=Amazon&start=2015&end=2024&since=<version>
+"""
+import threading
+from collections import OrderedDict
+
+from map_visualization import hotspot_feature, hotspot_version
+
+# Snapshots kept per region and year range
+MAX_VERSIONS = 8
+
+def diff_features(old, new):
+    """
+    Compare two hotspot snapshots (id -> feature)
+
+    Returns:
+    Dictionary with the 'added' and 'changed' features and the 'removed' ids
+    """
+    return {
+        'added': [feature for spot_id, feature in new.items() if spot_id not in old],
+        'changed': [feature for spot_id, feature in new.items() if spot_id in old and old[spot_id] != feature],
+        'removed': [spot_id for spot_id in old if spot_id not in new],
+    }
+
+class HotspotHistory:
+    """
+    Recent hotspot snapshots of each (region, year range), by version
+
+    Parameters:
+    max_versions: Snapshots kept per key
+    """
+
+    def __init__(self, max_versions=MAX_VERSIONS):
+        self.max_versions = max_versions
+        self._snapshots = {}  # key -> OrderedDict of version -> {id: feature}
+        self._lock = threading.Lock()
+
+    def record(self, key, hotspots):
+        """Remember a snapshot of a key's hotspots; returns (version, {id: feature})"""
+        features = {feature['id']: feature for feature in map(hotspot_feature, hotspots)}
+        version = hotspot_version(features.values())
+        with self._lock:
+            versions = self._snapshots.setdefault(key, OrderedDict())
+            versions[version] = features
+            versions.move_to_end(version)
+            while len(versions) > self.max_versions:
+                versions.popitem(last=False)
+        return version, features
+
+    def diff(self, key, since, hotspots):
+        """
+        Delta from version since to the current hotspots of a key
+
+        Returns:
+        Dictionary with the current 'version' and either the added, changed and
+        removed hotspots, or (since unknown) the 'full' feature list
+        """
+        version, features = self.record(key, hotspots)
+        with self._lock:
+            old = self._snapshots[key].get(since)
+        if old is None:
+            return {'version': version, 'full': list(features.values())}
+        return {'version': version, **diff_features(old, features)}
+
+# Snapshots seen by this process
+hotspot_history = HotspotHistory()
@@ -0,0 +1,338 @@
+"""
+Bulk import of fire and clearing detections into the columnar data store.
+
+Reads CSV or GeoJSON detection dumps in fixed-size chunks, so memory use is
+bounded by the chunk size rather than the file size, and appends them to the
+``hotspots`` or ``alerts`` dataset of the store (see columnar_store.py):
+
+* CSV files are parsed with explicit dtypes and only the columns we use
+* GeoJSON FeatureCollections are decoded one feature at a time from a
+  sliding buffer; line-delimited GeoJSON (``.geojsonl``/``.geojsons``) is
+  read line by line
+
+Every chunk is normalized to the dataset's schema, rows with missing or
+out-of-range coordinates or unparseable dates are rejected, and each
+detection is assigned to the region whose outline contains it (see
+regions.py). Detections are written to their region's partition and to the
+``Global`` partition, which holds all detections. Part files are named after
+the input file and chunk, so re-running an import replaces it.
+
+Input columns (CSV headers or GeoJSON properties; Point geometries give
+lat/lon):
+
+* ``lat``/``latitude``, ``lon``/``longitude`` and ``date``/``acq_date``
+  (``first_detected`` for hotspots) are required
+* ``area_hectares``, ``severity``, ``risk_score`` (hotspots) and
+  ``description`` (alerts) are optional; a missing severity is derived from
+  the affected area
+
+Usage:
+    python import_detections.py FILE [FILE ...] --store-dir DIR
+        [--dataset hotspots|alerts] [--chunk-rows 250000]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+import columnar_store
+import regions
+from data_processor import SEVERITY_DTYPE
+
+# Alternative column names found in detection dumps
+COLUMN_ALIASES = {
+    'latitude': 'lat',
+    'longitude': 'lon',
+    'acq_date': 'date',
+    'first_detected': 'date',
+    'area': 'area_hectares',
+}
+
+# Explicit dtypes of the input columns (dates are parsed separately)
+INPUT_DTYPES = {
+    'lat': 'float64',
+    'lon': 'float64',
+    'date': 'string',
+    'area_hectares': 'float32',
+    'severity': 'string',
+    'risk_score': 'float32',
+    'description': 'string',
+}
+
+# Area thresholds (hectares) above which a detection is Medium / High severity
+SEVERITY_AREA_THRESHOLDS = {
+    'hotspots': (2000, 4000),
+    'alerts': (100, 300),
+}
+
+DEFAULT_DESCRIPTION = "Imported detection"
+
+# Largest GeoJSON feature decoded; a longer unparseable stretch is malformed
+MAX_FEATURE_BYTES = 16 << 20
+
+def read_csv_chunks(path, chunk_rows):
+    """Yield DataFrame chunks of a CSV file with canonical column names"""
+    header = pd.read_csv(path, nrows=0).columns
+    names = {column: COLUMN_ALIASES.get(column.strip().lower(), column.strip().lower()) for column in header}
+    usecols = [column for column, name in names.items() if name in INPUT_DTYPES]
+    # Everything is read as text: a malformed number rejects its row rather than the file
+    for chunk in pd.read_csv(path, usecols=usecols, dtype='string', chunksize=chunk_rows):
+        yield _convert_columns(chunk.rename(columns=names))
+
+def iter_geojson_features(path, buffer_size=1 << 20, max_feature_bytes=MAX_FEATURE_BYTES):
+    """
+    Yield the features of a GeoJSON FeatureCollection without loading the whole file
+
+    Raises ValueError for a feature that does not parse within max_feature_bytes.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer = f.read(buffer_size)
+        # Skip to the start of the features array
+        while True:
+            key = buffer.find('"features"')
+            start = buffer.find('[', key) if key >= 0 else -1
+            if start >= 0:
+                position = start + 1
+                break
+            more = f.read(buffer_size)
+            if not more:
+                return
+            buffer += more
+
+        while True:
+            # Skip separators between features
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    position += 1
+                if position < len(buffer):
+                    break
+                buffer, position = f.read(buffer_size), 0
+                if not buffer:
+                    return
+            if buffer[position] == ']':
+                return
+            try:
+                feature, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                # The feature continues past the buffer; read more of the file
+                if len(buffer) - position > max_feature_bytes:
+                    raise ValueError(f"Malformed GeoJSON feature in {path}: {e.msg} "
+                                     f"(no complete feature within {max_feature_bytes:,} bytes)") from e
+                more = f.read(buffer_size)
+                if not more:
+                    raise ValueError(f"Malformed GeoJSON feature in {path}: {e.msg}") from e
+                buffer, position = buffer[position:] + more, 0
+                continue
+            yield feature
+            position = end
+            # Keep the buffer small: drop what has been decoded
+            if position > buffer_size:
+                buffer, position = buffer[position:], 0
+
+def iter_geojson_lines(path):
+    """Yield the features of a line-delimited GeoJSON file"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip().lstrip('\x1e')
+            if line:
+                yield json.loads(line)
+
+def read_geojson_chunks(path, chunk_rows):
+    """Yield DataFrame chunks of a GeoJSON file's Point features"""
+    line_delimited = os.path.splitext(path)[1].lower() in ('.geojsonl', '.geojsons', '.jsonl', '.ndjson')
+    features = iter_geojson_lines(path) if line_delimited else iter_geojson_features(path)
+
+    records = []
+    for feature in features:
+        geometry = feature.get('geometry') or {}
+        properties = feature.get('properties') or {}
+        record = {COLUMN_ALIASES.get(key.lower(), key.lower()): value for key, value in properties.items()}
+        if geometry.get('type') == 'Point' and len(geometry.get('coordinates') or []) >= 2:
+            record['lon'], record['lat'] = geometry['coordinates'][:2]
+        records.append(record)
+        if len(records) == chunk_rows:
+            yield _records_frame(records)
+            records = []
+    if records:
+        yield _records_frame(records)
+
+def _records_frame(records):
+    """Build a chunk from GeoJSON records with the same dtypes as CSV chunks"""
+    df = pd.DataFrame.from_records(records)
+    # Required columns are always present: a chunk without Point geometries or
+    # dates has its rows rejected instead of failing the import
+    columns = list(dict.fromkeys(['lat', 'lon', 'date']
+                                 + [column for column in df.columns if column in INPUT_DTYPES]))
+    return _convert_columns(df.reindex(columns=columns))
+
+def _convert_columns(df):
+    """
+    Convert a chunk's columns to INPUT_DTYPES
+
+    A value that is present but not a number makes its row invalid: its lat is
+    cleared, so normalize_chunk rejects it with the other invalid rows.
+    """
+    malformed = np.zeros(len(df), dtype=bool)
+    for column in df.columns:
+        if INPUT_DTYPES[column] == 'string':
+            df[column] = df[column].astype('string')
+            continue
+        values = pd.to_numeric(df[column], errors='coerce')
+        malformed |= (values.isna() & df[column].notna()).to_numpy()
+        df[column] = values.astype(INPUT_DTYPES[column])
+    if 'lat' in df.columns and malformed.any():
+        df.loc[malformed, 'lat'] = np.nan
+    return df
+
+def normalize_chunk(df, dataset):
+    """
+    Validate a chunk and convert it to the schema of a store dataset
+
+    Returns:
+    (normalized DataFrame with a 'region' column, number of rejected rows)
+    """
+    for column in ('lat', 'lon', 'date'):
+        if column not in df.columns:
+            raise ValueError(f"Detections need a '{column}' column")
+
+    # Dates with a UTC offset are converted to UTC; the store holds naive timestamps
+    dates = pd.to_datetime(df['date'], errors='coerce', format='mixed', utc=True).dt.tz_localize(None)
+    lat = df['lat'].to_numpy(dtype='float64', na_value=np.nan)
+    lon = df['lon'].to_numpy(dtype='float64', na_value=np.nan)
+    valid = (np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+             & dates.notna().to_numpy())
+    df, dates, lat, lon = df[valid], dates[valid], lat[valid], lon[valid]
+
+    if 'area_hectares' in df.columns:
+        area = df['area_hectares'].fillna(0).to_numpy(dtype='float32')
+    else:
+        area = np.zeros(len(df), dtype='float32')
+    # Severity level 0-2, from the input or derived from the affected area
+    levels = np.searchsorted(SEVERITY_AREA_THRESHOLDS[dataset], area, side='right')
+    if 'severity' in df.columns:
+        # Severity names (Low/Medium/High) or hotspot levels (1-3)
+        names = {name: level for level, name in enumerate(SEVERITY_DTYPE.categories)}
+        given_levels = df['severity'].str.strip().str.capitalize().map(names).astype('float64')
+        numeric = pd.to_numeric(df['severity'], errors='coerce') - 1
+        given_levels = given_levels.fillna(numeric.clip(0, 2)).fillna(-1).to_numpy(dtype='int64')
+        levels = np.where(given_levels >= 0, given_levels, levels)
+
+    if dataset == 'hotspots':
+        severity = (levels + 1).astype('int8')
+        if 'risk_score' in df.columns:
+            risk = df['risk_score'].fillna(0).to_numpy(dtype='float32')
+        else:
+            risk = severity * 33
+        out = pd.DataFrame({
+            'lat': lat.astype('float32'),
+            'lon': lon.astype('float32'),
+            'severity': severity,
+            'area_hectares': area,
+            'first_detected': dates.to_numpy(),
+            'risk_score': np.clip(risk, 1, 100).astype('int16'),
+        })
+    else:
+        if 'description' in df.columns:
+            description = df['description'].fillna(DEFAULT_DESCRIPTION).to_numpy(dtype=object)
+        else:
+            description = np.full(len(df), DEFAULT_DESCRIPTION, dtype=object)
+        out = pd.DataFrame({
+            'date': dates.to_numpy(),
+            'severity': pd.Categorical.from_codes(levels, dtype=SEVERITY_DTYPE),
+            'area_hectares': area,
+            'description': pd.Categorical(description),
+            'lat': lat.astype('float32'),
+            'lon': lon.astype('float32'),
+        })
+    out['region'] = regions.REGION_NAMES[regions.classify(lat, lon)]
+    return out, int((~valid).sum())
+
+def import_id(path):
+    """Part file prefix of an input file: the same file always writes the same part files"""
+    name = re.sub(r'[^a-z0-9]+', '_', os.path.splitext(os.path.basename(path))[0].lower()).strip('_')
+    return f"{name or 'import'}-{hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:8]}"
+
+def write_chunk(store_dir, dataset, df, part=None):
+    """
+    Write a normalized chunk to the store, per region (and to Global) and year
+
+    Parameters:
+    part: Part file id (see columnar_store.write_partition); None appends
+
+    Returns:
+    Paths of the files written
+    """
+    date_column = 'first_detected' if dataset == 'hotspots' else 'date'
+    years = df[date_column].dt.year
+    paths = []
+    for (region, year), rows in df.groupby([df['region'], years], sort=False):
+        if region != "Global":
+            paths.append(columnar_store.write_partition(store_dir, dataset, region, year, rows, part))
+    for year, rows in df.groupby(years, sort=False):
+        paths.append(columnar_store.write_partition(store_dir, dataset, "Global", year, rows, part))
+    return paths
+
+def import_file(path, store_dir, dataset='hotspots', chunk_rows=250_000):
+    """
+    Stream one detection file into the store
+
+    Chunk n of the file is written to part files named after the file and n,
+    so importing the same file again replaces its earlier import instead of
+    adding the detections twice.
+
+    Returns:
+    Dictionary with the rows read, imported and rejected and the files written
+    """
+    if dataset not in SEVERITY_AREA_THRESHOLDS:
+        raise ValueError(f"Unknown dataset: {dataset}")
+    extension = os.path.splitext(path)[1].lower()
+    chunks = read_csv_chunks(path, chunk_rows) if extension in ('.csv', '.txt') else read_geojson_chunks(path, chunk_rows)
+
+    file_id = import_id(path)
+    stats = {'read': 0, 'imported': 0, 'rejected': 0, 'files': 0}
+    written = []
+    for index, chunk in enumerate(chunks):
+        normalized, rejected = normalize_chunk(chunk, dataset)
+        stats['read'] += len(chunk)
+        stats['rejected'] += rejected
+        stats['imported'] += len(normalized)
+        if len(normalized):
+            written += write_chunk(store_dir, dataset, normalized, part=f"{file_id}-{index:05d}")
+    stats['files'] = len(written)
+    # Parts of an earlier import of the file that this one did not replace
+    columnar_store.remove_parts(store_dir, dataset, f"{file_id}-", keep=written)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Import CSV/GeoJSON detections into the columnar store")
+    parser.add_argument("files", nargs="+", help="CSV, GeoJSON or line-delimited GeoJSON files")
+    parser.add_argument("--store-dir", default=config.DATA_STORE_DIR or None, required=not config.DATA_STORE_DIR,
+                        help="root directory of the columnar store (default: FOREST_GUARDIAN_DATA_STORE_DIR)")
+    parser.add_argument("--dataset", choices=list(SEVERITY_AREA_THRESHOLDS), default="hotspots")
+    parser.add_argument("--chunk-rows", type=int, default=250_000, help="rows parsed per chunk")
+    args = parser.parse_args()
+
+    total = {'read': 0, 'imported': 0, 'rejected': 0, 'files': 0}
+    start = time.perf_counter()
+    for path in args.files:
+        file_start = time.perf_counter()
+        stats = import_file(path, args.store_dir, args.dataset, args.chunk_rows)
+        elapsed = time.perf_counter() - file_start
+        print(f"{path}: {stats['imported']:,} imported, {stats['rejected']:,} rejected "
+              f"({stats['read'] / max(elapsed, 1e-9):,.0f} rows/s)")
+        for key in total:
+            total[key] += stats[key]
+    elapsed = time.perf_counter() - start
+
+    print(f"Imported {total['imported']:,} of {total['read']:,} rows into {args.dataset} "
+          f"({total['files']:,} files) in {elapsed:.1f}s ({total['read'] / max(elapsed, 1e-9):,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
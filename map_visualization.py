@@ -1,43 +1,234 @@
+import hashlib
+import json
+
 import folium
 from folium.plugins import HeatMap, MarkerCluster, TimeSliderChoropleth
+from folium.template import Template
 import pandas as pd
 import numpy as np
 from branca.colormap import LinearColormap
+from branca.element import MacroElement
+
+import config
+from data_processor import make_rng
+from regions import get_region
+
+def risk_zone_style(risk_score):
+    """Return the (risk level, marker color) of a hotspot's risk score"""
+    if risk_score > 70:
+        return 'High', 'red'
+    if risk_score > 30:
+        return 'Medium', 'orange'
+    return 'Low', 'green'
+
+def risk_zone_popup(spot):
+    """Popup HTML of a hotspot's risk zone marker"""
+    risk_level, _ = risk_zone_style(spot['risk_score'])
+    return f"""
+            <div style="width:200px;">
+                <h4>Deforestation Risk Zone</h4>
+                <p><b>Risk Level:</b> {risk_level} ({spot['risk_score']}/100)</p>
+                <p><b>Area Affected:</b> {spot['area_hectares']:.1f} hectares</p>
+                <p><b>First Detected:</b> {spot['first_detected'].strftime('%d %b %Y')}</p>
+                <p><b>Severity:</b> {spot['severity']} (1-3 scale)</p>
+            </div>
+            """
+
+# Attribution of the CARTO Positron basemap, for tiles served by the tile proxy
+BASEMAP_ATTRIBUTION = ('&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors '
+                       '&copy; <a href="https://carto.com/attributions">CARTO</a>')
+
+def basemap_tiles():
+    """folium.Map tile arguments: the local tile proxy when configured, else CARTO Positron"""
+    if config.TILE_PROXY_URL:
+        return {'tiles': f"{config.TILE_PROXY_URL.rstrip('/')}/tiles/{{z}}/{{x}}/{{y}}.png",
+                'attr': BASEMAP_ATTRIBUTION}
+    return {'tiles': "cartodbpositron"}
+
+# Time-lapse marker colors and names by hotspot severity
+SEVERITY_COLORS = {1: "green", 2: "orange", 3: "red"}
+SEVERITY_NAMES = {1: "Low", 2: "Medium", 3: "High"}
+
+def time_lapse_popup(spot, selected_year=None):
+    """Popup HTML of a hotspot's time-lapse marker"""
+    try:
+        detection_year = spot['first_detected'].year
+    except AttributeError:
+        detection_year = selected_year  # Use selected year if data is corrupt
+
+    # Format area with error handling
+    try:
+        area_str = f"{float(spot['area_hectares']):.1f}"
+    except (ValueError, TypeError, KeyError):
+        area_str = "Unknown"
 
-def create_map(deforestation_data, layers):
+    return f"""
+            <div style="width:200px;">
+                <h4>Deforested Area</h4>
+                <p><b>Year Detected:</b> {detection_year}</p>
+                <p><b>Area Affected:</b> {area_str} hectares</p>
+                <p><b>Severity:</b> {SEVERITY_NAMES.get(spot['severity'], "Unknown")}</p>
+            </div>
+            """
+
+def hotspot_id(spot):
+    """Stable id of a hotspot, derived from its position and detection date"""
+    key = f"{float(spot['lat']):.5f},{float(spot['lon']):.5f},{spot['first_detected']:%Y-%m-%dT%H:%M:%S}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+def hotspot_feature(spot):
+    """
+    JSON-ready description of a hotspot with what both maps draw for it
+
+    Live map updates (see hotspot_diff.py) send these to the browser, which
+    adds, moves or restyles the hotspot's markers from them.
+    """
+    _, risk_color = risk_zone_style(spot['risk_score'])
+    severity = int(spot['severity'])
+    return {
+        'id': hotspot_id(spot),
+        'lat': round(float(spot['lat']), 5),
+        'lon': round(float(spot['lon']), 5),
+        'year': spot['first_detected'].year,
+        'severity': severity,
+        'weight': round(float(spot['area_hectares']) / 1000, 4),
+        'risk_color': risk_color,
+        'risk_popup': risk_zone_popup(spot),
+        'color': SEVERITY_COLORS.get(severity, "blue"),
+        'radius': round(max(3, min(15, np.sqrt(float(spot['area_hectares'])) / 5)), 2),
+        'popup': time_lapse_popup(spot),
+    }
+
+def hotspot_version(features):
+    """Content hash identifying a set of hotspot features (the same in every process)"""
+    payload = json.dumps(sorted(features, key=lambda feature: feature['id']), sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+class LiveHotspotUpdates(MacroElement):
+    """
+    Keeps a map's hotspot layers current by polling the API for deltas
+
+    Every interval the browser asks /api/v1/hotspots/diff for the hotspots
+    added, removed or changed since the version the map shows, and patches
+    the heatmap and markers in place instead of reloading the map.
+
+    Parameters:
+    url: Base URL of api_server.py as reached by browsers
+    deforestation_data: Dictionary with deforestation data the map was built from
+    features: hotspot_feature() of every hotspot of the data
+    heat: Heatmap layer to update (or None)
+    cluster: Marker cluster of risk zone markers to update (or None)
+    groups: Severity -> feature group of time-lapse markers (or None)
+    markers: Hotspot id -> marker already on the map
+    year: Time-lapse year (hotspots detected later are not drawn)
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var cfg = {{ this.config|tojson }};
+            var map = {{ this._parent.get_name() }};
+            var heat = {{ this.heat }}, cluster = {{ this.cluster }}, groups = {{ this.groups }};
+            var markers = {{ this.markers }};
+            var features = {};
+            cfg.features.forEach(function(f) { features[f.id] = f; });
+
+            function container(f) {
+                if (cluster) { return cluster; }
+                if (!groups[f.severity]) { groups[f.severity] = L.featureGroup().addTo(map); }
+                return groups[f.severity];
+            }
+            function marker(f) {
+                if (cluster) {
+                    return L.marker([f.lat, f.lon], {icon: L.AwesomeMarkers.icon(
+                        {icon: "warning", iconColor: "white", markerColor: f.risk_color, prefix: "fa"})}
+                    ).bindPopup(f.risk_popup, {maxWidth: 300});
+                }
+                return L.circleMarker([f.lat, f.lon], {radius: f.radius, color: f.color, fill: true,
+                    fillOpacity: 0.6}).bindPopup(f.popup, {maxWidth: 300});
+            }
+            function remove(id) {
+                if (markers[id]) { container(features[id]).removeLayer(markers[id]); delete markers[id]; }
+                delete features[id];
+            }
+            function add(f) {
+                features[f.id] = f;
+                if ((cluster || groups) && (cfg.year === null || f.year <= cfg.year)) {
+                    markers[f.id] = marker(f);
+                    container(f).addLayer(markers[f.id]);
+                }
+            }
+            function apply(delta) {
+                if (delta.full) { Object.keys(features).forEach(remove); delta.full.forEach(add); }
+                (delta.removed || []).forEach(remove);
+                (delta.changed || []).forEach(function(f) { remove(f.id); add(f); });
+                (delta.added || []).forEach(add);
+                if (heat) {
+                    heat.setLatLngs(Object.keys(features).map(function(id) {
+                        var f = features[id];
+                        return [f.lat, f.lon, f.weight];
+                    }));
+                }
+                cfg.version = delta.version;
+            }
+            setInterval(function() {
+                fetch(cfg.url + "&since=" + cfg.version)
+                    .then(function(response) { return response.ok ? response.json() : null; })
+                    .then(function(delta) { if (delta && delta.version !== cfg.version) { apply(delta); } })
+                    .catch(function() {});
+            }, cfg.interval * 1000);
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, url, deforestation_data, features, heat=None, cluster=None, groups=None, markers=None,
+                 year=None):
+        super().__init__()
+        self._name = "LiveHotspotUpdates"
+        start, end = deforestation_data['year_range']
+        query = f"region={deforestation_data['region']}&start={start}&end={end}".replace(' ', '%20')
+        self.config = {
+            'url': f"{url.rstrip('/')}/api/v1/hotspots/diff?{query}",
+            'version': hotspot_version(features),
+            'interval': config.MAP_UPDATE_SECONDS,
+            'year': year,
+            'features': features,
+        }
+        self.heat = heat.get_name() if heat is not None else "null"
+        self.cluster = cluster.get_name() if cluster is not None else "null"
+        self.groups = ("{" + ", ".join(f'"{severity}": {group.get_name()}' for severity, group in groups.items()) + "}"
+                       if groups is not None else "null")
+        self.markers = "{" + ", ".join(f'"{spot_id}": {layer.get_name()}'
+                                       for spot_id, layer in (markers or {}).items()) + "}"
+
+def create_map(deforestation_data, layers, live_updates_url=None):
     """
     Create an interactive map with deforestation hotspots and layers
     
     Parameters:
     deforestation_data: Dictionary with deforestation data
     layers: Dictionary with layer toggle states
+    live_updates_url: Base URL of the API to poll for hotspot changes (None for a static map)
     
     Returns:
     Folium map object
     """
     # Get region center for map initialization
-    region_centers = {
-        "Amazon": [-5.0, -60.0],
-        "Congo Basin": [0.0, 20.0],
-        "Southeast Asia": [5.0, 110.0],
-        "Central America": [15.0, -85.0],
-        "Global": [0.0, 0.0]
-    }
-    
     region = deforestation_data['region']
-    center = region_centers.get(region, [0.0, 0.0])
-    zoom_start = 4 if region != "Global" else 2
+    center = list(get_region(region).center)
+    zoom_start = get_region(region).zoom
     
     # Create base map
     m = folium.Map(
         location=center,
         zoom_start=zoom_start,
-        tiles="cartodbpositron"
+        **basemap_tiles()
     )
     
     # Add layer control
     folium.LayerControl().add_to(m)
     
+    heatmap, marker_cluster, markers = None, None, {}
+    
     # Add deforestation heatmap if enabled
     if layers.get('deforestation', True):
         # Extract hotspot data
@@ -52,7 +243,7 @@ def create_map(deforestation_data, layers):
         
         # Create heatmap layer - Use string keys for gradient dictionary
         # The error was happening because Folium can't handle float keys in dictionaries
-        HeatMap(
+        heatmap = HeatMap(
             data=heat_data,
             radius=15,
             gradient={"0.4": 'blue', "0.65": 'yellow', "1.0": 'red'},
@@ -67,35 +258,16 @@ def create_map(deforestation_data, layers):
         
         for spot in deforestation_data['hotspots']:
             # Determine icon color based on risk score
-            risk_score = spot['risk_score']
-            
-            if risk_score > 70:
-                icon_color = 'red'
-                risk_level = 'High'
-            elif risk_score > 30:
-                icon_color = 'orange'
-                risk_level = 'Medium'
-            else:
-                icon_color = 'green'
-                risk_level = 'Low'
-            
-            # Create popup content
-            popup_html = f"""
-            <div style="width:200px;">
-                <h4>Deforestation Risk Zone</h4>
-                <p><b>Risk Level:</b> {risk_level} ({risk_score}/100)</p>
-                <p><b>Area Affected:</b> {spot['area_hectares']:.1f} hectares</p>
-                <p><b>First Detected:</b> {spot['first_detected'].strftime('%d %b %Y')}</p>
-                <p><b>Severity:</b> {spot['severity']} (1-3 scale)</p>
-            </div>
-            """
+            _, icon_color = risk_zone_style(spot['risk_score'])
             
             # Add marker to cluster
-            folium.Marker(
+            marker = folium.Marker(
                 location=[spot['lat'], spot['lon']],
-                popup=folium.Popup(popup_html, max_width=300),
+                popup=folium.Popup(risk_zone_popup(spot), max_width=300),
                 icon=folium.Icon(color=icon_color, icon='warning', prefix='fa')
             ).add_to(marker_cluster)
+            if live_updates_url:
+                markers[hotspot_id(spot)] = marker
         
         marker_cluster.add_to(m)
     
@@ -113,13 +285,16 @@ def create_map(deforestation_data, layers):
         # Region center
         center_lat, center_lon = center
         
+        # Seeded like the protected area statistics, so the areas stay put across reruns
+        rng = make_rng('protected_area_shapes', region, deforestation_data.get('snapshot_version', 0))
+        
         for i in range(num_areas):
             # Generate random position not too far from center
-            lat = center_lat + np.random.uniform(-5, 5)
-            lon = center_lon + np.random.uniform(-5, 5)
+            lat = center_lat + rng.uniform(-5, 5)
+            lon = center_lon + rng.uniform(-5, 5)
             
             # Area size (radius in meters)
-            radius = np.random.uniform(10000, 50000)
+            radius = rng.uniform(10000, 50000)
             
             # Status based on overall protection rates
             status_odds = [
@@ -136,7 +311,7 @@ def create_map(deforestation_data, layers):
                 status_odds = [0.33, 0.33, 0.34]  # Default equal probabilities
             
             # Generate status
-            status = np.random.choice(
+            status = rng.choice(
                 ['Well Protected', 'At Risk', 'Critical'],
                 p=status_odds
             )
@@ -160,37 +335,35 @@ def create_map(deforestation_data, layers):
         
         protected_group.add_to(m)
     
+    if live_updates_url:
+        features = [hotspot_feature(spot) for spot in deforestation_data['hotspots']]
+        LiveHotspotUpdates(live_updates_url, deforestation_data, features,
+                           heat=heatmap, cluster=marker_cluster, markers=markers).add_to(m)
+    
     return m
 
-def create_time_lapse_map(deforestation_data, selected_year):
+def create_time_lapse_map(deforestation_data, selected_year, live_updates_url=None):
     """
     Create a map showing the deforestation state for a specific year
     
     Parameters:
     deforestation_data: Dictionary with deforestation data
     selected_year: Year to display
+    live_updates_url: Base URL of the API to poll for hotspot changes (None for a static map)
     
     Returns:
     Folium map object
     """
     # Get region center for map initialization
-    region_centers = {
-        "Amazon": [-5.0, -60.0],
-        "Congo Basin": [0.0, 20.0],
-        "Southeast Asia": [5.0, 110.0],
-        "Central America": [15.0, -85.0],
-        "Global": [0.0, 0.0]
-    }
-    
     region = deforestation_data['region']
-    center = region_centers.get(region, [0.0, 0.0])
-    zoom_start = 4 if region != "Global" else 2
+    center = list(get_region(region).center)
+    zoom_start = get_region(region).zoom
     
     # Create base map
     m = folium.Map(
         location=center,
         zoom_start=zoom_start,
-        tiles="cartodbpositron"
+        **basemap_tiles()
     )
     
     # Filter hotspots to only show those detected up to the selected year
@@ -212,6 +385,8 @@ def create_time_lapse_map(deforestation_data, selected_year):
     # Add a control layer
     folium.LayerControl().add_to(m)
     
+    groups, markers = {}, {}
+    
     # Create severity-based markers
     for severity in [1, 2, 3]:
         # Filter by severity
@@ -222,34 +397,17 @@ def create_time_lapse_map(deforestation_data, selected_year):
             continue
         
         # Determine group name and color
-        severity_name = {1: "Low", 2: "Medium", 3: "High"}.get(severity, "Unknown")
-        color = {1: "green", 2: "orange", 3: "red"}.get(severity, "blue")
+        severity_name = SEVERITY_NAMES.get(severity, "Unknown")
+        color = SEVERITY_COLORS.get(severity, "blue")
         
         # Create feature group
         group = folium.FeatureGroup(name=f"{severity_name} Severity", show=True)
+        groups[severity] = group
         
         # Add markers
         for spot in severity_hotspots:
             # Create popup content
-            try:
-                detection_year = spot['first_detected'].year
-            except AttributeError:
-                detection_year = selected_year  # Use selected year if data is corrupt
-                
-            # Format area with error handling
-            try:
-                area_str = f"{float(spot['area_hectares']):.1f}"
-            except (ValueError, TypeError, KeyError):
-                area_str = "Unknown"
-                
-            popup_html = f"""
-            <div style="width:200px;">
-                <h4>Deforested Area</h4>
-                <p><b>Year Detected:</b> {detection_year}</p>
-                <p><b>Area Affected:</b> {area_str} hectares</p>
-                <p><b>Severity:</b> {severity_name}</p>
-            </div>
-            """
+            popup_html = time_lapse_popup(spot, selected_year)
             
             # Add circle marker (with error handling for radius calculation)
             try:
@@ -257,7 +415,7 @@ def create_time_lapse_map(deforestation_data, selected_year):
             except (ValueError, TypeError, KeyError):
                 radius = 5  # Default radius if calculation fails
                 
-            folium.CircleMarker(
+            marker = folium.CircleMarker(
                 location=[spot['lat'], spot['lon']],
                 radius=radius,  # Size proportional to area
                 color=color,
@@ -265,6 +423,8 @@ def create_time_lapse_map(deforestation_data, selected_year):
                 fill_opacity=0.6,
                 popup=folium.Popup(popup_html, max_width=300)
             ).add_to(group)
+            if live_updates_url:
+                markers[hotspot_id(spot)] = marker
         
         group.add_to(m)
     
@@ -276,4 +436,9 @@ def create_time_lapse_map(deforestation_data, selected_year):
     '''
     m.get_root().html.add_child(folium.Element(title_html))
     
+    if live_updates_url:
+        features = [hotspot_feature(spot) for spot in deforestation_data['hotspots']]
+        LiveHotspotUpdates(live_updates_url, deforestation_data, features,
+                           groups=groups, markers=markers, year=selected_year).add_to(m)
+    
     return m
@@ -0,0 +1,273 @@
+"""
+Offline materialization of static dashboard snapshots.
+
+For stakeholder portals every region x year range view of the dashboard is
+written out as a static bundle, so a plain web server can serve it without
+running Python per request:
+
+    OUTPUT_DIR/
+        index.html                  links to every view
+        manifest.json               every bundle with its files, sizes and content hashes
+        <region>/alerts.json        the region's alerts at each sensitivity
+        <region>/<start>-<end>/
+            index.html              metrics, map, time-lapse and charts of the view
+            map.html                interactive hotspot map
+            timelapse/<year>.html   time-lapse map of each year of the range
+            data.json               the view's deforestation and biodiversity datasets
+
+Each view is built by one task on a pool of worker processes. The loaders,
+maps and charts are the dashboard's own, so the pages show what the
+dashboard shows. Every file is written under a temporary name and renamed
+into place. manifest.json is replaced last, so a portal following it never
+links a bundle that is still being written.
+
+As in the weekly reports, the maps load Leaflet and the charts load
+plotly.js from their CDNs.
+
+Usage:
+    python materialize.py OUTPUT_DIR [--regions Amazon "Congo Basin"] [--years 2015 2024]
+                          [--full-range-only] [--workers N]
+"""
+import argparse
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import regions
+from data_processor import BASE_YEAR
+
+ALERT_THRESHOLDS = ("Low", "Medium", "High")
+
+VIEW_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+    body {{ font-family: sans-serif; margin: 2rem auto; max-width: 1100px; color: #1f2d1f; }}
+    h1 {{ color: #2e7d32; }}
+    .metrics {{ display: flex; gap: 1rem; margin: 1rem 0 2rem; }}
+    .metric {{ flex: 1; padding: 1rem; border-radius: 8px; background: #f1f8e9; }}
+    .metric .value {{ font-size: 1.6rem; font-weight: bold; }}
+    iframe {{ width: 100%; height: 520px; border: 0; }}
+</style>
+</head>
+<body>
+<p><a href="../../index.html">All views</a> | <a href="data.json">Data (JSON)</a></p>
+<h1>{title}</h1>
+<p>Snapshot generated {generated}.</p>
+<div class="metrics">
+    <div class="metric"><div>Total forest loss</div><div class="value">{total_loss:,.0f} ha</div></div>
+    <div class="metric"><div>Loss change</div><div class="value">{loss_change:.1f}%</div></div>
+    <div class="metric"><div>Species at risk</div><div class="value">{species_at_risk}</div></div>
+    <div class="metric"><div>Risk score</div><div class="value">{risk_score}/100</div></div>
+</div>
+<h2>Deforestation map</h2>
+<iframe src="map.html" title="Deforestation map"></iframe>
+<h2>Time-lapse</h2>
+<select onchange="document.getElementById('timelapse').src = 'timelapse/' + this.value + '.html'">
+{year_options}
+</select>
+<iframe id="timelapse" src="timelapse/{first_year}.html" title="Time-lapse map"></iframe>
+<h2>Deforestation trend</h2>
+{trend_chart}
+<h2>Biodiversity impact</h2>
+{biodiversity_chart}
+{risk_chart}
+</body>
+</html>
+"""
+
+INDEX_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Forest Guardian snapshots</title>
+<style>
+    body {{ font-family: sans-serif; margin: 2rem auto; max-width: 1100px; color: #1f2d1f; }}
+    h1 {{ color: #2e7d32; }}
+    li {{ display: inline-block; margin: 0 0.8rem 0.4rem 0; }}
+</style>
+</head>
+<body>
+<h1>Forest Guardian snapshots</h1>
+<p>Generated {generated}: {views:,} views of {regions} regions.</p>
+{sections}
+</body>
+</html>
+"""
+
+def region_slug(region):
+    """Directory name of a region (e.g. congo_basin)"""
+    return region.lower().replace(' ', '_')
+
+def view_path(region, year_range):
+    """Bundle directory of a view, relative to the output directory"""
+    return f"{region_slug(region)}/{year_range[0]}-{year_range[1]}"
+
+def year_ranges(first_year, last_year, full_range_only=False):
+    """Every (start, end) year range selectable in the sidebar between two years"""
+    if full_range_only:
+        return [(first_year, last_year)]
+    return [(start, end) for start in range(first_year, last_year + 1) for end in range(start, last_year + 1)]
+
+def write_file(out_dir, relative_path, content):
+    """
+    Write a bundle file atomically
+
+    Returns:
+    (relative path, {'bytes', 'sha256'}) for the manifest
+    """
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    path = os.path.join(out_dir, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(data)
+    os.replace(f"{path}.tmp", path)
+    return relative_path, {'bytes': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+
+def materialize_view(out_dir, region, year_range, snapshot_version=0):
+    """
+    Build the bundle of one region x year range view
+
+    Runs in a worker process, so it loads the data itself rather than going
+    through the dashboard's shared data service.
+
+    Returns:
+    The view's manifest entry
+    """
+    from api_server import jsonable
+    from charts import plot_biodiversity_impact, plot_deforestation_trend, plot_risk_distribution
+    from data_processor import load_biodiversity_data, load_deforestation_data
+    from map_visualization import create_map, create_time_lapse_map
+
+    deforestation_data = load_deforestation_data(region, year_range, snapshot_version)
+    biodiversity_data = load_biodiversity_data(region, year_range, snapshot_version)
+    base = view_path(region, year_range)
+    years = range(year_range[0], year_range[1] + 1)
+    layers = {'deforestation': True, 'protected_areas': True, 'risk_zones': True}
+
+    files = [write_file(out_dir, f"{base}/map.html", create_map(deforestation_data, layers).get_root().render())]
+    files += [
+        write_file(out_dir, f"{base}/timelapse/{year}.html",
+                   create_time_lapse_map(deforestation_data, year).get_root().render())
+        for year in years
+    ]
+    files.append(write_file(out_dir, f"{base}/data.json", json.dumps(jsonable({
+        'deforestation': deforestation_data, 'biodiversity': biodiversity_data,
+    }), separators=(',', ':'))))
+
+    page = VIEW_TEMPLATE.format(
+        title=html.escape(f"Deforestation & Biodiversity: {region}, {year_range[0]}-{year_range[1]}"),
+        generated=f"{datetime.now():%Y-%m-%d %H:%M}",
+        total_loss=deforestation_data['total_loss_hectares'],
+        loss_change=deforestation_data['loss_change_percent'],
+        species_at_risk=biodiversity_data['species_at_risk'],
+        risk_score=biodiversity_data['risk_score'],
+        year_options="\n".join(f'<option value="{year}">{year}</option>' for year in years),
+        first_year=year_range[0],
+        trend_chart=plot_deforestation_trend(deforestation_data).to_html(full_html=False, include_plotlyjs='cdn'),
+        biodiversity_chart=plot_biodiversity_impact(biodiversity_data).to_html(full_html=False,
+                                                                               include_plotlyjs=False),
+        risk_chart=plot_risk_distribution(biodiversity_data).to_html(full_html=False, include_plotlyjs=False),
+    )
+    # The page goes last: it only links files that already exist
+    files.append(write_file(out_dir, f"{base}/index.html", page))
+    return {
+        'region': region,
+        'start': year_range[0],
+        'end': year_range[1],
+        'path': f"{base}/index.html",
+        'files': dict(files),
+    }
+
+def materialize_alerts(out_dir, region, snapshot_version=0):
+    """Write a region's alerts at every sensitivity; returns its manifest entry"""
+    from api_server import jsonable
+    from data_processor import load_alert_data
+
+    alerts = {}
+    for threshold in ALERT_THRESHOLDS:
+        data = load_alert_data(region, threshold, snapshot_version)
+        alerts[threshold] = {**data.attrs, 'alerts': data}
+    relative_path, file_info = write_file(out_dir, f"{region_slug(region)}/alerts.json",
+                                          json.dumps(jsonable(alerts), separators=(',', ':')))
+    return {'region': region, 'path': relative_path, 'files': {relative_path: file_info}}
+
+def write_index(out_dir, views):
+    """Write the page linking every view"""
+    sections = []
+    for region in dict.fromkeys(view['region'] for view in views):
+        links = "\n".join(
+            f'<li><a href="{html.escape(view["path"])}">{view["start"]}-{view["end"]}</a></li>'
+            for view in sorted((view for view in views if view['region'] == region),
+                               key=lambda view: (view['start'], view['end']))
+        )
+        sections.append(f"<h2>{html.escape(region)}</h2>\n"
+                        f'<p><a href="{region_slug(region)}/alerts.json">Alerts (JSON)</a></p>\n<ul>\n{links}\n</ul>')
+    return write_file(out_dir, "index.html", INDEX_TEMPLATE.format(
+        generated=f"{datetime.now():%Y-%m-%d %H:%M}", views=len(views),
+        regions=len(sections), sections="\n".join(sections),
+    ))
+
+def materialize(out_dir, region_names, ranges, workers=None, snapshot_version=0):
+    """
+    Build every view bundle on a pool of worker processes, then the index and manifest
+
+    Returns:
+    The manifest dictionary
+    """
+    started = time.perf_counter()
+    views, alerts = [], []
+    # Spawned rather than forked workers: safe when called from a threaded process
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(materialize_alerts, out_dir, region, snapshot_version) for region in region_names]
+        futures += [pool.submit(materialize_view, out_dir, region, year_range, snapshot_version)
+                    for region in region_names for year_range in ranges]
+        total_views = len(futures) - len(region_names)
+        for future in as_completed(futures):
+            entry = future.result()
+            if 'start' not in entry:
+                alerts.append(entry)
+                continue
+            views.append(entry)
+            if len(views) % 50 == 0 or len(views) == total_views:
+                print(f"{len(views):,}/{total_views:,} views ({time.perf_counter() - started:.0f}s)")
+
+    views.sort(key=lambda view: (region_names.index(view['region']), view['start'], view['end']))
+    index_path, index_info = write_index(out_dir, views)
+    manifest = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'snapshot_version': snapshot_version,
+        'index': {index_path: index_info},
+        'alerts': sorted(alerts, key=lambda entry: region_names.index(entry['region'])),
+        'views': views,
+    }
+    write_file(out_dir, "manifest.json", json.dumps(manifest, indent=1))
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Write every region x year range view as a static HTML/JSON bundle")
+    parser.add_argument("output_dir")
+    parser.add_argument("--regions", nargs="+", choices=list(regions.REGIONS), default=list(regions.REGIONS))
+    parser.add_argument("--years", type=int, nargs=2, default=[BASE_YEAR, datetime.now().year], metavar=("FIRST", "LAST"))
+    parser.add_argument("--full-range-only", action="store_true", help="only the FIRST-LAST range of each region")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--snapshot-version", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    ranges = year_ranges(args.years[0], args.years[1], args.full_range_only)
+    manifest = materialize(args.output_dir, args.regions, ranges, args.workers, args.snapshot_version)
+    files = sum(len(entry['files']) for entry in manifest['views'] + manifest['alerts'])
+    size = sum(info['bytes'] for entry in manifest['views'] + manifest['alerts'] for info in entry['files'].values())
+    print(f"Wrote {len(manifest['views']):,} views ({files:,} files, {size / 1e6:,.0f} MB) "
+          f"to {args.output_dir} in {time.perf_counter() - started:.0f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Local stand-ins for an SMTP server and an HTTP SMS gateway.
+
+They accept what notifications.py sends, keep it in memory and print a line
+per message, so notification delivery can be tested without real servers.
+With --fail-rate a share of the messages is rejected with a transient error
+(SMTP 451 / HTTP 503) to exercise the retries.
+
+Usage:
+    python notification_stubs.py [--smtp-port 8025] [--sms-port 8026] [--fail-rate 0.1]
+
+then, in another shell:
+    FOREST_GUARDIAN_SMTP_HOST=localhost FOREST_GUARDIAN_SMTP_PORT=8025 \\
+    FOREST_GUARDIAN_SMS_GATEWAY_URL=http://localhost:8026/sms \\
+    FOREST_GUARDIAN_EMAIL_RATE_PER_SECOND=100 FOREST_GUARDIAN_SMS_RATE_PER_SECOND=100 \\
+    python notifications.py test
+
+(without the rate settings the test takes over 100 s at the default SMS rate
+of one message per second)
+"""
+import argparse
+import asyncio
+import email
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubSMTPServer:
+    """
+    Minimal SMTP server keeping the received messages
+
+    Parameters:
+    fail_rate: Share of messages rejected with a transient error
+    verbose: Print a line per message
+    """
+
+    def __init__(self, fail_rate=0.0, verbose=True):
+        self.fail_rate = fail_rate
+        self.verbose = verbose
+        self.messages = []
+        self.connections = 0
+        self.rejected = 0
+
+    async def handle(self, reader, writer):
+        """Serve one client connection"""
+        self.connections += 1
+        writer.write(b"220 stub ESMTP ready\r\n")
+        recipients = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line[:4].upper()
+            if command == b"EHLO":
+                writer.write(b"250-stub\r\n250 8BITMIME\r\n")
+            elif command in (b"HELO", b"NOOP"):
+                writer.write(b"250 OK\r\n")
+            elif command in (b"MAIL", b"RSET"):
+                recipients = []
+                writer.write(b"250 OK\r\n")
+            elif command == b"RCPT":
+                recipients.append(line[8:].strip(b" <>\r\n").decode())
+                writer.write(b"250 OK\r\n")
+            elif command == b"DATA":
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+                data = bytearray()
+                while (chunk := await reader.readline()) not in (b".\r\n", b""):
+                    data += chunk[1:] if chunk.startswith(b"..") else chunk
+                if random.random() < self.fail_rate:
+                    self.rejected += 1
+                    writer.write(b"451 Temporary failure, try again\r\n")
+                else:
+                    message = email.message_from_bytes(bytes(data))
+                    self.messages.append((recipients, message))
+                    if self.verbose:
+                        print(f"SMTP  {', '.join(recipients)}: {message['Subject']}")
+                    writer.write(b"250 Queued\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"502 Command not implemented\r\n")
+            await writer.drain()
+        writer.close()
+
+    async def serve(self, host="localhost", port=8025):
+        """Start listening; returns the asyncio server"""
+        return await asyncio.start_server(self.handle, host, port)
+
+class StubSMSGateway(ThreadingHTTPServer):
+    """
+    HTTP server accepting JSON {"to", "message"} POSTs, like an SMS gateway
+
+    Parameters:
+    address: (host, port) to listen on
+    fail_rate: Share of messages rejected with 503
+    verbose: Print a line per message
+    """
+
+    def __init__(self, address, fail_rate=0.0, verbose=True):
+        super().__init__(address, _SMSHandler)
+        self.fail_rate = fail_rate
+        self.verbose = verbose
+        self.messages = []
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+class _SMSHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so senders can reuse their connections
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            payload = json.loads(body)
+            to, message = payload['to'], payload['message']
+        except (ValueError, KeyError):
+            return self._reply(400, {'error': "expected JSON with 'to' and 'message'"})
+        with self.server._lock:
+            if random.random() < self.server.fail_rate:
+                self.server.rejected += 1
+                return self._reply(503, {'error': "temporarily unavailable"})
+            self.server.messages.append((to, message))
+        if self.server.verbose:
+            print(f"SMS   {to}: {message}")
+        self._reply(200, {'status': "queued"})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+async def serve(smtp_port, sms_port, fail_rate, verbose):
+    smtp = StubSMTPServer(fail_rate, verbose)
+    server = await smtp.serve(port=smtp_port)
+    gateway = StubSMSGateway(("localhost", sms_port), fail_rate, verbose)
+    threading.Thread(target=gateway.serve_forever, daemon=True).start()
+    print(f"SMTP stub on localhost:{smtp_port}, SMS stub on http://localhost:{sms_port}/sms (Ctrl+C to stop)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        gateway.shutdown()
+        print(f"Received {len(smtp.messages):,} emails over {smtp.connections:,} connections "
+              f"({smtp.rejected:,} rejected) and {len(gateway.messages):,} SMS ({gateway.rejected:,} rejected)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local SMTP and SMS gateway stubs")
+    parser.add_argument("--smtp-port", type=int, default=8025)
+    parser.add_argument("--sms-port", type=int, default=8026)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of messages rejected (transient)")
+    parser.add_argument("--quiet", action="store_true", help="only print the totals")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.smtp_port, args.sms_port, args.fail_rate, not args.quiet))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,623 @@
+"""
+Email and SMS notifications of new alerts.
+
+Subscriptions (a user's address per channel, for the region and alert
+threshold they watch) and a log of the alerts already sent to each address
+are kept in the detection database (see detection_db.py).
+
+New alerts are handed over by the data refreshes (every view with
+subscribers is loaded and submitted, whether or not a session shows it) and
+by the live alert feed, never by dashboard requests. Delivery runs on an
+asyncio event loop in a background thread:
+
+* new alerts are collected per recipient for NOTIFICATION_BATCH_SECONDS (or
+  until MAX_DIGEST_ALERTS are pending) and sent as one digest, so a burst of
+  thousands of alerts becomes one message per recipient
+* every channel has a token-bucket rate limit and a small pool of reused
+  SMTP or HTTP connections, shared by all concurrent deliveries
+* transient failures are retried with exponential backoff; permanent ones
+  (refused recipients, 4xx gateway responses) are dropped
+* an alert is logged as sent to an address once its digest is delivered, and
+  is never sent to that address again
+
+The blocking smtplib/http.client calls run in threads via asyncio.to_thread;
+the pool size bounds how many run at once. notification_stubs.py provides
+local SMTP and SMS servers to test against.
+
+Usage:
+    python notifications.py test [--recipients 100] [--alerts 5000]
+
+The test waits until every digest is delivered, which the rate limits bound:
+100 recipients take about 100 s at the default SMS_RATE_PER_SECOND of 1, and
+about 15 s with FOREST_GUARDIAN_EMAIL_RATE_PER_SECOND=100 and
+FOREST_GUARDIAN_SMS_RATE_PER_SECOND=100 against notification_stubs.py.
+"""
+import argparse
+import asyncio
+import atexit
+import http.client
+import json
+import random
+import re
+import smtplib
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
+from urllib.parse import urlsplit
+
+import config
+from data_processor import THRESHOLD_SEVERITIES
+from detection_db import DetectionDB, detection_db, stable_alert_ids
+from utils import format_location
+
+# A digest is sent early once this many alerts are pending for a recipient
+MAX_DIGEST_ALERTS = 1000
+
+# Alerts listed in an email digest (the rest are only counted)
+EMAIL_LISTED_ALERTS = 50
+
+# Open connections kept per channel
+POOL_SIZE = 4
+
+# Delivery attempts per digest, and the delay before the first retry (doubled
+# for every further retry)
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 1.0
+
+CHANNELS = ('email', 'sms')
+
+ADDRESS_PATTERNS = {
+    'email': re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$"),
+    'sms': re.compile(r"^\+?[0-9 ()-]{7,20}$"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notification_subscriptions (
+    user_id TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    address TEXT NOT NULL,
+    region TEXT NOT NULL,
+    alert_threshold TEXT NOT NULL,
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (user_id, channel)
+);
+CREATE INDEX IF NOT EXISTS idx_notification_subscriptions_region
+    ON notification_subscriptions (region, alert_threshold);
+CREATE TABLE IF NOT EXISTS notifications_sent (
+    channel TEXT NOT NULL,
+    address TEXT NOT NULL,
+    alert_id INTEGER NOT NULL,
+    sent_at INTEGER NOT NULL,
+    PRIMARY KEY (channel, address, alert_id)
+) WITHOUT ROWID;
+"""
+
+def valid_address(channel, address):
+    """Check that an address looks like an email address or phone number"""
+    return bool(ADDRESS_PATTERNS[channel].match(address.strip()))
+
+class DeliveryError(Exception):
+    """A message could not be delivered; permanent errors are not retried"""
+
+    def __init__(self, message, permanent=False):
+        super().__init__(message)
+        self.permanent = permanent
+
+class RateLimiter:
+    """
+    Token bucket shared by the deliveries of one channel
+
+    Parameters:
+    rate: Messages per second
+    burst: Messages that may be sent at once after an idle period
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a message may be sent"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class ConnectionPool:
+    """
+    Reusable blocking connections, opened on demand (at most size at a time)
+
+    Parameters:
+    connect: Opens a connection (called in a worker thread)
+    close: Closes a connection
+    size: Maximum number of connections
+    """
+
+    def __init__(self, connect, close, size=POOL_SIZE):
+        self._connect = connect
+        self._close = close
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection; it is discarded rather than reused if the block fails"""
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await asyncio.to_thread(self._connect)
+            try:
+                yield conn
+            except BaseException:
+                await asyncio.to_thread(self._safe_close, conn)
+                raise
+            self._idle.append(conn)
+
+    def _safe_close(self, conn):
+        try:
+            self._close(conn)
+        except Exception:
+            pass
+
+    def close(self):
+        """Close the idle connections"""
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            self._safe_close(conn)
+
+class EmailTransport:
+    """Sends digests over pooled SMTP connections"""
+    channel = 'email'
+
+    def __init__(self, host, port=25, username="", password="", starttls=False,
+                 sender=config.NOTIFICATION_SENDER, rate=config.EMAIL_RATE_PER_SECOND):
+        self.host, self.port = host, port
+        self.username, self.password = username, password
+        self.starttls = starttls
+        self.sender = sender
+        self.limiter = RateLimiter(rate)
+        self.pool = ConnectionPool(self._connect, lambda smtp: smtp.quit())
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    async def send(self, address, subject, body):
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = address
+        message['Subject'] = subject
+        message.set_content(body)
+        try:
+            async with self.pool.connection() as smtp:
+                await asyncio.to_thread(smtp.send_message, message)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise DeliveryError(str(e), permanent=all(code >= 500 for code, _ in e.recipients.values())) from e
+        except smtplib.SMTPResponseException as e:
+            raise DeliveryError(f"{e.smtp_code} {e.smtp_error!r}", permanent=e.smtp_code >= 500) from e
+
+class SmsTransport:
+    """Sends digests to an HTTP SMS gateway (JSON POST of to/message) over pooled keep-alive connections"""
+    channel = 'sms'
+
+    def __init__(self, url, rate=config.SMS_RATE_PER_SECOND):
+        parts = urlsplit(url)
+        self.scheme, self.netloc = parts.scheme, parts.netloc
+        self.path = parts.path or "/"
+        self.limiter = RateLimiter(rate)
+        self.pool = ConnectionPool(self._connect, lambda conn: conn.close())
+
+    def _connect(self):
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.netloc, timeout=30)
+
+    def _post(self, conn, payload):
+        conn.request("POST", self.path, body=payload, headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        response.read()
+        return response.status
+
+    async def send(self, address, subject, body):
+        payload = json.dumps({'to': address, 'message': body}).encode("utf-8")
+        async with self.pool.connection() as conn:
+            status = await asyncio.to_thread(self._post, conn, payload)
+        if status >= 400:
+            raise DeliveryError(f"SMS gateway returned {status}", permanent=status < 500 and status != 429)
+
+def configured_transports():
+    """Transports of the channels configured in config.py, by channel"""
+    transports = {}
+    if config.SMTP_HOST:
+        transports['email'] = EmailTransport(config.SMTP_HOST, config.SMTP_PORT, config.SMTP_USERNAME,
+                                             config.SMTP_PASSWORD, config.SMTP_STARTTLS)
+    if config.SMS_GATEWAY_URL:
+        transports['sms'] = SmsTransport(config.SMS_GATEWAY_URL)
+    return transports
+
+def digest_message(channel, region, alerts):
+    """
+    Build the subject and text of a digest
+
+    Parameters:
+    alerts: List of alert dictionaries, most severe first
+
+    Returns:
+    (subject, body)
+    """
+    high = sum(alert['severity'] == "High" for alert in alerts)
+    subject = f"Forest Guardian: {len(alerts)} new deforestation alert{'s' if len(alerts) != 1 else ''} in {region}"
+    largest = max(alerts, key=lambda alert: alert['area_hectares'])
+    if channel == 'sms':
+        return subject, (f"{subject} ({high} High). Largest: {largest['area_hectares']:,.0f} ha at "
+                         f"{format_location(largest['lat'], largest['lon'])}")
+
+    lines = [f"{len(alerts)} new alerts ({high} High severity) were detected in {region}.", ""]
+    for alert in alerts[:EMAIL_LISTED_ALERTS]:
+        lines.append(f"[{alert['severity']}] {alert['date']:%Y-%m-%d %H:%M}  {alert['area_hectares']:,.1f} ha  "
+                     f"{format_location(alert['lat'], alert['lon'])}  {alert['description']}")
+    if len(alerts) > EMAIL_LISTED_ALERTS:
+        lines.append(f"... and {len(alerts) - EMAIL_LISTED_ALERTS:,} more")
+    return subject, "\n".join(lines)
+
+class NotificationDispatcher:
+    """
+    Batched, rate-limited delivery of new alerts to subscribers
+
+    Parameters:
+    db: DetectionDB holding the subscriptions and the sent log
+    transports: Transports by channel ('email', 'sms'); channels without one are not delivered
+    batch_seconds: How long new alerts are collected per recipient before a digest is sent
+    """
+
+    def __init__(self, db, transports, batch_seconds=config.NOTIFICATION_BATCH_SECONDS):
+        self.db = db
+        self.transports = transports
+        self.batch_seconds = batch_seconds
+        self.stats = {'submitted': 0, 'digests': 0, 'alerts': 0, 'retries': 0, 'failed': 0}
+        self._schema_ready = False
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._load_alerts = None
+        self._submitted = set()  # recently submitted alert batches, to skip repeats
+        # Alert ids queued or being delivered per (channel, address), not yet
+        # logged as sent; a later submission skips them
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        # Owned by the event loop thread
+        self._pending = {}  # (channel, address) -> (region, {alert_id: alert})
+        self._timers = {}
+        self._deliveries = set()
+        self._submissions = set()
+
+    def _connection(self):
+        """Return this thread's connection, creating the notification tables on first use"""
+        if not self._schema_ready:
+            with self.db.transaction() as conn:
+                conn.executescript(SCHEMA)
+            self._schema_ready = True
+        return self.db.connection()
+
+    def subscribe(self, user_id, channel, address, region, alert_threshold):
+        """Send the user's new alerts for a region and threshold to an address (replaces their subscription)"""
+        self._connection()
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO notification_subscriptions "
+                "(user_id, channel, address, region, alert_threshold, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, channel, address.strip(), region, alert_threshold, int(time.time()))
+            )
+        self._submitted.clear()
+        self._submit_later([(region, alert_threshold)])
+
+    def unsubscribe(self, user_id, channel):
+        """Stop a user's notifications on a channel"""
+        self._connection()
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM notification_subscriptions WHERE user_id = ? AND channel = ?", (user_id, channel))
+
+    def subscription(self, user_id, channel):
+        """Return a user's subscription on a channel as (address, region, alert_threshold), or None"""
+        return self._connection().execute(
+            "SELECT address, region, alert_threshold FROM notification_subscriptions WHERE user_id = ? AND channel = ?",
+            (user_id, channel)
+        ).fetchone()
+
+    def enabled(self, channel):
+        """Whether a channel has a transport (i.e. its messages are delivered)"""
+        return channel in self.transports
+
+    def subscribed_views(self):
+        """Return the (region, alert_threshold) pairs that have a subscriber on a delivered channel"""
+        if not self.transports:
+            return []
+        return self._connection().execute(
+            f"SELECT DISTINCT region, alert_threshold FROM notification_subscriptions "
+            f"WHERE channel IN ({', '.join('?' * len(self.transports))})",
+            list(self.transports)
+        ).fetchall()
+
+    def start(self, load_alerts=None):
+        """
+        Start the event loop thread (once per process; a no-op without transports)
+
+        Parameters:
+        load_alerts: Optional load_alerts(region, alert_threshold) returning the
+            alerts of a view; every subscribed view is then submitted right away,
+            on submit_subscribed() and when a subscription is added
+
+        Returns:
+        True if this call started the dispatcher
+        """
+        with self._lock:
+            if self._loop is not None or not self.transports:
+                return False
+            self._load_alerts = load_alerts
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="notification-dispatcher",
+                                            daemon=True)
+            self._thread.start()
+        # Thread pools are shut down before atexit handlers run, so nothing
+        # can be delivered at exit. Undelivered alerts are not logged as sent
+        # and go out with the next submission after a restart.
+        atexit.register(self.stop, drain=False)
+        self._submit_later()
+        return True
+
+    def stop(self, timeout=30, drain=True):
+        """Deliver the pending digests (unless drain is False), then stop the event loop"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            if drain:
+                asyncio.run_coroutine_threadsafe(self._drain(), loop).result(timeout)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join()
+            for transport in self.transports.values():
+                transport.pool.close()
+            loop.close()
+
+    def flush(self, timeout=None):
+        """Send every pending digest now and wait for the deliveries"""
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._drain(), self._loop).result(timeout)
+
+    def submit(self, region, alert_threshold, alerts):
+        """
+        Hand over alerts (loader output schema) for delivery to the region's subscribers
+
+        Only alerts flagged is_new that were not yet sent to a subscriber, nor
+        already queued for them, are queued. A batch already submitted is
+        skipped.
+
+        Returns:
+        Number of (recipient, alert) notifications queued
+        """
+        if self._loop is None:
+            return 0
+        if 'is_new' in alerts:
+            alerts = alerts[alerts['is_new']]
+        if alerts.empty:
+            return 0
+        alert_ids = stable_alert_ids(alerts)
+        batch_key = (region, alert_threshold, hash(alert_ids.tobytes()))
+        if batch_key in self._submitted:
+            return 0
+        if len(self._submitted) > 1024:
+            self._submitted.clear()
+        self._submitted.add(batch_key)
+
+        conn = self._connection()
+        recipients = conn.execute(
+            f"SELECT DISTINCT channel, address FROM notification_subscriptions WHERE region = ? AND alert_threshold = ? "
+            f"AND channel IN ({', '.join('?' * len(self.transports))})",
+            [region, alert_threshold] + list(self.transports)
+        ).fetchall()
+        if not recipients:
+            return 0
+
+        records = alerts[['date', 'severity', 'area_hectares', 'description', 'lat', 'lon']].to_dict('records')
+        by_id = dict(zip(alert_ids.tolist(), records))
+        queued = 0
+        for channel, address in recipients:
+            sent = set()
+            ids = list(by_id)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                sent.update(row[0] for row in conn.execute(
+                    f"SELECT alert_id FROM notifications_sent WHERE channel = ? AND address = ? "
+                    f"AND alert_id IN ({', '.join('?' * len(chunk))})",
+                    [channel, address] + chunk
+                ))
+            with self._in_flight_lock:
+                in_flight = self._in_flight.setdefault((channel, address), set())
+                unsent = {alert_id: alert for alert_id, alert in by_id.items()
+                          if alert_id not in sent and alert_id not in in_flight}
+                in_flight.update(unsent)
+            if unsent:
+                self._loop.call_soon_threadsafe(self._add_pending, channel, address, region, unsent)
+                queued += len(unsent)
+        self.stats['submitted'] += queued
+        return queued
+
+    def submit_subscribed(self, views=None):
+        """
+        Load and submit the alerts of every view with subscribers (called after each data refresh)
+
+        Parameters:
+        views: (region, alert_threshold) pairs to submit instead of all subscribed ones
+
+        Returns:
+        Number of (recipient, alert) notifications queued
+        """
+        if self._loop is None or self._load_alerts is None:
+            return 0
+        queued = 0
+        for region, alert_threshold in (views if views is not None else self.subscribed_views()):
+            queued += self.submit(region, alert_threshold, self._load_alerts(region, alert_threshold))
+        return queued
+
+    def submit_feed(self, region, alerts):
+        """
+        Submit a live feed delta of a region to the subscribers of that region and of Global
+
+        Each subscribed threshold gets the alerts of the severities it shows.
+        """
+        queued = 0
+        for view_region, alert_threshold in self.subscribed_views():
+            if view_region in (region, "Global"):
+                severities = THRESHOLD_SEVERITIES[alert_threshold]
+                queued += self.submit(view_region, alert_threshold, alerts[alerts['severity'].isin(severities)])
+        return queued
+
+    def _submit_later(self, views=None):
+        """Run submit_subscribed(views) in a worker thread, off the caller's path"""
+        if self._loop is not None and self._load_alerts is not None:
+            self._loop.call_soon_threadsafe(self._spawn_submit, views)
+
+    # The methods below run on the event loop thread
+
+    def _spawn_submit(self, views):
+        task = asyncio.get_running_loop().create_task(self._submit_views(views))
+        self._submissions.add(task)
+        task.add_done_callback(self._submissions.discard)
+
+    async def _submit_views(self, views):
+        try:
+            await asyncio.to_thread(self.submit_subscribed, views)
+        except Exception as e:
+            print(f"Submitting alerts to subscribers failed: {type(e).__name__}: {e}")
+
+    def _add_pending(self, channel, address, region, alerts):
+        key = (channel, address)
+        _, pending = self._pending.setdefault(key, (region, {}))
+        pending.update(alerts)
+        if len(pending) >= MAX_DIGEST_ALERTS:
+            self._send_digest(key)
+        elif key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.batch_seconds, self._send_digest, key)
+
+    def _send_digest(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        region, alerts = self._pending.pop(key, (None, None))
+        if alerts:
+            task = asyncio.get_running_loop().create_task(self._deliver(key, region, alerts))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, key, region, alerts):
+        try:
+            await self._send(key, region, alerts)
+        finally:
+            # Logged as sent, or failed and free to be submitted again
+            with self._in_flight_lock:
+                self._in_flight.get(key, set()).difference_update(alerts)
+
+    async def _send(self, key, region, alerts):
+        channel, address = key
+        transport = self.transports[channel]
+        severity_rank = {"High": 0, "Medium": 1, "Low": 2}
+        ordered = sorted(alerts.values(), key=lambda alert: (severity_rank.get(alert['severity'], 3),
+                                                             -alert['area_hectares']))
+        subject, body = digest_message(channel, region, ordered)
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            await transport.limiter.acquire()
+            try:
+                await transport.send(address, subject, body)
+                break
+            except Exception as e:
+                permanent = isinstance(e, DeliveryError) and e.permanent
+                if permanent or attempt == MAX_ATTEMPTS:
+                    self.stats['failed'] += 1
+                    print(f"Notification to {channel} {address} failed: {type(e).__name__}: {e}")
+                    return
+                self.stats['retries'] += 1
+                # Exponential backoff with jitter, so failed deliveries do not retry in lockstep
+                await asyncio.sleep(RETRY_BASE_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        self.stats['digests'] += 1
+        self.stats['alerts'] += len(alerts)
+        await asyncio.to_thread(self._record_sent, channel, address, list(alerts))
+
+    def _record_sent(self, channel, address, alert_ids):
+        now = int(time.time())
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO notifications_sent (channel, address, alert_id, sent_at) VALUES (?, ?, ?, ?)",
+                [(channel, address, alert_id, now) for alert_id in alert_ids]
+            )
+
+    async def _drain(self):
+        for key in list(self._pending):
+            self._send_digest(key)
+        if self._deliveries:
+            await asyncio.gather(*self._deliveries, return_exceptions=True)
+
+# The dispatcher shared by every session in this process (started by the dashboard)
+notification_dispatcher = NotificationDispatcher(detection_db, configured_transports())
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a burst of test alerts to the configured email/SMS servers "
+                                                 "(e.g. the stubs of notification_stubs.py)")
+    parser.add_argument("command", choices=["test"])
+    parser.add_argument("--recipients", type=int, default=100, help="subscribers per channel")
+    parser.add_argument("--alerts", type=int, default=5000, help="new alerts in the burst")
+    parser.add_argument("--region", default="Amazon")
+    args = parser.parse_args()
+
+    import numpy as np
+    import pandas as pd
+    from data_processor import SEVERITY_DTYPE, compact_alerts
+
+    transports = configured_transports()
+    if not transports:
+        parser.error("set FOREST_GUARDIAN_SMTP_HOST and/or FOREST_GUARDIAN_SMS_GATEWAY_URL")
+    with tempfile.TemporaryDirectory() as tmp:
+        dispatcher = NotificationDispatcher(DetectionDB(f"{tmp}/notifications.sqlite3"), transports,
+                                            batch_seconds=1.0)
+        for channel in transports:
+            for i in range(args.recipients):
+                address = f"user{i}@example.org" if channel == 'email' else f"+1555{i:07d}"
+                dispatcher.subscribe(f"user{i}", channel, address, args.region, "Medium")
+
+        rng = np.random.default_rng(0)
+        alerts = compact_alerts(pd.DataFrame({
+            'date': pd.Timestamp.now().floor('s') - pd.to_timedelta(rng.integers(0, 86400, args.alerts), unit='s'),
+            'severity': pd.Categorical.from_codes(rng.integers(0, 3, args.alerts), dtype=SEVERITY_DTYPE),
+            'area_hectares': rng.uniform(10, 500, args.alerts),
+            'description': "Test alert",
+            'lat': rng.uniform(-10, 0, args.alerts),
+            'lon': rng.uniform(-65, -55, args.alerts),
+            'is_new': True,
+        }))
+
+        start = time.perf_counter()
+        dispatcher.start()
+        queued = dispatcher.submit(args.region, "Medium", alerts)
+        # Wait for every digest however long the rate limits make it take
+        dispatcher.flush()
+        dispatcher.stop()
+        elapsed = time.perf_counter() - start
+        rates = ", ".join(f"{channel} {transport.limiter.rate:g}/s" for channel, transport in transports.items())
+        print(f"Queued {queued:,} notifications; sent {dispatcher.stats['digests']:,} digests "
+              f"({dispatcher.stats['alerts']:,} alerts, {dispatcher.stats['retries']:,} retries, "
+              f"{dispatcher.stats['failed']:,} failed) in {elapsed:.1f}s at {rates}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Boot-time prewarming of the dashboard caches.
+
+Without it, the first user to open each region after a deploy or restart
+pays for generating its datasets and rendering its maps and charts. start()
+computes all of that in the background for every region of the sidebar, at
+the default year range and alert sensitivity:
+
+* the shared datasets (data_service.py) and the alert mirror
+* the interactive map with the default layers and the first time-lapse frame
+* the biodiversity, risk and trend charts
+
+It runs on PREWARM_WORKERS threads of the dashboard process (the caches are
+per process) while the server keeps accepting connections; a session asking
+for a region that is still being prepared waits for that work instead of
+starting it again.
+
+Usage:
+    python prewarm.py [--workers 2]
+"""
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import config
+import regions
+from data_processor import BASE_YEAR
+from data_service import get_alert_data, get_biodiversity_data, get_deforestation_data
+from detection_db import detection_db
+from render_cache import build_chart, build_map_html, build_time_lapse_html
+from shared_store import dataset_key
+
+# Sidebar defaults the caches are prepared for
+DEFAULT_LAYERS = {'deforestation': True, 'protected_areas': True, 'risk_zones': True}
+DEFAULT_ALERT_THRESHOLD = "Medium"
+
+_started = False
+_start_lock = threading.Lock()
+
+def default_year_range():
+    """Year range selected in the sidebar when a session starts"""
+    return (BASE_YEAR, datetime.now().year)
+
+def prewarm_region(region, year_range=None):
+    """Compute and cache a region's datasets, maps and charts at the dashboard defaults"""
+    year_range = year_range or default_year_range()
+    deforestation_data = get_deforestation_data(region, year_range)
+    biodiversity_data = get_biodiversity_data(region, year_range)
+    alert_data = get_alert_data(region, DEFAULT_ALERT_THRESHOLD)
+    detection_db.mirror_alerts(dataset_key('load_alert_data', region, DEFAULT_ALERT_THRESHOLD), region, alert_data)
+
+    build_map_html(deforestation_data, DEFAULT_LAYERS)
+    build_time_lapse_html(deforestation_data, year_range[0])
+    build_chart('biodiversity_impact', biodiversity_data)
+    build_chart('risk_distribution', biodiversity_data)
+    build_chart('deforestation_trend', deforestation_data)
+
+def prewarm(workers=config.PREWARM_WORKERS, year_range=None):
+    """Prewarm every region on a pool of worker threads; returns when all are done"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="prewarm") as pool:
+        futures = {region: pool.submit(prewarm_region, region, year_range) for region in regions.REGIONS}
+    for region, future in futures.items():
+        if future.exception() is not None:
+            print(f"Prewarming {region} failed: {type(future.exception()).__name__}: {future.exception()}",
+                  file=sys.stderr)
+    # stderr: this runs in the background of the dashboard, whose stdout is
+    # not ours to write to (the cold-start benchmark parses it)
+    print(f"Prewarmed {len(futures)} regions in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+def start(workers=config.PREWARM_WORKERS):
+    """Start prewarming in the background (once per process; 0 workers disables it)"""
+    global _started
+    with _start_lock:
+        if _started or workers <= 0:
+            return
+        _started = True
+    threading.Thread(target=prewarm, args=(workers,), name="prewarm", daemon=True).start()
+
+def main():
+    parser = argparse.ArgumentParser(description="Time prewarming the dashboard caches for every region")
+    parser.add_argument("--workers", type=int, default=max(1, config.PREWARM_WORKERS))
+    args = parser.parse_args()
+    prewarm(args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Registry of the regions shown by the dashboard.
+
+Each region has a map center and zoom level, a bounding box and a coarse
+outline polygon. Synthetic data is sampled from the bounding box; detections
+are routed to regions by their outline with classify(), which works on whole
+arrays of coordinates at once.
+
+"Global" covers every point that is not inside a regional outline.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# bbox is (min_lat, min_lon, max_lat, max_lon); polygon is a list of
+# (lat, lon) vertices, or None for a region that is its bounding box
+Region = namedtuple('Region', ['id', 'name', 'center', 'zoom', 'bbox', 'polygon'])
+
+REGIONS = {
+    "Amazon": Region(
+        1, "Amazon", center=(-5.0, -60.0), zoom=4, bbox=(-17.0, -68.0, 7.0, -52.0),
+        polygon=[(7.0, -64.0), (7.0, -55.0), (2.0, -52.0), (-12.0, -52.0),
+                 (-17.0, -58.0), (-17.0, -66.0), (-10.0, -68.0), (2.0, -68.0)]
+    ),
+    "Congo Basin": Region(
+        2, "Congo Basin", center=(0.0, 20.0), zoom=4, bbox=(-10.0, 10.0, 10.0, 30.0),
+        polygon=[(10.0, 14.0), (10.0, 26.0), (5.0, 30.0), (-6.0, 30.0),
+                 (-10.0, 25.0), (-10.0, 13.0), (-4.0, 10.0), (5.0, 10.0)]
+    ),
+    "Southeast Asia": Region(
+        3, "Southeast Asia", center=(5.0, 110.0), zoom=4, bbox=(-10.0, 95.0, 20.0, 125.0),
+        polygon=[(20.0, 97.0), (20.0, 110.0), (10.0, 125.0), (-5.0, 125.0),
+                 (-10.0, 118.0), (-10.0, 105.0), (0.0, 95.0), (12.0, 95.0)]
+    ),
+    "Central America": Region(
+        4, "Central America", center=(15.0, -85.0), zoom=4, bbox=(10.0, -95.0, 20.0, -75.0),
+        polygon=[(20.0, -95.0), (20.0, -87.0), (12.0, -75.0), (10.0, -75.0),
+                 (10.0, -84.0), (14.0, -95.0)]
+    ),
+    "Global": Region(
+        0, "Global", center=(0.0, 0.0), zoom=2, bbox=(-60.0, -180.0, 60.0, 180.0), polygon=None
+    ),
+}
+
+GLOBAL_ID = REGIONS["Global"].id
+
+# Region names indexed by region id
+REGION_NAMES = np.array([region.name for region in sorted(REGIONS.values(), key=lambda r: r.id)], dtype=object)
+
+def get_region(name):
+    """Return a region by name (Global for unknown names)"""
+    return REGIONS.get(name, REGIONS["Global"])
+
+def _in_polygon(lat, lon, polygon):
+    """Even-odd point-in-polygon test for arrays of points"""
+    inside = np.zeros(len(lat), dtype=bool)
+    vertices = polygon + polygon[:1]
+    for (lat1, lon1), (lat2, lon2) in zip(vertices, vertices[1:]):
+        if lat1 == lat2:
+            continue
+        # Edges crossed by a ray from the point towards increasing longitude
+        crosses = (lat1 > lat) != (lat2 > lat)
+        crossing_lon = lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+        inside ^= crosses & (lon < crossing_lon)
+    return inside
+
+def classify(lat, lon):
+    """
+    Return the region id of every point (GLOBAL_ID outside all regional outlines)
+
+    Parameters:
+    lat, lon: Arrays of coordinates in degrees
+
+    Returns:
+    int8 array of region ids; map them to names with REGION_NAMES[ids]
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    ids = np.full(len(lat), GLOBAL_ID, dtype=np.int8)
+    for region in REGIONS.values():
+        if region.id == GLOBAL_ID:
+            continue
+        # Cheap bounding-box test first; the outline is only tested inside the box
+        min_lat, min_lon, max_lat, max_lon = region.bbox
+        candidates = np.flatnonzero((ids == GLOBAL_ID) & (lat >= min_lat) & (lat <= max_lat)
+                                    & (lon >= min_lon) & (lon <= max_lon))
+        if region.polygon is not None:
+            candidates = candidates[_in_polygon(lat[candidates], lon[candidates], region.polygon)]
+        ids[candidates] = region.id
+    return ids
@@ -0,0 +1,39 @@
+"""
+Process-wide render caches of the dashboard's maps and charts.
+
+Maps are cached as their final HTML so a revisited tab skips both the Folium
+build and the HTML serialization; charts are cached as Plotly figures. The
+caches are shared by every session of the process, and live in their own
+module so they can be filled outside a session (see prewarm.py).
+
+map_visualization (folium) and charts (plotly) are imported on first use so
+they stay off the cold-start path.
+"""
+import streamlit as st
+
+import config
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_map_html(deforestation_data, map_layers):
+    """Build the interactive deforestation map and return its HTML"""
+    from map_visualization import create_map
+    return create_map(deforestation_data, map_layers, config.MAP_UPDATES_URL or None)._repr_html_()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_time_lapse_html(deforestation_data, year):
+    """Build the time-lapse map for a single year and return its HTML"""
+    from map_visualization import create_time_lapse_map
+    return create_time_lapse_map(deforestation_data, year, config.MAP_UPDATES_URL or None)._repr_html_()
+
+# Chart names mapped to their plotting functions in the charts module
+CHART_BUILDERS = {
+    'biodiversity_impact': 'plot_biodiversity_impact',
+    'risk_distribution': 'plot_risk_distribution',
+    'deforestation_trend': 'plot_deforestation_trend',
+}
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_chart(chart, data):
+    """Build one of the dashboard's Plotly figures by name"""
+    import charts
+    return getattr(charts, CHART_BUILDERS[chart])(data)
@@ -0,0 +1,515 @@
+"""
+Background scheduler for the weekly region reports.
+
+Schedules and report jobs are kept in the detection database (see
+detection_db.py), so they survive restarts and are shared by every dashboard
+process using the same database:
+
+* ``report_schedules`` holds one row per (region, alert threshold) with the
+  time of its next run
+* ``report_jobs`` is the job queue; a job is claimed by switching it from
+  ``queued`` to ``running`` in a single UPDATE, so two schedulers never build
+  the same report
+
+A dispatcher thread turns due schedules into jobs and hands claimed jobs to a
+pool of worker processes, which build the report (trend chart, hotspot map and
+alert summary) and write it to an HTML file in REPORTS_DIR. Dashboard sessions
+only read the finished report's row, so building a report never holds them up.
+Failed jobs are retried with a growing delay. A process renews the lease
+(claimed_at) of the jobs it is building every POLL_SECONDS, so only jobs left
+``running`` by a process that died are re-queued after JOB_TIMEOUT_SECONDS.
+
+Usage:
+    python report_scheduler.py schedule REGION [--threshold Medium]
+    python report_scheduler.py run [--workers N] [--once]
+"""
+import argparse
+import atexit
+import html
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import config
+from detection_db import DetectionDB, detection_db
+
+# Reports are built every week
+REPORT_INTERVAL_SECONDS = 7 * 24 * 60 * 60
+
+# Failed jobs are retried this many times in all, RETRY_DELAY_SECONDS times
+# the attempt number apart
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 60
+
+# A job whose lease has not been renewed for this long is assumed lost and
+# queued again
+JOB_TIMEOUT_SECONDS = 15 * 60
+
+# Seconds between checks for due schedules and queued jobs
+POLL_SECONDS = 30
+
+# Finished reports kept per region and threshold (older files are deleted)
+REPORTS_KEPT = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_schedules (
+    region TEXT NOT NULL,
+    alert_threshold TEXT NOT NULL,
+    interval_seconds INTEGER NOT NULL,
+    next_run_at INTEGER NOT NULL,
+    created_by TEXT,
+    created_at INTEGER NOT NULL,
+    PRIMARY KEY (region, alert_threshold)
+);
+CREATE TABLE IF NOT EXISTS report_jobs (
+    id INTEGER PRIMARY KEY,
+    region TEXT NOT NULL,
+    alert_threshold TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    due_at INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_at INTEGER,
+    finished_at INTEGER,
+    path TEXT,
+    summary TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_report_jobs_status_due ON report_jobs (status, due_at);
+CREATE INDEX IF NOT EXISTS idx_report_jobs_region ON report_jobs (region, alert_threshold, status, finished_at);
+"""
+
+REPORT_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+    body {{ font-family: sans-serif; margin: 2rem auto; max-width: 1000px; color: #1f2d1f; }}
+    h1 {{ color: #2e7d32; }}
+    .metrics {{ display: flex; gap: 1rem; margin: 1rem 0 2rem; }}
+    .metric {{ flex: 1; padding: 1rem; border-radius: 8px; background: #f1f8e9; }}
+    .metric .value {{ font-size: 1.6rem; font-weight: bold; }}
+    table {{ border-collapse: collapse; width: 100%; }}
+    th, td {{ padding: 0.4rem 0.6rem; border-bottom: 1px solid #ddd; text-align: left; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p>Generated {generated}. Alerts cover {period}.</p>
+<div class="metrics">
+    <div class="metric"><div>Total forest loss</div><div class="value">{total_loss:,.0f} ha</div></div>
+    <div class="metric"><div>Alerts this week</div><div class="value">{alerts}</div></div>
+    <div class="metric"><div>High severity</div><div class="value">{high}</div></div>
+    <div class="metric"><div>Area under alert</div><div class="value">{alert_area:,.0f} ha</div></div>
+</div>
+<h2>Deforestation trend</h2>
+{trend_chart}
+<h2>Hotspot map</h2>
+{hotspot_map}
+<h2>Alert summary</h2>
+{severity_table}
+<h3>Largest alerts</h3>
+{top_alerts}
+</body>
+</html>
+"""
+
+def report_file_name(region, alert_threshold, generated_at):
+    """File name of a report (e.g. amazon_medium_20240101_0600.html)"""
+    slug = region.lower().replace(' ', '_')
+    return f"{slug}_{alert_threshold.lower()}_{generated_at:%Y%m%d_%H%M}.html"
+
+def build_report(region, alert_threshold, reports_dir):
+    """
+    Build the weekly report of a region and write it to an HTML file
+
+    Runs in a worker process, so it loads the data itself rather than going
+    through the dashboard's shared data service.
+
+    Returns:
+    (path of the report, summary dictionary)
+    """
+    from data_processor import BASE_YEAR, load_alert_data, load_deforestation_data
+    from charts import plot_deforestation_trend
+    from map_visualization import create_map
+
+    generated_at = datetime.now()
+    period_start = generated_at - timedelta(days=7)
+    deforestation_data = load_deforestation_data(region, (BASE_YEAR, generated_at.year))
+    alerts = load_alert_data(region, alert_threshold)
+    alerts = alerts[alerts['date'] >= period_start]
+
+    severity_counts = alerts['severity'].value_counts().reindex(["High", "Medium", "Low"], fill_value=0)
+    severity_table = alerts.groupby('severity', observed=False).agg(
+        alerts=('area_hectares', 'size'), area_hectares=('area_hectares', 'sum')
+    ).iloc[::-1]
+    top_alerts = alerts.nlargest(10, 'area_hectares')[['date', 'severity', 'area_hectares', 'description', 'lat', 'lon']]
+    summary = {
+        'total_loss_hectares': float(deforestation_data['total_loss_hectares']),
+        'alerts': int(len(alerts)),
+        'high': int(severity_counts["High"]),
+        'alert_area_hectares': float(alerts['area_hectares'].sum()),
+    }
+
+    layers = {'deforestation': True, 'protected_areas': True, 'risk_zones': True}
+    page = REPORT_TEMPLATE.format(
+        title=html.escape(f"Weekly Forest Report: {region} ({alert_threshold} sensitivity)"),
+        generated=f"{generated_at:%Y-%m-%d %H:%M}",
+        period=f"{period_start:%Y-%m-%d} to {generated_at:%Y-%m-%d}",
+        total_loss=summary['total_loss_hectares'],
+        alerts=summary['alerts'],
+        high=summary['high'],
+        alert_area=summary['alert_area_hectares'],
+        trend_chart=plot_deforestation_trend(deforestation_data).to_html(full_html=False, include_plotlyjs='cdn'),
+        hotspot_map=create_map(deforestation_data, layers)._repr_html_(),
+        severity_table=severity_table.to_html(float_format="{:,.1f}".format),
+        top_alerts=top_alerts.to_html(index=False, float_format="{:,.2f}".format) if len(top_alerts) else
+        "<p>No alerts this week.</p>",
+    )
+
+    os.makedirs(reports_dir, exist_ok=True)
+    path = os.path.join(reports_dir, report_file_name(region, alert_threshold, generated_at))
+    # Written under a temporary name so readers never see a partial report
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        f.write(page)
+    os.replace(f"{path}.tmp", path)
+    return path, summary
+
+class ReportScheduler:
+    """
+    Persistent schedule and job queue for weekly region reports
+
+    Parameters:
+    db: DetectionDB holding the schedule and job tables
+    reports_dir: Directory the reports are written to
+    workers: Number of worker processes building reports
+    """
+
+    def __init__(self, db, reports_dir, workers=2):
+        self.db = db
+        self.reports_dir = reports_dir
+        self.workers = workers
+        self._schema_ready = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pool = None
+        self._running = set()  # ids of the jobs being built by this process
+        self._running_lock = threading.Lock()
+
+    def _connection(self):
+        """Return this thread's connection, creating the report tables on first use"""
+        if not self._schema_ready:
+            with self.db.transaction() as conn:
+                conn.executescript(SCHEMA)
+            self._schema_ready = True
+        return self.db.connection()
+
+    def schedule(self, region, alert_threshold, user_id=None):
+        """
+        Schedule the weekly report of a region (a no-op if it is already scheduled)
+
+        The first report is queued right away.
+
+        Returns:
+        True if the schedule was created
+        """
+        self._connection()
+        now = int(time.time())
+        with self.db.transaction() as conn:
+            created = conn.execute(
+                "INSERT OR IGNORE INTO report_schedules "
+                "(region, alert_threshold, interval_seconds, next_run_at, created_by, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (region, alert_threshold, REPORT_INTERVAL_SECONDS, now + REPORT_INTERVAL_SECONDS, user_id, now)
+            ).rowcount > 0
+            if created:
+                self._enqueue(conn, region, alert_threshold, now)
+        self._wake.set()
+        return created
+
+    def unschedule(self, region, alert_threshold):
+        """Stop the weekly report of a region (queued jobs are dropped; finished reports are kept)"""
+        self._connection()
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM report_schedules WHERE region = ? AND alert_threshold = ?",
+                         (region, alert_threshold))
+            conn.execute("DELETE FROM report_jobs WHERE region = ? AND alert_threshold = ? AND status = 'queued'",
+                         (region, alert_threshold))
+
+    def get_schedule(self, region, alert_threshold):
+        """Return the schedule of a region as a dictionary, or None"""
+        cursor = self._connection().execute(
+            "SELECT region, alert_threshold, interval_seconds, next_run_at, created_by, created_at "
+            "FROM report_schedules WHERE region = ? AND alert_threshold = ?",
+            (region, alert_threshold)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        schedule = dict(zip([column[0] for column in cursor.description], row))
+        schedule['next_run_at'] = datetime.fromtimestamp(schedule['next_run_at'])
+        return schedule
+
+    def pending_job(self, region, alert_threshold):
+        """Return the status of the region's queued or running job ('queued'/'running'), or None"""
+        row = self._connection().execute(
+            "SELECT status FROM report_jobs WHERE region = ? AND alert_threshold = ? "
+            "AND status IN ('queued', 'running') LIMIT 1",
+            (region, alert_threshold)
+        ).fetchone()
+        return row[0] if row else None
+
+    def latest_report(self, region, alert_threshold):
+        """
+        Return the most recent finished report of a region, or None
+
+        Returns:
+        Dictionary with the report's path, generation time and summary
+        """
+        row = self._connection().execute(
+            "SELECT path, finished_at, summary FROM report_jobs "
+            "WHERE region = ? AND alert_threshold = ? AND status = 'done' "
+            "ORDER BY finished_at DESC LIMIT 1",
+            (region, alert_threshold)
+        ).fetchone()
+        if row is None or not os.path.exists(row[0]):
+            return None
+        return {'path': row[0], 'generated_at': datetime.fromtimestamp(row[1]), 'summary': json.loads(row[2])}
+
+    @staticmethod
+    def _enqueue(conn, region, alert_threshold, due_at):
+        """Queue a report job unless one is already queued or running"""
+        conn.execute(
+            "INSERT INTO report_jobs (region, alert_threshold, due_at) "
+            "SELECT ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM report_jobs WHERE region = ? "
+            "AND alert_threshold = ? AND status IN ('queued', 'running'))",
+            (region, alert_threshold, due_at, region, alert_threshold)
+        )
+
+    def enqueue_due(self):
+        """Queue the jobs of every due schedule and re-queue lost jobs; return the number of schedules run"""
+        self._connection()
+        now = int(time.time())
+        with self.db.transaction() as conn:
+            due = conn.execute(
+                "SELECT region, alert_threshold, interval_seconds FROM report_schedules WHERE next_run_at <= ?",
+                (now,)
+            ).fetchall()
+            for region, alert_threshold, interval_seconds in due:
+                self._enqueue(conn, region, alert_threshold, now)
+                conn.execute(
+                    "UPDATE report_schedules SET next_run_at = ? WHERE region = ? AND alert_threshold = ?",
+                    (now + interval_seconds, region, alert_threshold)
+                )
+            # Jobs of a process that died while building them
+            conn.execute(
+                "UPDATE report_jobs SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END, "
+                "error = COALESCE(error, 'timed out') WHERE status = 'running' AND claimed_at < ?",
+                (MAX_ATTEMPTS, now - JOB_TIMEOUT_SECONDS)
+            )
+        return len(due)
+
+    def claim(self):
+        """Claim the oldest due job; return (job id, region, alert threshold) or None"""
+        self._connection()
+        now = int(time.time())
+        with self.db.transaction() as conn:
+            return conn.execute(
+                "UPDATE report_jobs SET status = 'running', claimed_at = ?, attempts = attempts + 1 "
+                "WHERE id = (SELECT id FROM report_jobs WHERE status = 'queued' AND due_at <= ? "
+                "ORDER BY due_at LIMIT 1) RETURNING id, region, alert_threshold",
+                (now, now)
+            ).fetchone()
+
+    def renew_leases(self):
+        """Move the lease of every job this process is building forward, so it is not taken as lost"""
+        with self._running_lock:
+            job_ids = list(self._running)
+        if not job_ids:
+            return
+        self._connection()
+        with self.db.transaction() as conn:
+            conn.execute(
+                f"UPDATE report_jobs SET claimed_at = ? WHERE status = 'running' "
+                f"AND id IN ({', '.join('?' * len(job_ids))})",
+                [int(time.time())] + job_ids
+            )
+
+    def finish(self, job_id, path=None, summary=None, error=None):
+        """Record the outcome of a job; failed jobs are retried until MAX_ATTEMPTS"""
+        self._connection()
+        now = int(time.time())
+        with self.db.transaction() as conn:
+            if error is None:
+                conn.execute(
+                    "UPDATE report_jobs SET status = 'done', finished_at = ?, path = ?, summary = ?, error = NULL "
+                    "WHERE id = ?",
+                    (now, path, json.dumps(summary), job_id)
+                )
+                expired = self._expire_reports(conn, job_id)
+            else:
+                conn.execute(
+                    "UPDATE report_jobs SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END, "
+                    "due_at = ? + ? * attempts, finished_at = ?, error = ? WHERE id = ?",
+                    (MAX_ATTEMPTS, now, RETRY_DELAY_SECONDS, now, error, job_id)
+                )
+                expired = []
+        for old_path in expired:
+            if os.path.exists(old_path):
+                os.remove(old_path)
+
+    @staticmethod
+    def _expire_reports(conn, job_id):
+        """Drop the finished reports of a job's region beyond REPORTS_KEPT; return their paths"""
+        expired = conn.execute(
+            "SELECT j.id, j.path FROM report_jobs j JOIN report_jobs r "
+            "ON j.region = r.region AND j.alert_threshold = r.alert_threshold "
+            "WHERE r.id = ? AND j.status = 'done' ORDER BY j.finished_at DESC, j.id DESC LIMIT -1 OFFSET ?",
+            (job_id, REPORTS_KEPT)
+        ).fetchall()
+        conn.executemany("DELETE FROM report_jobs WHERE id = ?", [(old_id,) for old_id, _ in expired])
+        return [path for _, path in expired]
+
+    def run_pending(self):
+        """Queue due schedules and build every due job in this process; return the number of jobs run"""
+        self.enqueue_due()
+        jobs = 0
+        # Renew the lease of the job being built while this thread builds it
+        done = threading.Event()
+        keeper = threading.Thread(target=self._keep_leases, args=(done,), name="report-leases", daemon=True)
+        keeper.start()
+        try:
+            while (job := self.claim()) is not None:
+                job_id, region, alert_threshold = job
+                with self._running_lock:
+                    self._running.add(job_id)
+                try:
+                    path, summary = build_report(region, alert_threshold, self.reports_dir)
+                except Exception as e:
+                    self.finish(job_id, error=f"{type(e).__name__}: {e}")
+                else:
+                    self.finish(job_id, path, summary)
+                finally:
+                    with self._running_lock:
+                        self._running.discard(job_id)
+                jobs += 1
+        finally:
+            done.set()
+            keeper.join()
+        return jobs
+
+    def _keep_leases(self, done):
+        """Renew the leases of the running jobs every POLL_SECONDS until done is set"""
+        while not done.wait(POLL_SECONDS):
+            try:
+                self.renew_leases()
+            except Exception as e:
+                print(f"Report scheduler: {type(e).__name__}: {e}")
+
+    def start(self):
+        """Start the dispatcher thread and worker pool (once per process)"""
+        with self._lock:
+            if self._thread is not None or self.workers <= 0:
+                return
+            # Worker processes are spawned rather than forked: the dashboard
+            # process runs many threads, which must not be duplicated
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+            self._thread = threading.Thread(target=self._dispatch, name="report-scheduler", daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop dispatching jobs; running ones are re-queued by the next scheduler after JOB_TIMEOUT_SECONDS"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping.set()
+        self._wake.set()
+        thread.join()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._stopping.clear()
+
+    def _dispatch(self):
+        """Dispatcher loop: queue due schedules and keep the worker pool busy"""
+        while not self._stopping.is_set():
+            try:
+                self.renew_leases()
+                self.enqueue_due()
+                while self._running_count() < self.workers and (job := self.claim()) is not None:
+                    job_id, region, alert_threshold = job
+                    with self._running_lock:
+                        # A job still building here whose lease lapsed (e.g. the
+                        # database was busy) was claimed again: keep the first run
+                        if job_id in self._running:
+                            continue
+                        self._running.add(job_id)
+                    future = self._pool.submit(build_report, region, alert_threshold, self.reports_dir)
+                    future.add_done_callback(lambda future, job_id=job_id: self._job_done(job_id, future))
+            except Exception as e:
+                # The database may be busy or briefly unavailable; try again on the next poll
+                print(f"Report scheduler: {type(e).__name__}: {e}")
+            self._wake.wait(POLL_SECONDS)
+            self._wake.clear()
+
+    def _running_count(self):
+        with self._running_lock:
+            return len(self._running)
+
+    def _job_done(self, job_id, future):
+        """Record a finished job and let the dispatcher claim the next one"""
+        try:
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is None:
+                self.finish(job_id, *future.result())
+            else:
+                self.finish(job_id, error=f"{type(error).__name__}: {error}")
+        finally:
+            with self._running_lock:
+                self._running.discard(job_id)
+            self._wake.set()
+
+# The scheduler shared by every session in this process (started by the dashboard)
+report_scheduler = ReportScheduler(detection_db, config.REPORTS_DIR, workers=config.REPORT_WORKERS)
+
+def main():
+    parser = argparse.ArgumentParser(description="Schedule and build the weekly region reports")
+    parser.add_argument("--db", default=config.DATABASE_PATH, help="database file")
+    parser.add_argument("--reports-dir", default=config.REPORTS_DIR, help="directory of the reports")
+    commands = parser.add_subparsers(dest="command", required=True)
+    schedule = commands.add_parser("schedule", help="schedule the weekly report of a region")
+    schedule.add_argument("region")
+    schedule.add_argument("--threshold", choices=["Low", "Medium", "High"], default="Medium")
+    run = commands.add_parser("run", help="build scheduled reports")
+    run.add_argument("--workers", type=int, default=max(config.REPORT_WORKERS, 1))
+    run.add_argument("--once", action="store_true", help="build the due reports in this process and exit")
+    args = parser.parse_args()
+
+    scheduler = ReportScheduler(DetectionDB(args.db), args.reports_dir, workers=getattr(args, 'workers', 0))
+    if args.command == "schedule":
+        created = scheduler.schedule(args.region, args.threshold)
+        print(f"{'Scheduled' if created else 'Already scheduled'}: weekly {args.region} report ({args.threshold})")
+    elif args.once:
+        start = time.perf_counter()
+        jobs = scheduler.run_pending()
+        print(f"Built {jobs} reports in {time.perf_counter() - start:.1f}s")
+    else:
+        scheduler.start()
+        print(f"Building reports into {args.reports_dir} with {args.workers} workers (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            scheduler.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Shared-memory snapshots of the dashboard datasets for multi-process serving.
+
+When several Streamlit servers run behind a load balancer, each would
+otherwise regenerate and hold its own copy of every dataset. Instead, a
+publisher writes the columnar arrays behind ``raw_data``, the hotspots and the
+alerts into named shared-memory segments (one segment per table) and every
+worker process attaches to them zero-copy.
+
+Snapshots are versioned. A publish writes all segments plus a manifest for
+the new version and then atomically replaces the ``CURRENT`` pointer file in
+the store directory, so readers see either the old or the new snapshot and
+never a half-written one. Older versions are unlinked once they fall out of
+the retention window; processes that still map them keep their memory until
+they detach.
+
+Usage:
+    python shared_store.py publish [--store-dir DIR] [--years START END]
+"""
+import argparse
+import json
+import os
+import pickle
+import threading
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+import config
+import regions
+
+# Snapshot versions kept in shared memory (the current one plus older ones
+# that readers may still be attached to)
+KEEP_VERSIONS = 2
+
+# Byte alignment of each column inside a table segment
+_ALIGN = 64
+
+def _untrack(segment):
+    """Stop Python's resource tracker from unlinking a segment when this process exits"""
+    # Segments outlive the process that created or attached them; their
+    # lifetime is managed by publish_snapshot() instead
+    try:
+        resource_tracker.unregister(segment._name, "shared_memory")
+    except Exception:
+        pass
+
+def _encode_column(series):
+    """Return (array, column metadata) for a DataFrame column"""
+    if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+        categorical = series.astype("category")
+        codes = categorical.cat.codes.to_numpy()
+        return codes, {'kind': 'categorical', 'categories': list(categorical.cat.categories),
+                       'ordered': bool(categorical.cat.ordered)}
+    array = series.to_numpy()
+    return array, {'kind': 'array'}
+
+def _write_table(df, segment_name):
+    """Copy a DataFrame's columns into one shared-memory segment and return its layout"""
+    columns = []
+    arrays = []
+    offset = 0
+    for name in df.columns:
+        array, meta = _encode_column(df[name])
+        array = np.ascontiguousarray(array)
+        offset = -(-offset // _ALIGN) * _ALIGN
+        meta.update({'name': name, 'dtype': array.dtype.str, 'offset': offset, 'length': len(array)})
+        columns.append(meta)
+        arrays.append(array)
+        offset += array.nbytes
+
+    segment = shared_memory.SharedMemory(name=segment_name, create=True, size=max(offset, 1))
+    _untrack(segment)
+    for meta, array in zip(columns, arrays):
+        target = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf, offset=meta['offset'])
+        target[:] = array
+    segment.close()
+    return {'segment': segment_name, 'rows': len(df), 'columns': columns, 'attrs': dict(df.attrs)}
+
+def _attach_table(layout, segments):
+    """Build a DataFrame whose columns are views into a shared-memory segment"""
+    segment = shared_memory.SharedMemory(name=layout['segment'])
+    _untrack(segment)
+    # Keep the mapping alive for as long as the snapshot is in use
+    segments.append(segment)
+
+    data = {}
+    for meta in layout['columns']:
+        array = np.ndarray((meta['length'],), dtype=np.dtype(meta['dtype']),
+                           buffer=segment.buf, offset=meta['offset'])
+        array.flags.writeable = False
+        if meta['kind'] == 'categorical':
+            data[meta['name']] = pd.Categorical.from_codes(array, meta['categories'], ordered=meta.get('ordered', False))
+        else:
+            data[meta['name']] = array
+    frame = pd.DataFrame(data, copy=False)
+    frame.attrs.update(layout.get('attrs', {}))
+    return frame
+
+def _split_dataset(dataset):
+    """Split a loader result into columnar tables and the remaining small metadata"""
+    if isinstance(dataset, pd.DataFrame):
+        return {'__frame__': dataset}, None
+    tables, meta = {}, {}
+    for key, value in dataset.items():
+        if isinstance(value, pd.DataFrame):
+            tables[key] = value
+        elif key == 'hotspots':
+            tables[key] = pd.DataFrame(list(value))
+        else:
+            meta[key] = value
+    return tables, meta
+
+def _join_dataset(tables, meta):
+    """Inverse of _split_dataset()"""
+    if meta is None:
+        return tables['__frame__']
+    dataset = dict(meta)
+    for key, frame in tables.items():
+        if key == 'hotspots':
+            dataset[key] = [
+                {**row, 'first_detected': row['first_detected'].to_pydatetime()}
+                for row in frame.to_dict('records')
+            ]
+        else:
+            dataset[key] = frame
+    return dataset
+
+def dataset_key(loader_name, *args):
+    """Return the manifest key of a dataset (same arguments as DataService.get)"""
+    parts = [loader_name]
+    for arg in args:
+        parts.extend(str(a) for a in (arg if isinstance(arg, tuple) else (arg,)))
+    return "|".join(parts)
+
+def _current_version(store_dir):
+    try:
+        with open(os.path.join(store_dir, "CURRENT"), encoding="utf-8") as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+def publish_snapshot(datasets, store_dir):
+    """
+    Publish a new snapshot version of the given datasets
+
+    Parameters:
+    datasets: Dictionary mapping dataset_key() strings to loader results
+    store_dir: Directory holding the manifests and the CURRENT pointer
+
+    Returns:
+    The new snapshot version number
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    version = (_current_version(store_dir) or 0) + 1
+    prefix = f"fg_{os.getpid()}_{version}"
+
+    manifest = {'version': version, 'created_at': datetime.now().isoformat(), 'datasets': {}}
+    metadata = {}
+    for n, (key, dataset) in enumerate(datasets.items()):
+        tables, meta = _split_dataset(dataset)
+        manifest['datasets'][key] = {
+            name: _write_table(frame, f"{prefix}_{n}_{t}") for t, (name, frame) in enumerate(tables.items())
+        }
+        metadata[key] = meta
+
+    manifest_path = os.path.join(store_dir, f"snapshot-{version}.json")
+    with open(os.path.join(store_dir, f"snapshot-{version}.meta"), "wb") as f:
+        pickle.dump(metadata, f)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    # Swap the pointer atomically; readers pick the new version up on next access
+    pointer_tmp = os.path.join(store_dir, f"CURRENT.{os.getpid()}.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(str(version))
+    os.replace(pointer_tmp, os.path.join(store_dir, "CURRENT"))
+
+    _retire_versions(store_dir, version - KEEP_VERSIONS)
+    return version
+
+def _retire_versions(store_dir, up_to_version):
+    """Unlink the segments and manifests of snapshot versions <= up_to_version"""
+    for filename in os.listdir(store_dir):
+        if not (filename.startswith("snapshot-") and filename.endswith(".json")):
+            continue
+        version = int(filename[len("snapshot-"):-len(".json")])
+        if version > up_to_version:
+            continue
+        manifest_path = os.path.join(store_dir, filename)
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        for tables in manifest['datasets'].values():
+            for layout in tables.values():
+                try:
+                    # unlink() also drops the resource tracker registration
+                    # made by attaching here
+                    segment = shared_memory.SharedMemory(name=layout['segment'])
+                    segment.close()
+                    segment.unlink()
+                except FileNotFoundError:
+                    pass
+        os.remove(manifest_path)
+        meta_path = os.path.join(store_dir, f"snapshot-{version}.meta")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+class SharedSnapshotReader:
+    """
+    Attach to the current shared-memory snapshot of a store directory
+
+    Datasets are attached lazily on first use and re-attached when the
+    publisher swaps in a new version. An optional wrap function (e.g. one
+    that makes the dataset read-only) is applied once per attached dataset.
+    """
+
+    def __init__(self, store_dir, wrap=None):
+        self.store_dir = store_dir
+        self.wrap = wrap or (lambda dataset: dataset)
+        self.version = None
+        self._manifest = None
+        self._metadata = None
+        self._datasets = {}
+        self._segments = []
+        self._retired = []
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the dataset stored under key, or None if it was not published"""
+        with self._lock:
+            self._refresh()
+            if self._manifest is None or key not in self._manifest['datasets']:
+                return None
+            if key not in self._datasets:
+                tables = {
+                    name: _attach_table(layout, self._segments)
+                    for name, layout in self._manifest['datasets'][key].items()
+                }
+                self._datasets[key] = self.wrap(_join_dataset(tables, self._metadata[key]))
+            return self._datasets[key]
+
+    def _refresh(self):
+        version = _current_version(self.store_dir)
+        if version is None or version == self.version:
+            return
+        try:
+            with open(os.path.join(self.store_dir, f"snapshot-{version}.json"), encoding="utf-8") as f:
+                manifest = json.load(f)
+            with open(os.path.join(self.store_dir, f"snapshot-{version}.meta"), "rb") as f:
+                metadata = pickle.load(f)
+        except FileNotFoundError:
+            # Retired between reading the pointer and the manifest; keep the old one
+            return
+        # Views handed out earlier may still point into the old segments, so
+        # they are only closed once nothing references their buffers anymore
+        self._retired.extend(self._segments)
+        self._segments = []
+        self.version, self._manifest, self._metadata = version, manifest, metadata
+        self._datasets = {}
+        still_used = []
+        for segment in self._retired:
+            try:
+                segment.close()
+            except BufferError:
+                still_used.append(segment)
+        self._retired = still_used
+
+def publish_default_datasets(store_dir, year_range):
+    """Generate and publish every region's datasets at the given year range"""
+    from data_processor import load_deforestation_data, load_biodiversity_data, load_alert_data
+
+    datasets = {}
+    for region in regions.REGIONS:
+        datasets[dataset_key("load_deforestation_data", region, year_range)] = load_deforestation_data(region, year_range)
+        datasets[dataset_key("load_biodiversity_data", region, year_range)] = load_biodiversity_data(region, year_range)
+        for threshold in ["Low", "Medium", "High"]:
+            datasets[dataset_key("load_alert_data", region, threshold)] = load_alert_data(region, threshold)
+    return publish_snapshot(datasets, store_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish dashboard datasets to shared memory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    publish = subparsers.add_parser("publish", help="publish a new snapshot version")
+    publish.add_argument("--store-dir", default=config.SHARED_STORE_DIR or None, required=not config.SHARED_STORE_DIR)
+    publish.add_argument("--years", type=int, nargs=2, default=[2015, datetime.now().year], metavar=("START", "END"))
+    args = parser.parse_args()
+
+    version = publish_default_datasets(args.store_dir, tuple(args.years))
+    print(f"Published snapshot version {version} to {args.store_dir}")
+
+if __name__ == "__main__":
+    main()
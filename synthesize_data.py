@@ -0,0 +1,185 @@
+"""
+Synthesize large, deterministic datasets for benchmarks and load tests.
+
+Writes the ``monthly``, ``hotspots`` and ``alerts`` datasets of the columnar
+store (see columnar_store.py) using the same regional parameters as the
+loaders in data_processor (base loss rates, region extents, dry seasons
+and alert descriptions), at any size.
+
+Work is split into independent (dataset, region, year, chunk) tasks that run
+in parallel worker processes. Every task draws from its own random stream,
+seeded from the global seed and the task's coordinates, so the output is
+identical for a given seed regardless of the number of workers. Re-running
+overwrites the same part files.
+
+Usage:
+    python synthesize_data.py --out DIR [--monthly-cells 10000000]
+        [--hotspots 1000000] [--alerts 1000000] [--seed 42] [--workers N]
+        [--end YYYY-MM-DD]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import columnar_store
+from data_processor import BASE_LOSS_RATES, BASE_YEAR, ALERT_DESCRIPTIONS, SEVERITY_DTYPE, seasonal_factor
+from regions import get_region
+
+# Stable ids used to derive per-task random streams
+DATASET_IDS = {'monthly': 1, 'hotspots': 2, 'alerts': 3, 'cells': 4}
+
+def task_rng(seed, dataset, region, year, chunk):
+    """Return the random generator of one task"""
+    region_id = list(BASE_LOSS_RATES).index(region)
+    return np.random.default_rng([seed, DATASET_IDS[dataset], region_id, year, chunk])
+
+def split_count(total, weights):
+    """Split total into integer parts proportional to weights (parts sum to total)"""
+    weights = np.asarray(weights, dtype=float)
+    parts = np.floor(total * weights / weights.sum()).astype(int)
+    parts[: total - parts.sum()] += 1
+    return parts.tolist()
+
+def chunk_sizes(count, chunk_rows):
+    """Split a row count into chunks of at most chunk_rows"""
+    return [min(chunk_rows, count - start) for start in range(0, count, chunk_rows)]
+
+def random_points(rng, region, size):
+    """Uniform random (lat, lon) points in a region's box, as float32"""
+    min_lat, min_lon, max_lat, max_lon = get_region(region).bbox
+    lat = rng.uniform(min_lat, max_lat, size)
+    lon = rng.uniform(min_lon, max_lon, size)
+    return lat.astype(np.float32), lon.astype(np.float32)
+
+def synthesize_monthly(out, seed, region, year, cells):
+    """Write one region-year of monthly deforestation cells"""
+    rng = task_rng(seed, 'monthly', region, year, 0)
+
+    # Cell positions and their share of the region's loss are fixed across years
+    cell_rng = task_rng(seed, 'cells', region, 0, 0)
+    lat, lon = random_points(cell_rng, region, cells)
+    weights = cell_rng.gamma(2.0, size=cells)
+    weights /= weights.sum()
+
+    # Same trend and variation as load_deforestation_data
+    yearly_loss = BASE_LOSS_RATES[region] * (1 + (year - BASE_YEAR) * 0.05) * rng.uniform(0.9, 1.1)
+    months = np.arange(1, 13)
+    monthly_loss = yearly_loss / 12 * np.array([seasonal_factor(region, m) for m in months]) * rng.uniform(0.8, 1.2, 12)
+
+    df = pd.DataFrame({
+        'month': np.repeat(months, cells).astype(np.int8),
+        'cell_id': np.tile(np.arange(cells, dtype=np.int32), 12),
+        'lat': np.tile(lat, 12),
+        'lon': np.tile(lon, 12),
+        'deforestation_hectares': (np.repeat(monthly_loss, cells) * np.tile(weights, 12)).astype(np.float32),
+    })
+    columnar_store.write_partition(out, 'monthly', region, year, df, part=0)
+    return len(df)
+
+def synthesize_hotspots(out, seed, region, year, chunk, size):
+    """Write one chunk of hotspots first detected in a given year"""
+    rng = task_rng(seed, 'hotspots', region, year, chunk)
+    lat, lon = random_points(rng, region, size)
+    severity = rng.choice(np.array([1, 2, 3], dtype=np.int8), size, p=[0.3, 0.4, 0.3])
+    day_of_year = rng.integers(0, 365, size)
+
+    df = pd.DataFrame({
+        'lat': lat,
+        'lon': lon,
+        'severity': severity,
+        'area_hectares': (rng.uniform(50, 2000, size) * severity).astype(np.float32),
+        'first_detected': pd.Timestamp(year, 1, 1) + pd.to_timedelta(day_of_year, unit='D'),
+        'risk_score': rng.integers(1, 101, size, dtype=np.int16),
+    })
+    columnar_store.write_partition(out, 'hotspots', region, year, df, part=chunk)
+    return size
+
+def synthesize_alerts(out, seed, region, chunk, size, end, days):
+    """Write one chunk of alerts dated within the given number of days before end"""
+    rng = task_rng(seed, 'alerts', region, 0, chunk)
+    lat, lon = random_points(rng, region, size)
+    severity_options = np.array(SEVERITY_DTYPE.categories)
+    severity_index = rng.choice(3, size, p=[0.3, 0.4, 0.3])
+    area_multiplier = np.array([1, 3, 10])[severity_index]
+    description_index = rng.integers(0, 3, size)
+    descriptions = np.array([ALERT_DESCRIPTIONS[s] for s in severity_options])
+
+    df = pd.DataFrame({
+        'date': pd.Timestamp(end) - pd.to_timedelta(rng.uniform(0, days, size), unit='D'),
+        'severity': pd.Categorical.from_codes(severity_index, dtype=SEVERITY_DTYPE),
+        'area_hectares': (rng.uniform(10, 100, size) * area_multiplier).astype(np.float32),
+        'description': pd.Categorical(descriptions[severity_index, description_index]),
+        'lat': lat,
+        'lon': lon,
+    })
+    for year, year_df in df.groupby(df['date'].dt.year):
+        columnar_store.write_partition(out, 'alerts', region, year, year_df, part=chunk)
+    return size
+
+def plan_tasks(args):
+    """Build the list of (function, arguments) tasks for the requested sizes"""
+    regions = args.regions
+    years = list(range(args.years[0], args.years[1] + 1))
+    weights = [BASE_LOSS_RATES[r] for r in regions]
+    end = datetime.strptime(args.end, "%Y-%m-%d")
+    tasks = []
+
+    # Monthly cells: 12 months per region-year, grid cells shared by the months
+    region_cells = split_count(args.monthly_cells, weights)
+    for region, cells in zip(regions, region_cells):
+        per_month = max(1, cells // (12 * len(years)))
+        for year in years:
+            tasks.append((synthesize_monthly, (args.out, args.seed, region, year, per_month)))
+
+    # Hotspots: spread evenly over the years of each region
+    for region, count in zip(regions, split_count(args.hotspots, weights)):
+        for year, year_count in zip(years, split_count(count, [1] * len(years))):
+            for chunk, size in enumerate(chunk_sizes(year_count, args.chunk_rows)):
+                tasks.append((synthesize_hotspots, (args.out, args.seed, region, year, chunk, size)))
+
+    # Alerts: dated within the last alert_days days
+    for region, count in zip(regions, split_count(args.alerts, weights)):
+        for chunk, size in enumerate(chunk_sizes(count, args.chunk_rows)):
+            tasks.append((synthesize_alerts, (args.out, args.seed, region, chunk, size, end, args.alert_days)))
+
+    return tasks
+
+def _run_task(task):
+    func, task_args = task
+    return func.__name__, func(*task_args)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write seeded synthetic datasets to the columnar store")
+    parser.add_argument("--out", required=True, help="root directory of the columnar store")
+    parser.add_argument("--regions", nargs="+", default=list(BASE_LOSS_RATES), choices=list(BASE_LOSS_RATES))
+    parser.add_argument("--years", type=int, nargs=2, default=[2015, datetime.now().year], metavar=("START", "END"))
+    parser.add_argument("--monthly-cells", type=int, default=10_000_000, help="total monthly cell rows")
+    parser.add_argument("--hotspots", type=int, default=1_000_000, help="total hotspot rows")
+    parser.add_argument("--alerts", type=int, default=1_000_000, help="total alert rows")
+    parser.add_argument("--alert-days", type=int, default=365, help="alerts are dated within this many days")
+    parser.add_argument("--end", default=datetime.now().strftime("%Y-%m-%d"), help="latest alert date (YYYY-MM-DD)")
+    parser.add_argument("--chunk-rows", type=int, default=250_000, help="maximum rows per task")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    tasks = plan_tasks(args)
+    start = time.perf_counter()
+    rows = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for name, count in pool.map(_run_task, tasks):
+            rows[name] = rows.get(name, 0) + count
+    elapsed = time.perf_counter() - start
+
+    total = sum(rows.values())
+    for name, count in rows.items():
+        print(f"{name[len('synthesize_'):]:<10}{count:>14,} rows")
+    print(f"Wrote {total:,} rows in {len(tasks)} tasks in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s) to {args.out}")
+
+if __name__ == "__main__":
+    main()
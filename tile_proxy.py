@@ -0,0 +1,458 @@
+"""
+Local caching proxy for the basemap tiles.
+
+Both maps draw the CARTO Positron basemap, and without the proxy every
+browser fetches the same tiles from the provider on every page load. On the
+field offices' high-latency links that dominates the time to a usable map.
+The proxy serves
+
+    GET /tiles/<z>/<x>/<y>.png
+    GET /stats
+    GET /healthz
+
+from a disk cache (TILE_CACHE_DIR, one file per tile), fetching a missing
+tile from TILE_UPSTREAM_URL once, however many clients ask for it at the same
+time. Upstream connections are kept alive per thread, so a miss costs one
+round trip rather than a new TCP and TLS handshake. The cache is bounded by
+TILE_CACHE_MB and evicts the least recently served tiles; recency survives a
+restart as the files' modification times.
+
+When it starts, the proxy prefetches the extent of every region at the zoom
+level create_map opens it at and TILE_PREFETCH_ZOOMS levels below, so the
+first view of each region is served locally too.
+
+With FOREST_GUARDIAN_TILE_PROXY_URL set to the proxy as reached by browsers,
+the maps load their tiles from it (see map_visualization.basemap_tiles).
+
+The stub command runs a stand-in tile server generating plain PNG tiles,
+optionally slowed down like a remote link, to test the proxy offline.
+
+Usage:
+    python tile_proxy.py serve [--host 127.0.0.1] [--port 8503] [--no-prefetch]
+    python tile_proxy.py prefetch [--regions Amazon "Congo Basin"] [--zooms 2]
+    python tile_proxy.py stub [--port 8504] [--latency 0.3]
+
+then, for a test against the stub:
+    FOREST_GUARDIAN_TILE_UPSTREAM_URL='http://127.0.0.1:8504/{z}/{x}/{y}.png' \\
+    python tile_proxy.py serve
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import config
+import regions
+
+# Deepest zoom level the basemap provides
+MAX_ZOOM = 20
+
+# How long browsers may reuse a tile without asking the proxy again (seconds)
+BROWSER_MAX_AGE = 7 * 24 * 60 * 60
+
+# Subdomains the upstream {s} placeholder rotates through
+UPSTREAM_SUBDOMAINS = "abcd"
+
+UPSTREAM_TIMEOUT = 30
+
+PREFETCH_WORKERS = 8
+
+TILE_PATH = re.compile(r"^/tiles/(\d+)/(\d+)/(\d+)\.png$")
+
+class TileError(Exception):
+    """A tile that could not be served, with the HTTP status to answer"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def tile_range(bbox, zoom, margin=1):
+    """
+    Tiles covering a bounding box at a zoom level
+
+    Parameters:
+    bbox: (min_lat, min_lon, max_lat, max_lon)
+    zoom: Zoom level
+    margin: Extra tiles around the box, for the part of the viewport beyond it
+
+    Returns:
+    List of (z, x, y)
+    """
+    min_lat, min_lon, max_lat, max_lon = bbox
+    count = 2 ** zoom
+
+    def tile_x(lon):
+        return int((lon + 180.0) / 360.0 * count)
+
+    def tile_y(lat):
+        lat = math.radians(max(-85.0511, min(85.0511, lat)))
+        return int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * count)
+
+    x_range = range(max(0, tile_x(min_lon) - margin), min(count - 1, tile_x(max_lon) + margin) + 1)
+    y_range = range(max(0, tile_y(max_lat) - margin), min(count - 1, tile_y(min_lat) + margin) + 1)
+    return [(zoom, x, y) for x in x_range for y in y_range]
+
+def region_tiles(region, extra_zooms=config.TILE_PREFETCH_ZOOMS):
+    """Tiles of a region's extent from the zoom its map opens at to extra_zooms levels below"""
+    region = regions.get_region(region)
+    zooms = range(region.zoom, min(MAX_ZOOM, region.zoom + extra_zooms) + 1)
+    return [tile for zoom in zooms for tile in tile_range(region.bbox, zoom)]
+
+class TileCache:
+    """
+    Disk cache of tiles with least-recently-used eviction
+
+    Parameters:
+    cache_dir: Directory of the tile files (<z>/<x>/<y>.png)
+    max_bytes: Size budget of the cached tiles
+    """
+
+    def __init__(self, cache_dir=config.TILE_CACHE_DIR, max_bytes=config.TILE_CACHE_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # (z, x, y) -> size, least recently used first
+        self._lock = threading.Lock()
+        self._load()
+
+    def _path(self, tile):
+        z, x, y = tile
+        return os.path.join(self.cache_dir, str(z), str(x), f"{y}.png")
+
+    def _load(self):
+        """Index the tiles already on disk, oldest first"""
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    z, x = os.path.relpath(root, self.cache_dir).split(os.sep)
+                    tile = (int(z), int(x), int(name[:-4]))
+                    stat = os.stat(path)
+                except (ValueError, OSError):
+                    continue
+                found.append((stat.st_mtime, tile, stat.st_size))
+        for _, tile, size in sorted(found):
+            self._entries[tile] = size
+            self.total_bytes += size
+        self._evict()
+
+    def get(self, tile):
+        """Return a cached tile's bytes (None when missing) and mark it recently used"""
+        with self._lock:
+            if tile not in self._entries:
+                return None
+            self._entries.move_to_end(tile)
+        path = self._path(tile)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.total_bytes -= self._entries.pop(tile, 0)
+            return None
+        return data
+
+    def put(self, tile, data):
+        """Store a tile, evicting the least recently used ones beyond the budget"""
+        path = self._path(tile)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            self.total_bytes += len(data) - self._entries.pop(tile, 0)
+            self._entries[tile] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            tile, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(tile))
+            except OSError:
+                pass
+
+    def __contains__(self, tile):
+        with self._lock:
+            return tile in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+class TileProxy:
+    """
+    Serves tiles from a TileCache, fetching the missing ones upstream once
+
+    Parameters:
+    cache: TileCache to serve from
+    upstream_url: URL template of the tile provider ({s}, {z}, {x}, {y})
+    """
+
+    def __init__(self, cache=None, upstream_url=config.TILE_UPSTREAM_URL):
+        self.cache = cache if cache is not None else TileCache()
+        self.upstream_url = upstream_url
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._fetching = {}  # tile -> lock held while it is fetched upstream
+        self._lock = threading.Lock()
+        self._connections = threading.local()
+
+    def get(self, tile):
+        """
+        Return (tile bytes, whether it came from the cache)
+
+        Raises TileError for tiles outside the map or not served upstream.
+        """
+        z, x, y = tile
+        if z > MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+            raise TileError(404, f"no tile {z}/{x}/{y}")
+        data = self.cache.get(tile)
+        if data is not None:
+            self.hits += 1
+            return data, True
+
+        with self._lock:
+            fetch_lock = self._fetching.setdefault(tile, threading.Lock())
+        try:
+            with fetch_lock:
+                # Another request may have fetched it while this one waited
+                data = self.cache.get(tile)
+                if data is not None:
+                    self.hits += 1
+                    return data, True
+                self.misses += 1
+                data = self._fetch(tile)
+                self.cache.put(tile, data)
+                return data, False
+        finally:
+            with self._lock:
+                self._fetching.pop(tile, None)
+
+    def _fetch(self, tile):
+        """Fetch a tile upstream over this thread's kept-alive connection"""
+        z, x, y = tile
+        url = urlsplit(self.upstream_url.format(s=UPSTREAM_SUBDOMAINS[(x + y) % len(UPSTREAM_SUBDOMAINS)],
+                                                z=z, x=x, y=y))
+        target = url.path + (f"?{url.query}" if url.query else "")
+        for attempt in range(2):
+            connection = self._connection(url)
+            try:
+                connection.request("GET", target, headers={'User-Agent': "ForestGuardian-TileProxy/1.0"})
+                response = connection.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                # A kept-alive connection the server closed: retry once on a new one
+                self._close(url)
+                if attempt == 0:
+                    continue
+                self.errors += 1
+                raise TileError(502, f"upstream unreachable: {e}") from e
+            if response.will_close:
+                self._close(url)
+            if response.status != 200:
+                self.errors += 1
+                raise TileError(404 if response.status == 404 else 502, f"upstream answered {response.status}")
+            return body
+
+    def _connection(self, url):
+        connections = self._connections.__dict__.setdefault('by_host', {})
+        key = (url.scheme, url.netloc)
+        if key not in connections:
+            connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+            connections[key] = connection_class(url.netloc, timeout=UPSTREAM_TIMEOUT)
+        return connections[key]
+
+    def _close(self, url):
+        connection = self._connections.__dict__.get('by_host', {}).pop((url.scheme, url.netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def stats(self):
+        """Counters of the proxy and its cache"""
+        return {
+            'tiles': len(self.cache),
+            'bytes': self.cache.total_bytes,
+            'max_bytes': self.cache.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'evictions': self.cache.evictions,
+        }
+
+def prefetch(proxy, region_names=None, extra_zooms=config.TILE_PREFETCH_ZOOMS, workers=PREFETCH_WORKERS):
+    """
+    Fetch the tiles of every region's extent into the cache
+
+    Returns:
+    Dictionary with the number of tiles 'fetched', already 'cached' and 'failed'
+    """
+    started = time.perf_counter()
+    tiles = list(dict.fromkeys(tile for region in (region_names or list(regions.REGIONS))
+                               for tile in region_tiles(region, extra_zooms)))
+    counts = {'fetched': 0, 'cached': 0, 'failed': 0}
+
+    def fetch(tile):
+        if tile in proxy.cache:
+            return 'cached'
+        try:
+            proxy.get(tile)
+        except TileError:
+            return 'failed'
+        return 'fetched'
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tile-prefetch") as pool:
+        for outcome in pool.map(fetch, tiles):
+            counts[outcome] += 1
+    print(f"Prefetched {len(tiles):,} tiles in {time.perf_counter() - started:.1f}s "
+          f"({counts['fetched']:,} fetched, {counts['cached']:,} already cached, {counts['failed']:,} failed)")
+    return counts
+
+class _TileHandler(BaseHTTPRequestHandler):
+    # Keep-alive: a map loads a dozen or more tiles at once
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/healthz":
+            return self._send(200, "application/json", b'{"status": "ok"}')
+        if path == "/stats":
+            return self._send(200, "application/json", json.dumps(self.server.proxy.stats()).encode("utf-8"))
+        match = TILE_PATH.match(path)
+        if match is None:
+            return self._send(404, "application/json", b'{"error": "not found"}')
+        try:
+            data, cached = self.server.proxy.get(tuple(int(part) for part in match.groups()))
+        except TileError as e:
+            return self._send(e.status, "application/json", json.dumps({'error': str(e)}).encode("utf-8"))
+        self._send(200, "image/png", data, {
+            'Cache-Control': f"public, max-age={BROWSER_MAX_AGE}",
+            'X-Cache': "HIT" if cached else "MISS",
+        })
+
+    def _send(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', "*")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_server(host=config.TILE_PROXY_HOST, port=config.TILE_PROXY_PORT, proxy=None):
+    """Create the tile proxy server (call serve_forever() on it)"""
+    server = ThreadingHTTPServer((host, port), _TileHandler)
+    server.daemon_threads = True
+    server.proxy = proxy if proxy is not None else TileProxy()
+    return server
+
+def png_tile(z, x, y, size=256):
+    """A plain PNG tile whose color depends on its coordinates"""
+    rgb = bytes(((x * 37 + z * 11) % 96 + 160, (y * 53 + z * 7) % 96 + 160, 230))
+    raw = (b"\x00" + rgb * size) * size
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+class StubTileServer(ThreadingHTTPServer):
+    """
+    Stand-in tile provider serving generated tiles at /<z>/<x>/<y>.png
+
+    Parameters:
+    address: (host, port) to listen on
+    latency: Seconds each request is delayed by, like a remote link
+    """
+
+    def __init__(self, address, latency=0.0):
+        super().__init__(address, _StubTileHandler)
+        self.daemon_threads = True
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+class _StubTileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        with self.server._lock:
+            self.server.requests += 1
+        time.sleep(self.server.latency)
+        match = re.match(r"^/(\d+)/(\d+)/(\d+)\.png$", urlsplit(self.path).path)
+        z, x, y = (int(part) for part in match.groups()) if match else (0, -1, -1)
+        if match is None or z > MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            body, content_type, status = b"not found", "text/plain", 404
+        else:
+            body, content_type, status = png_tile(z, x, y), "image/png", 200
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Local caching proxy for the basemap tiles")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="serve tiles from the cache, prefetching every region first")
+    serve.add_argument("--host", default=config.TILE_PROXY_HOST)
+    serve.add_argument("--port", type=int, default=config.TILE_PROXY_PORT)
+    serve.add_argument("--no-prefetch", action="store_true", help="fetch tiles only when they are asked for")
+    warm = commands.add_parser("prefetch", help="fetch the tiles of the regions' extents into the cache and exit")
+    warm.add_argument("--regions", nargs="+", choices=list(regions.REGIONS), default=list(regions.REGIONS))
+    warm.add_argument("--zooms", type=int, default=config.TILE_PREFETCH_ZOOMS,
+                      help="zoom levels below each region's initial zoom")
+    stub = commands.add_parser("stub", help="run a stand-in tile server")
+    stub.add_argument("--host", default="127.0.0.1")
+    stub.add_argument("--port", type=int, default=8504)
+    stub.add_argument("--latency", type=float, default=0.0, help="delay of each request (seconds)")
+    args = parser.parse_args()
+
+    if args.command == "stub":
+        server = StubTileServer((args.host, args.port), args.latency)
+        print(f"Serving stand-in tiles on http://{args.host}:{args.port}/{{z}}/{{x}}/{{y}}.png (Ctrl+C to stop)")
+    elif args.command == "prefetch":
+        proxy = TileProxy()
+        prefetch(proxy, args.regions, args.zooms)
+        print(json.dumps(proxy.stats()))
+        return
+    else:
+        server = make_server(args.host, args.port)
+        if not args.no_prefetch:
+            threading.Thread(target=prefetch, args=(server.proxy,), name="tile-prefetch", daemon=True).start()
+        print(f"Serving cached tiles on http://{args.host}:{args.port}/tiles/{{z}}/{{x}}/{{y}}.png (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+        if args.command == "stub":
+            print(f"Served {server.requests:,} requests")
+
+if __name__ == "__main__":
+    main()
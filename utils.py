@@ -1,5 +1,9 @@
 import streamlit as st
-import time
+import functools
+import html
+import os
+import re
+import uuid
 from datetime import datetime
 
 def toggle_theme():
@@ -32,660 +36,90 @@ def get_current_theme():
 
     return st.session_state.theme
 
+# Path of the precompiled dashboard stylesheet
+THEME_STYLESHEET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "theme.css")
+
+# Values of the --fg-* custom properties used by assets/theme.css, per theme
+THEME_VARIABLES = {
+    'light': {
+        '--fg-bg': '#FFFFFF',
+        '--fg-text': '#262730',
+        '--fg-secondary-bg': '#F0F2F6',
+        '--fg-expander-border': 'rgba(0,0,0,0.1)',
+        '--fg-link': '#0D6EFD',
+        '--fg-table-bg': 'rgba(255,255,255,1)',
+        '--fg-table-header-bg': 'rgba(240,242,246,1)',
+        '--fg-select-bg': 'transparent',
+        '--fg-select-option-bg': '#FFFFFF',
+        '--fg-container-bg': 'rgba(0,0,0,0.02)',
+        '--fg-container-border': 'rgba(0,0,0,0.05)',
+        '--fg-info-bg': 'rgba(66, 150, 250, 0.1)',
+        '--fg-info-text': '#1E5A96',
+        '--fg-info-paragraph': '#1E5A96',
+        '--fg-success-bg': 'rgba(45, 200, 65, 0.1)',
+        '--fg-success-text': '#047857',
+        '--fg-success-paragraph': '#047857',
+        '--fg-risk-high': '#E53935',
+        '--fg-risk-medium': '#FB8C00',
+        '--fg-risk-low': '#388E3C',
+        '--fg-tooltip-bg': 'black',
+        '--fg-button-bg': '#F0F2F6',
+        '--fg-button-text': '#262730',
+        '--fg-button-border': 'rgba(0,0,0,0.1)',
+        '--fg-button-hover-bg': '#E6E9EF',
+        '--fg-footer-bg': '#F0F2F6',
+        '--fg-footer-text': '#666666',
+    },
+    'dark': {
+        '--fg-bg': '#121212',
+        '--fg-text': '#FFFFFF',
+        '--fg-secondary-bg': '#1E1E1E',
+        '--fg-expander-border': 'rgba(255,255,255,0.1)',
+        '--fg-link': '#8AB4F8',
+        '--fg-table-bg': 'rgba(255,255,255,0.05)',
+        '--fg-table-header-bg': 'rgba(255,255,255,0.1)',
+        '--fg-select-bg': 'rgba(255,255,255,0.1)',
+        '--fg-select-option-bg': '#1E1E1E',
+        '--fg-container-bg': 'rgba(255,255,255,0.05)',
+        '--fg-container-border': 'rgba(255,255,255,0.1)',
+        '--fg-info-bg': 'rgba(66, 150, 250, 0.2)',
+        '--fg-info-text': '#8AB4F8',
+        '--fg-info-paragraph': '#FFFFFF',
+        '--fg-success-bg': 'rgba(45, 200, 65, 0.2)',
+        '--fg-success-text': '#A7F3D0',
+        '--fg-success-paragraph': '#FFFFFF',
+        '--fg-risk-high': '#FF6B6B',
+        '--fg-risk-medium': '#FFD166',
+        '--fg-risk-low': '#A7F3D0',
+        '--fg-tooltip-bg': '#444444',
+        '--fg-button-bg': '#2E2E2E',
+        '--fg-button-text': '#FFFFFF',
+        '--fg-button-border': 'rgba(255,255,255,0.2)',
+        '--fg-button-hover-bg': '#3E3E3E',
+        '--fg-footer-bg': '#1E1E1E',
+        '--fg-footer-text': '#CCCCCC',
+    },
+}
+
+@functools.lru_cache(maxsize=None)
+def theme_stylesheet_html():
+    """Return the static dashboard stylesheet as a <style> block (read once per process)"""
+    with open(THEME_STYLESHEET, encoding="utf-8") as f:
+        return f"<style>\n{f.read()}</style>"
+
+@functools.lru_cache(maxsize=None)
+def theme_variables_html(theme):
+    """Return the small <style> block that sets the custom properties for a theme"""
+    variables = THEME_VARIABLES.get(theme, THEME_VARIABLES['light'])
+    declarations = "".join(f"{name}: {value}; " for name, value in variables.items())
+    return f"<style>:root {{ {declarations}}}</style>"
+
 def apply_theme_css():
     """Apply CSS based on the current theme"""
+    # The stylesheet never changes between reruns; only the custom property
+    # block depends on the theme. Both strings are built once and reused.
     theme = get_current_theme()
-
-    # Define CSS based on the current theme
-    css = f"""
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap');
-        @import url('https://fonts.googleapis.com/css2?family=Roboto+Slab:wght@400;700&display=swap');
-
-        /* Animated nature theme gradients */
-        @keyframes gradientFlow {{
-            0% {{ background-position: 0% 50%; }}
-            50% {{ background-position: 100% 50%; }}
-            100% {{ background-position: 0% 50%; }}
-        }}
-
-        @keyframes colorPulse {{
-            0% {{ filter: hue-rotate(0deg); }}
-            50% {{ filter: hue-rotate(30deg); }}
-            100% {{ filter: hue-rotate(0deg); }}
-        }}
-
-        :root {{
-            --forest-gradient: linear-gradient(135deg, #2ecc71, #27ae60, #2ecc71);
-            --sunset-gradient: linear-gradient(135deg, #e67e22, #d35400, #e67e22);
-            --water-gradient: linear-gradient(135deg, #3498db, #2980b9, #3498db);
-            --live-gradient: linear-gradient(45deg, #2ecc71, #3498db, #e67e22, #2ecc71);
-        }}
-
-        /* Live theme base styling */
-        .stApp {{
-            background: var(--live-gradient) !important;
-            background-size: 400% 400% !important;
-            animation: gradientFlow 15s ease infinite, colorPulse 10s ease infinite !important;
-        }}
-
-        /* Animated containers */
-        div[data-testid="stContainer"], 
-        div[data-testid="stMetricValue"],
-        div[data-testid="stExpander"] {{
-            backdrop-filter: blur(10px);
-            transition: all 0.3s ease;
-        }}
-
-        div[data-testid="stContainer"]:hover,
-        div[data-testid="stMetricValue"]:hover {{
-            transform: translateY(-2px);
-            box-shadow: 0 8px 16px rgba(0,0,0,0.1);
-        }}
-
-        /* Base font styling with enhanced nature theme */
-        .stApp, .stMarkdown, .stText {{
-            font-family: 'Poppins', sans-serif !important;
-            background: linear-gradient(180deg, rgba(46, 204, 113, 0.05), rgba(39, 174, 96, 0.02));
-        }}
-
-        /* Headings styling */
-        h1, h2, h3, h4, h5, h6 {{
-            font-family: 'Roboto Slab', serif !important;
-            font-weight: 700 !important;
-            letter-spacing: -0.5px;
-        }}
-
-        /* Metric value styling */
-        div[data-testid="stMetricValue"] {{
-            font-family: 'Poppins', sans-serif !important;
-            font-weight: 600 !important;
-            letter-spacing: -0.5px;
-        }}
-        /* Enhanced sidebar styling with glass effect */
-        section[data-testid="stSidebar"] {{
-            background: linear-gradient(135deg, rgba(46, 204, 113, 0.15), rgba(52, 152, 219, 0.15)) !important;
-            backdrop-filter: blur(12px) !important;
-            -webkit-backdrop-filter: blur(12px) !important;
-            border-right: 1px solid rgba(255, 255, 255, 0.2) !important;
-            box-shadow: 10px 0 20px rgba(0, 0, 0, 0.2) !important;
-            animation: sidebarEntrance 0.6s ease-out;
-        }}
-
-        /* Enhance sidebar content */
-        section[data-testid="stSidebar"] .block-container {{
-            background: rgba(255, 255, 255, 0.05) !important;
-            padding: 2.5rem 1.5rem !important;
-            border-radius: 15px !important;
-            margin: 10px !important;
-        }}
-
-        /* Sidebar title animation */
-        section[data-testid="stSidebar"] h1 {{
-            background: linear-gradient(45deg, #2ecc71, #3498db) !important;
-            -webkit-background-clip: text !important;
-            -webkit-text-fill-color: transparent !important;
-            animation: titleGlow 3s ease-in-out infinite !important;
-            font-size: 1.8em !important;
-            margin-bottom: 1.5rem !important;
-        }}
-
-        @keyframes sidebarEntrance {{
-            from {{
-                transform: translateX(-100%);
-                opacity: 0;
-            }}
-            to {{
-                transform: translateX(0);
-                opacity: 1;
-            }}
-        }}
-
-        /* Sidebar elements styling */
-        section[data-testid="stSidebar"] .block-container {{
-            padding: 2rem 1rem;
-        }}
-
-        section[data-testid="stSidebar"] h1 {{
-            background: linear-gradient(45deg, #2ecc71, #3498db);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            animation: titleGlow 3s ease-in-out infinite;
-        }}
-
-        @keyframes titleGlow {{
-            0%, 100% {{ filter: brightness(100%); }}
-            50% {{ filter: brightness(120%); }}
-        }}
-
-        /* Sidebar selectbox enhancement */
-        section[data-testid="stSidebar"] .stSelectbox {{
-            background: rgba(255, 255, 255, 0.05);
-            border-radius: 10px;
-            padding: 5px;
-            margin: 10px 0;
-            transition: all 0.3s ease;
-        }}
-
-        section[data-testid="stSidebar"] .stSelectbox:hover {{
-            transform: translateY(-2px);
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.1);
-        }}
-
-        /* Slider styling in sidebar */
-        section[data-testid="stSidebar"] .stSlider {{
-            background: rgba(255, 255, 255, 0.05);
-            border-radius: 10px;
-            padding: 15px;
-            margin: 15px 0;
-            transition: all 0.3s ease;
-        }}
-
-        section[data-testid="stSidebar"] .stSlider:hover {{
-            transform: translateY(-2px);
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.1);
-        }}
-
-        /* Checkbox styling */
-        section[data-testid="stSidebar"] .stCheckbox {{
-            background: rgba(255, 255, 255, 0.05);
-            border-radius: 8px;
-            padding: 10px;
-            margin: 8px 0;
-            transition: all 0.3s ease;
-        }}
-
-        section[data-testid="stSidebar"] .stCheckbox:hover {{
-            transform: translateY(-2px);
-        }}
-
-        /* Alert sensitivity indicators */
-        section[data-testid="stSidebar"] .row-widget.stMarkdown {{
-            text-align: center;
-            transition: all 0.3s ease;
-        }}
-
-        section[data-testid="stSidebar"] .row-widget.stMarkdown:hover {{
-            transform: scale(1.05);
-        }}
-
-        /* Update notification styling */
-        section[data-testid="stSidebar"] .element-container:last-child {{
-            background: linear-gradient(135deg, rgba(46, 204, 113, 0.1), rgba(52, 152, 219, 0.1));
-            border-radius: 10px;
-            padding: 15px;
-            margin-top: 20px;
-            border: 1px solid rgba(46, 204, 113, 0.2);
-            animation: pulse 2s infinite;
-        }}
-
-        @keyframes pulse {{
-            0% {{ box-shadow: 0 0 0 0 rgba(46, 204, 113, 0.4); }}
-            70% {{ box-shadow: 0 0 0 10px rgba(46, 204, 113, 0); }}
-            100% {{ box-shadow: 0 0 0 0 rgba(46, 204, 113, 0); }}
-        }}
-
-        /* Base app styling */
-        .stApp {{
-            background-color: {st.session_state.bg_color};
-            color: {st.session_state.text_color} !important;
-        }}
-
-        /* Light and dark mode specific text colors for all elements */
-        .stTextInput label, .stTextInput input,
-        .stSelectbox label, .stSelectbox div,
-        .stMultiSelect label, .stMultiSelect div,
-        .stSlider label, .stSlider div,
-        .stCheckbox label, .stRadio label,
-        div[data-testid="stMarkdownContainer"] p,
-        div[data-testid="stMarkdownContainer"] li,
-        div[data-testid="stMarkdownContainer"] span,
-        div[data-testid="stMarkdownContainer"] a,
-        div[data-testid="stMarkdownContainer"] h1,
-        div[data-testid="stMarkdownContainer"] h2,
-        div[data-testid="stMarkdownContainer"] h3,
-        div[data-testid="stMarkdownContainer"] h4,
-        div[data-testid="stMarkdownContainer"] h5,
-        div[data-testid="stMarkdownContainer"] h6,
-        div[data-testid="stExpander"] summary span,
-        div[data-testid="stExpander"] div p {{
-            color: {st.session_state.text_color} !important;
-        }}
-
-        /* Ensure expander content is visible */
-        details, details[open] {{
-            background-color: {st.session_state.secondary_bg_color};
-            color: {st.session_state.text_color} !important;
-            padding: 10px;
-            border-radius: 5px;
-            border: 1px solid {'rgba(255,255,255,0.1)' if theme == 'dark' else 'rgba(0,0,0,0.1)'};
-        }}
-
-        /* Ensure all text is visible */
-        * {{
-            color: {st.session_state.text_color} !important;
-        }}
-
-        /* Set specific elements with their appropriate colors */
-        a {{
-           color: {'#8AB4F8' if theme == 'dark' else '#0D6EFD'} !important;
-        }}
-
-        /* Improve data frame visibility */
-        .stDataFrame div[data-testid="stTable"] {{
-            background-color: {'rgba(255,255,255,0.05)' if theme == 'dark' else 'rgba(255,255,255,1)'};
-            border-radius: 5px;
-            padding: 2px;
-        }}
-
-        .stDataFrame div[data-testid="stTable"] table {{
-            color: {st.session_state.text_color} !important;
-        }}
-
-        .stDataFrame div[data-testid="stTable"] th {{
-            background-color: {'rgba(255,255,255,0.1)' if theme == 'dark' else 'rgba(240,242,246,1)'};
-            color: {st.session_state.text_color} !important;
-            font-weight: bold;
-        }}
-
-        .stDataFrame div[data-testid="stTable"] td {{
-            background-color: {'rgba(255,255,255,0.05)' if theme == 'dark' else 'rgba(255,255,255,1)'};
-            color: {st.session_state.text_color} !important;
-        }}
-
-        /* Enhanced Tabs styling */
-        .stTabs [data-baseweb="tab-list"] {{
-            background: linear-gradient(135deg, rgba(46, 204, 113, 0.1), rgba(52, 152, 219, 0.1)) !important;
-            border-radius: 10px;
-            padding: 5px;
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.05);
-            backdrop-filter: blur(10px);
-        }}
-
-        .stTabs [data-baseweb="tab"] {{
-            color: {st.session_state.text_color} !important;
-            font-weight: bold;
-            transition: all 0.3s ease;
-            border-radius: 8px;
-            margin: 0 5px;
-            padding: 8px 16px;
-        }}
-
-        .stTabs [data-baseweb="tab"]:hover {{
-            background: linear-gradient(135deg, rgba(46, 204, 113, 0.2), rgba(52, 152, 219, 0.2));
-            transform: translateY(-2px);
-        }}
-
-        .stTabs [data-baseweb="tab"][aria-selected="true"] {{
-            background: linear-gradient(135deg, rgba(46, 204, 113, 0.3), rgba(52, 152, 219, 0.3));
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.1);
-        }}
-
-        /* Map container enhancement */
-        .element-container:has(iframe) {{
-            background: linear-gradient(135deg, rgba(255, 255, 255, 0.05), rgba(255, 255, 255, 0.1));
-            border-radius: 15px;
-            padding: 15px;
-            box-shadow: 0 8px 32px rgba(0, 0, 0, 0.1);
-            backdrop-filter: blur(10px);
-            transition: all 0.3s ease;
-        }}
-
-        /* Plotly chart container styling */
-        .stPlotlyChart {{
-            background: linear-gradient(135deg, rgba(255, 255, 255, 0.05), rgba(255, 255, 255, 0.1));
-            border-radius: 15px;
-            padding: 20px;
-            box-shadow: 0 8px 32px rgba(0, 0, 0, 0.1);
-            backdrop-filter: blur(10px);
-            transition: transform 0.3s ease;
-        }}
-
-        .stPlotlyChart:hover {{
-            transform: translateY(-5px);
-        }}
-
-        /* Analysis section enhancement */
-        div[data-testid="stContainer"] {{
-            background: linear-gradient(135deg, rgba(46, 204, 113, 0.05), rgba(52, 152, 219, 0.05));
-            border-radius: 15px;
-            padding: 20px;
-            margin: 10px 0;
-            box-shadow: 0 8px 32px rgba(0, 0, 0, 0.1);
-            backdrop-filter: blur(10px);
-            transition: all 0.3s ease;
-        }}
-
-        div[data-testid="stContainer"]:hover {{
-            transform: translateY(-3px);
-            box-shadow: 0 12px 40px rgba(0, 0, 0, 0.15);
-        }}
-
-        /* Metric styling */
-        div[data-testid="stMetricValue"], span[data-testid="stMetricValue"] {{
-            font-size: 1.5rem !important;
-            font-weight: bold !important;
-            color: {st.session_state.text_color} !important;
-        }}
-
-        div[data-testid="stMetricLabel"], span[data-testid="stMetricLabel"] {{
-            color: {st.session_state.text_color} !important;
-        }}
-
-        div[data-testid="stMetricDelta"], span[data-testid="stMetricDelta"] {{
-            font-weight: bold !important;
-        }}
-
-        /* Better contrast for elements in dark mode */
-        .stSelectbox div, .stMultiSelect div {{
-            background-color: {'rgba(255,255,255,0.1)' if theme == 'dark' else 'transparent'};
-            border-radius: 5px;
-            color: {st.session_state.text_color} !important;
-        }}
-
-        /* Improve select dropdown visibility */
-        div[data-baseweb="select"] {{
-            background-color: {'rgba(255,255,255,0.1)' if theme == 'dark' else 'transparent'};
-            color: {st.session_state.text_color} !important;
-            border-radius: 5px;
-        }}
-
-        div[data-baseweb="select"] option {{
-            background-color: {'#1E1E1E' if theme == 'dark' else '#FFFFFF'};
-            color: {st.session_state.text_color} !important;
-        }}
-
-        /* Improved container styling */
-        div[data-testid="stContainer"] {{
-            background-color: {'rgba(255,255,255,0.05)' if theme == 'dark' else 'rgba(0,0,0,0.02)'};
-            padding: 10px;
-            border-radius: 5px;
-            border: 1px solid {'rgba(255,255,255,0.1)' if theme == 'dark' else 'rgba(0,0,0,0.05)'};
-        }}
-
-        /* Map container styling */
-        .map-container {{
-            border-radius: 10px;
-            overflow: hidden;
-            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.2);
-        }}
-
-        /* Fix for vertical text in Folium maps and other elements */
-        .leaflet-container .leaflet-control-layers,
-        .leaflet-control, 
-        .leaflet-popup-content,
-        .leaflet-tooltip,
-        .leaflet-control-layers-list,
-        .folium-map span, 
-        .folium-map p,
-        .folium-map a,
-        .folium-map div,
-        .folium-control-layers, 
-        .folium-control,
-        .leaflet-control-zoom,
-        .leaflet-bar,
-        .leaflet-control-attribution,
-        .folium-map button {{
-            font-family: 'Arial', sans-serif !important;
-            text-orientation: mixed !important;
-            writing-mode: horizontal-tb !important;
-            text-align: left !important;
-            letter-spacing: normal !important;
-            word-spacing: normal !important;
-            direction: ltr !important;
-            text-rendering: auto !important;
-        }}
-
-        /* Info box styling */
-        div[data-testid="stAlert"] {{
-            background-color: {'rgba(66, 150, 250, 0.2)' if theme == 'dark' else 'rgba(66, 150, 250, 0.1)'};
-            color: {'#8AB4F8' if theme == 'dark' else '#1E5A96'} !important;
-        }}
-
-        div[data-testid="stAlert"] p {{
-            color: {'#FFFFFF' if theme == 'dark' else '#1E5A96'} !important;
-        }}
-
-        /* Success message styling */
-        div[data-testid="stSuccessMessage"] {{
-            background-color: {'rgba(45, 200, 65, 0.2)' if theme == 'dark' else 'rgba(45, 200, 65, 0.1)'};
-            color: {'#A7F3D0' if theme == 'dark' else '#047857'} !important;
-        }}
-
-        div[data-testid="stSuccessMessage"] p {{
-            color: {'#FFFFFF' if theme == 'dark' else '#047857'} !important;
-        }}
-
-        /* Risk level styling with brighter colors for dark mode */
-        .risk-high {{
-            color: {'#FF6B6B' if theme == 'dark' else '#E53935'} !important;
-            font-weight: bold;
-        }}
-
-        .risk-medium {{
-            color: {'#FFD166' if theme == 'dark' else '#FB8C00'} !important;
-            font-weight: bold;
-        }}
-
-        .risk-low {{
-            color: {'#A7F3D0' if theme == 'dark' else '#388E3C'} !important;
-            font-weight: bold;
-        }}
-
-        /* Alert box styling and animation */
-        @keyframes alertPulse {{
-            0% {{ transform: scale(1); background-position: 0% 50%; }}
-            50% {{ transform: scale(1.02); background-position: 100% 50%; }}
-            100% {{ transform: scale(1); background-position: 0% 50%; }}
-        }}
-
-        /* Alert badge styling */
-        .alert-badge {{
-            background: var(--live-gradient);
-            background-size: 200% 200%;
-            color: white !important;
-            padding: 5px 12px;
-            border-radius: 15px;
-            font-size: 13px;
-            margin-left: 8px;
-            font-weight: bold;
-            box-shadow: 0 2px 15px rgba(52, 152, 219, 0.3);
-            animation: alertPulse 3s infinite, gradientFlow 15s ease infinite, colorPulse 10s ease infinite;
-            display: inline-block;
-            backdrop-filter: blur(5px);
-            transition: all 0.3s ease;
-        }}
-
-        .alert-badge:hover {{
-            transform: translateY(-2px);
-            box-shadow: 0 4px 15px rgba(255, 82, 82, 0.4);
-        }}
-
-        /* Tooltip styling */
-        .tooltip {{
-            position: relative;
-            display: inline-block;
-        }}
-
-        .tooltip .tooltiptext {{
-            visibility: hidden;
-            width: 120px;
-            background-color: {'#444444' if theme == 'dark' else 'black'};
-            color: white !important;
-            text-align: center;
-            border-radius: 6px;
-            padding: 5px;
-            position: absolute;
-            z-index: 1;
-            bottom: 125%;
-            left: 50%;
-            margin-left: -60px;
-            opacity: 0;
-            transition: opacity 0.3s;
-        }}
-
-        .tooltip:hover .tooltiptext {{
-            visibility: visible;
-            opacity: 1;
-        }}
-
-        /* Animation for icons */
-        .animated-icon {{
-            animation: pulse 2s infinite;
-        }}
-
-        @keyframes pulse {{
-            0% {{ opacity: 1; }}
-            50% {{ opacity: 0.5; }}
-            100% {{ opacity: 1; }}
-        }}
-
-        /* Nature-themed buttons */
-        .stButton > button {{
-            background: var(--forest-gradient) !important;
-            color: white !important;
-            border: none !important;
-            transition: transform 0.3s ease, box-shadow 0.3s ease !important;
-        }}
-
-        .stButton > button:hover {{
-            transform: translateY(-2px) !important;
-            box-shadow: 0 4px 15px rgba(46, 204, 113, 0.3) !important;
-        }}
-
-        /* Metric containers with forest theme */
-        div[data-testid="stMetricValue"] {{
-            background: var(--forest-gradient);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            font-weight: bold !important;
-        }}
-
-        /* Enhanced alerts styling */
-        div[data-testid="stExpander"] {{
-            border-left: 4px solid #2ecc71;
-            transition: all 0.3s ease;
-        }}
-
-        /* Animated text styles */
-
-        /* Button styling */
-        button, .stButton>button {{
-            background-color: {'#2E2E2E' if theme == 'dark' else '#F0F2F6'};
-            color: {'#FFFFFF' if theme == 'dark' else '#262730'} !important;
-            border: 1px solid {'rgba(255,255,255,0.2)' if theme == 'dark' else 'rgba(0,0,0,0.1)'};
-            border-radius: 5px;
-            transition: all 0.3s ease;
-            text-orientation: mixed !important;
-            writing-mode: horizontal-tb !important;
-            text-align: center !important;
-            letter-spacing: normal !important;
-            word-spacing: normal !important;
-            font-family: 'Arial', sans-serif !important;
-        }}
-
-        button:hover, .stButton>button:hover {{
-            background-color: {'#3E3E3E' if theme == 'dark' else '#E6E9EF'};
-            transform: translateY(-2px);
-            box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-        }}
-
-        /* Ensure button text is always horizontal and properly displayed */
-        .stButton button p,
-        .stButton button span,
-        .stButton button div,
-        .stButton button,
-        button span, 
-        button p, 
-        button div {{
-            text-orientation: mixed !important;
-            writing-mode: horizontal-tb !important;
-            text-align: center !important;
-            direction: ltr !important;
-            display: block !important;
-            font-family: 'Arial', sans-serif !important;
-        }}
-
-        /* Slider styling */
-        .stSlider {{
-            padding-top: 2rem;
-        }}
-
-        .stSlider div[data-baseweb="slider"] {{
-            margin-top: 1rem;
-        }}
-
-        /* Footer styling */
-        .st-emotion-cache-164nlkn {{
-            background-color: {'#1E1E1E' if theme == 'dark' else '#F0F2F6'};
-            color: {'#CCCCCC' if theme == 'dark' else '#666666'} !important;
-        }}
-
-        /* Enhanced expander styling for alerts */
-        div[data-testid="stExpander"] {{
-            background: linear-gradient(135deg, rgba(255, 255, 255, 0.1), rgba(255, 255, 255, 0.2)) !important;
-            background-size: 300% 300% !important;
-            border-radius: 15px !important;
-            border: 2px solid rgba(46, 204, 113, 0.3) !important;
-            box-shadow: 0 8px 32px rgba(31, 38, 135, 0.15);
-            margin: 15px 0;
-            transition: all 0.3s ease !important;
-            animation: alertGradient 8s ease infinite;
-            backdrop-filter: blur(8px);
-            padding: 20px !important;
-        }}
-
-        /* Style multiselect and slider in alert box */
-        div[data-testid="stExpander"] .stMultiSelect,
-        div[data-testid="stExpander"] .stSlider {{
-            background: rgba(255, 255, 255, 0.1);
-            border-radius: 10px;
-            padding: 15px;
-            margin: 10px 0;
-            backdrop-filter: blur(5px);
-        }}
-
-        /* Alert title styling */
-        div[data-testid="stExpander"] > div:first-child {{
-            font-size: 1.2em !important;
-            font-weight: 600 !important;
-            color: #2ecc71 !important;
-            text-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            margin-bottom: 15px !important;
-            border-bottom: 2px solid rgba(46, 204, 113, 0.2);
-            padding-bottom: 15px !important;
-        }}
-
-        @keyframes alertGradient {{
-            0% {{ background-position: 0% 50%; }}
-            50% {{ background-position: 100% 50%; }}
-            100% {{ background-position: 0% 50%; }}
-        }}
-
-        div[data-testid="stExpander"]:hover {{
-            transform: translateY(-2px);
-            box-shadow: 0 6px 20px rgba(0, 0, 0, 0.1);
-            border: 1px solid rgba(46, 204, 113, 0.4) !important;
-        }}
-
-        /* Alert content styling */
-        div[data-testid="stExpander"] > div {{
-            background: linear-gradient(135deg, rgba(255, 255, 255, 0.05) 0%, rgba(255, 255, 255, 0.1) 100%);
-            border-radius: 8px;
-            padding: 15px !important;
-            margin-top: 10px;
-        }}
-
-        /* Alert header styling */
-        div[data-testid="stExpander"] > div:first-child {{
-            border-bottom: 1px solid rgba(46, 204, 113, 0.2);
-            padding-bottom: 10px !important;
-        }}
-    </style>
-    """
-
-    # Return the CSS
-    return css
+    return theme_stylesheet_html() + theme_variables_html(theme)
 
 def format_number(num):
     """Format large numbers with commas"""
@@ -730,11 +164,8 @@ def calculate_percentage_change(old_value, new_value):
     return ((new_value - old_value) / old_value) * 100
 
 def show_notification(message, icon="🔔"):
-    """Display a temporary notification message"""
-    notification = st.empty()
-    notification.info(f"{icon} {message}")
-    time.sleep(3)
-    notification.empty()
+    """Display a temporary notification message (dismissed by the browser)"""
+    st.toast(message, icon=icon)
 
 def get_time_since(timestamp):
     """Return a human-readable string of time since the given timestamp"""
@@ -752,29 +183,92 @@ def get_time_since(timestamp):
     else:
         return "Just now"
 
-# Set session state defaults
-if 'theme' not in st.session_state:
-    st.session_state.theme = 'light'
+def format_location(lat, lon):
+    """Format an alert position as its location name (e.g. -5.12°, -60.34°)"""
+    return f"{lat:.2f}°, {lon:.2f}°"
+
+def alert_label(alert):
+    """Return a short one-line label for an alert (used in selectors)"""
+    severity_icon = "🔴" if alert['severity'] == "High" else "🟠" if alert['severity'] == "Medium" else "🟢"
+    return f"{severity_icon} {format_location(alert['lat'], alert['lon'])} • {get_time_since(alert['date'])}"
+
+def signed_in():
+    """Whether the session's user is signed in (see current_user_id)"""
+    return bool(st.user.get("email"))
+
+def current_user_id():
+    """
+    Return the id under which per-user state is kept (read alerts, notification subscriptions)
+
+    Signed-in users are identified by their email. Otherwise each browser gets
+    a random id, kept in the page's ``user`` query parameter so it survives
+    reloads and bookmarks; sessions never share state unless they share a link.
+    """
+    email = st.user.get("email")
+    if email:
+        return email
+    user_id = st.query_params.get("user", "")
+    if not re.fullmatch(r"[0-9a-f]{32}", user_id):
+        user_id = st.query_params["user"] = uuid.uuid4().hex
+    return f"anonymous:{user_id}"
+
+def alert_cards_html(alerts, theme, read_ids=()):
+    """Return the HTML for a batch of alert cards as a single block (read alerts are dimmed)"""
+    bg_color = "rgba(255,255,255,0.05)" if theme == "dark" else "rgba(0,0,0,0.02)"
+    border_color = "rgba(255,255,255,0.1)" if theme == "dark" else "rgba(0,0,0,0.05)"
+
+    cards = []
+    for alert_id, alert in zip(alerts.index, alerts.itertuples(index=False)):
+        # Determine severity color and icon
+        severity_color = "red" if alert.severity == "High" else "orange" if alert.severity == "Medium" else "green"
+        severity_icon = "🔴" if alert.severity == "High" else "🟠" if alert.severity == "Medium" else "🟢"
+
+        is_read = alert_id in read_ids
+        opacity = 0.55 if is_read else 1.0
+        read_mark = " • ✓ Read" if is_read else ""
+
+        cards.append(f"""
+        <div style="background-color: {bg_color}; border: 1px solid {border_color};
+            border-radius: 5px; padding: 12px; margin-bottom: 10px; opacity: {opacity};">
+            <div><span style="font-size: 24px;">{severity_icon}</span>
+                <span style="color:{severity_color}; font-weight:bold;">{html.escape(str(alert.severity))} Alert</span>
+                • {get_time_since(alert.date)}{read_mark}</div>
+            <div style="font-weight:bold; margin-top: 5px;">{format_location(alert.lat, alert.lon)}</div>
+            <div>{html.escape(str(alert.description))}</div>
+            <div style="font-style: italic;">Affected Area: {alert.area_hectares:.1f} hectares</div>
+        </div>
+        """)
+
+    return "".join(cards)
+
+def demo():
+    """Sample page showing the utility functions (run with `streamlit run utils.py`)"""
+    # Set session state defaults
+    if 'theme' not in st.session_state:
+        st.session_state.theme = 'light'
+
+    # Apply theme CSS
+    st.markdown(apply_theme_css(), unsafe_allow_html=True)
 
-# Apply theme CSS
-st.markdown(apply_theme_css(), unsafe_allow_html=True)
+    # Display theme toggle button
+    if st.button('Toggle Theme'):
+        toggle_theme()
 
-# Display theme toggle button
-if st.button('Toggle Theme'):
-    toggle_theme()
+    # Your app code here...
+    st.title('Streamlit Themed App')
+    st.write('This is a sample Streamlit app with theme toggling functionality.')
 
-# Your app code here...
-st.title('Streamlit Themed App')
-st.write('This is a sample Streamlit app with theme toggling functionality.')
+    # Example usage of utility functions
+    st.write(f"Formatted number: {format_number(1234567890)}")
+    st.write(f"Risk level HTML: {risk_level_html(45)}")
+    st.write(f"Percentage change: {calculate_percentage_change(100, 150):.2f}%")
 
-# Example usage of utility functions
-st.write(f"Formatted number: {format_number(1234567890)}")
-st.write(f"Risk level HTML: {risk_level_html(45)}")
-st.write(f"Percentage change: {calculate_percentage_change(100, 150):.2f}%")
+    # Example notification
+    show_notification("This is a sample notification")
 
-# Example notification
-show_notification("This is a sample notification")
+    # Example time since function
+    timestamp = datetime(2025, 3, 26, 12, 0, 0)
+    st.write(f"Time since: {get_time_since(timestamp)}")
 
-# Example time since function
-timestamp = datetime(2025, 3, 26, 12, 0, 0)
-st.write(f"Time since: {get_time_since(timestamp)}")
\ No newline at end of file
+if __name__ == "__main__":
+    demo()